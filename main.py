@@ -92,6 +92,11 @@ def main():
     setup_logging()
     logger = logging.getLogger(__name__)
     
+    # python main.py query ... - команды без интерактивного меню
+    if len(sys.argv) > 1:
+        from src.cli.commands import run
+        sys.exit(run(sys.argv[1:]))
+    
     try:
         logger.info("=" * 60)
         logger.info("S.T.A.L.K.E.R. 2 Mod Builder starting...")
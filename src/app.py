@@ -8,8 +8,10 @@ from .cli.interface import CLIInterface
 from .core.game_manager import GameManager
 from .core.pak_manager import PakManager
 from .core.mod_builder import ModBuilder
+from .core.profile_manager import ProfileManager
 from .config.config_manager import ConfigManager
 from .modules.module_loader import ModuleLoader
+from .cfg.cache import configure_parse_cache
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +21,10 @@ class ModBuilderApp:
     def __init__(self):
         """Initialize the application"""
         self.config_manager = ConfigManager()
+        configure_parse_cache(max_mb=self.config_manager.get_app_config().get('cfg_parse_cache_mb', 256))
         self.game_manager = GameManager(self.config_manager)
         self.pak_manager = PakManager(self.config_manager)
+        self.profile_manager = ProfileManager(self.config_manager, self.game_manager)
         self.module_loader = ModuleLoader()
         self.mod_builder = ModBuilder(
             self.config_manager,
@@ -63,7 +67,7 @@ class ModBuilderApp:
         """Create necessary directories"""
         directories = [
             "config", "userconfig", "data/extract", "data/build/temp",
-            "data/cache", "output/mods", "output/paks", "output/vortex", "logs", "assets"
+            "data/cache", "data/profiles", "output/mods", "output/paks", "output/vortex", "logs", "assets"
         ]
         
         for dir_path in directories:
@@ -0,0 +1,258 @@
+"""Vanilla baseline: every prototype's effective values of one game version in a SQLite database"""
+
+import fnmatch
+import logging
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .binary import CfgBinError
+from .expressions import parse_number
+from .resolver import CfgResolveError, InheritanceResolver, extraction_reader
+from .sid_index import get_sid_index
+
+logger = logging.getLogger(__name__)
+
+BASELINE_DIR = Path("data/baselines")
+BASELINE_VERSION = 2
+
+BATCH_SIZE = 64
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS prototypes (
+        id INTEGER PRIMARY KEY,
+        sid TEXT NOT NULL,
+        name TEXT NOT NULL,
+        file TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS fields (
+        prototype INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (prototype, path)
+    ) WITHOUT ROWID;
+"""
+
+# Индексы создаются после заполнения таблиц - так сборка быстрее
+INDEXES = """
+    CREATE INDEX IF NOT EXISTS prototypes_sid ON prototypes(sid);
+    CREATE INDEX IF NOT EXISTS prototypes_name ON prototypes(name);
+    CREATE INDEX IF NOT EXISTS fields_key ON fields(key);
+"""
+
+
+def version_slug(version: str) -> str:
+    """File-name form of a detected version ('1.8.1+' -> '1.8.1plus')"""
+    return re.sub(r'[^0-9A-Za-z.]+', '_', version.replace('+', 'plus')).strip('_') or 'unknown'
+
+
+def baseline_path(version: str, db_dir: Path = BASELINE_DIR) -> Path:
+    return Path(db_dir) / f"{version_slug(version)}.sqlite"
+
+
+def _flatten(tree: dict, prefix: str = '') -> Iterator[Tuple[str, str, str]]:
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}/")
+        else:
+            yield f"{prefix}{key}", key, value.strip()
+
+
+def _resolve_batch(extract_dir: str, entries: List[Tuple[str, str, str]]) -> List[Tuple[str, str, str, list]]:
+    """Worker: (sid, name, file, [(path, key, value)]) for each top-level prototype of the batch"""
+    resolver = InheritanceResolver(extraction_reader(Path(extract_dir)))
+    results = []
+    for sid, name, file in entries:
+        try:
+            tree = resolver.resolve(file, name)
+        except (CfgResolveError, CfgBinError, OSError) as e:
+            logger.debug(f"Baseline: skipped {sid} in {file}: {e}")
+            continue
+        results.append((sid, name, file, list(_flatten(tree))))
+    return results
+
+
+class BaselineDB:
+    """
+    Read-only vanilla values of one game version: prototype SID -> effective
+    field paths ('Damage', 'WeaponEffects/[0]/Value') with inheritance applied.
+    A prototype can also be asked for by its struct name when that differs
+    from the SID; a SID match wins.
+    Lookups are index queries, so modules and validators can ask for single
+    values without parsing any game file.
+    """
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self.conn = sqlite3.connect(f"{self.db_file.resolve().as_uri()}?mode=ro", uri=True,
+                                    check_same_thread=False)
+        self.meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        self._ids: Dict[Tuple[str, Optional[str]], Optional[int]] = {}
+
+    @classmethod
+    def open(cls, version: str, db_dir: Path = BASELINE_DIR) -> Optional['BaselineDB']:
+        """Baseline of a version if it has been built, None otherwise"""
+        db_file = baseline_path(version, db_dir)
+        if not db_file.is_file():
+            return None
+        try:
+            baseline = cls(db_file)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open baseline {db_file.name}: {e}")
+            return None
+        if baseline.meta.get('schema') != str(BASELINE_VERSION):
+            baseline.close()
+            return None
+        return baseline
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def version(self) -> str:
+        return self.meta.get('version', 'unknown')
+
+    @property
+    def extraction(self) -> str:
+        return self.meta.get('extraction', '')
+
+    def _prototype_id(self, sid: str, file_hint: Optional[str] = None) -> Optional[int]:
+        cache_key = (sid, file_hint)
+        if cache_key not in self._ids:
+            rows = self.conn.execute("SELECT id, file FROM prototypes WHERE sid = ? OR name = ? "
+                                     "ORDER BY sid != ?, file", (sid, sid, sid)).fetchall()
+            if file_hint:
+                rows = [row for row in rows if file_hint in row[1]] or rows
+            self._ids[cache_key] = rows[0][0] if rows else None
+        return self._ids[cache_key]
+
+    def __contains__(self, sid: str) -> bool:
+        return self._prototype_id(sid) is not None
+
+    def value(self, sid: str, path: str, file_hint: Optional[str] = None) -> Optional[str]:
+        """Vanilla value of 'Key' or 'A/B/Key' in a prototype, None if it has none"""
+        prototype = self._prototype_id(sid, file_hint)
+        if prototype is None:
+            return None
+        row = self.conn.execute("SELECT value FROM fields WHERE prototype = ? AND path = ?",
+                                (prototype, path)).fetchone()
+        return row[0] if row else None
+
+    def number(self, sid: str, path: str, file_hint: Optional[str] = None) -> Optional[float]:
+        value = self.value(sid, path, file_hint)
+        return parse_number(value) if value is not None else None
+
+    def prototype(self, sid: str, file_hint: Optional[str] = None) -> Dict[str, str]:
+        """Every effective field of a prototype as path -> value"""
+        prototype = self._prototype_id(sid, file_hint)
+        if prototype is None:
+            return {}
+        return dict(self.conn.execute("SELECT path, value FROM fields WHERE prototype = ? ORDER BY path",
+                                      (prototype,)))
+
+    def find(self, key: str, value_pattern: Optional[str] = None,
+             file_pattern: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """(sid, path, value) of every prototype field named `key`, optionally filtered by fnmatch patterns"""
+        rows = self.conn.execute(
+            "SELECT p.sid, p.file, f.path, f.value FROM fields f JOIN prototypes p ON p.id = f.prototype "
+            "WHERE f.key = ? ORDER BY p.sid, f.path", (key,)
+        )
+        return [(sid, path, value) for sid, file, path, value in rows
+                if (value_pattern is None or fnmatch.fnmatchcase(value, value_pattern))
+                and (file_pattern is None or fnmatch.fnmatch(file, file_pattern))]
+
+    def stats(self) -> Tuple[int, int]:
+        prototypes = self.conn.execute("SELECT COUNT(*) FROM prototypes").fetchone()[0]
+        fields = self.conn.execute("SELECT COUNT(*) FROM fields").fetchone()[0]
+        return prototypes, fields
+
+
+def build_baseline(extract_dir: Path, version: str, sid_index=None, db_dir: Path = BASELINE_DIR,
+                   workers: Optional[int] = None) -> BaselineDB:
+    """Resolves every top-level prototype of the extraction across worker processes into the version's baseline"""
+    start = time.perf_counter()
+    extract_dir = Path(extract_dir)
+    sid_index = sid_index or get_sid_index(extract_dir)
+    # У верхней структуры path - её имя, SID может отличаться
+    entries = sorted({(entry.file, entry.path, sid) for sid, entry in sid_index.items() if '/' not in entry.path})
+    # Пакеты по файлам: базовые структуры файла разрешаются в одном процессе один раз
+    entries = [(sid, name, file) for file, name, sid in entries]
+    batches = [entries[i:i + BATCH_SIZE] for i in range(0, len(entries), BATCH_SIZE)]
+
+    db_file = baseline_path(version, db_dir)
+    db_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = db_file.with_name(db_file.name + '.tmp')
+    if tmp_file.exists():
+        tmp_file.unlink()
+
+    conn = sqlite3.connect(str(tmp_file))
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(SCHEMA)
+
+        def store(results):
+            for sid, name, file, fields in results:
+                prototype = conn.execute("INSERT INTO prototypes (sid, name, file) VALUES (?, ?, ?)",
+                                         (sid, name, file)).lastrowid
+                # Повторяющиеся ключи внутри структуры: действует последнее значение, как у резолвера
+                conn.executemany("INSERT OR REPLACE INTO fields (prototype, path, key, value) VALUES (?, ?, ?, ?)",
+                                 [(prototype, path, key, value) for path, key, value in fields])
+
+        if len(batches) <= 1:
+            for batch in batches:
+                store(_resolve_batch(str(extract_dir), batch))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for results in pool.map(_resolve_batch, [str(extract_dir)] * len(batches), batches):
+                    store(results)
+
+        conn.executescript(INDEXES)
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ('schema', str(BASELINE_VERSION)),
+            ('version', version),
+            ('extraction', extract_dir.name),
+            ('built_at', datetime.now().isoformat()),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_file, db_file)
+
+    baseline = BaselineDB(db_file)
+    prototypes, fields = baseline.stats()
+    logger.info(f"Baseline {version}: {prototypes} prototypes, {fields} fields "
+                f"({time.perf_counter() - start:.1f}s)")
+    return baseline
+
+
+def get_baseline(extract_dir: Path, version: str, sid_index=None, build: bool = True,
+                 db_dir: Path = BASELINE_DIR) -> Optional[BaselineDB]:
+    """Baseline of `version`; (re)built when missing or made from another extraction"""
+    baseline = BaselineDB.open(version, db_dir)
+    if baseline is not None and baseline.extraction == Path(extract_dir).name:
+        return baseline
+    if baseline is not None:
+        baseline.close()
+    if not build:
+        return None
+    return build_baseline(extract_dir, version, sid_index, db_dir)
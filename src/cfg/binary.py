@@ -0,0 +1,36 @@
+"""Binary .cfg.bin files (1.8.1+): recognised, but not decoded"""
+
+from pathlib import Path
+
+from .cache import get_parse_cache
+from .document import CfgDocument
+
+
+class CfgBinError(ValueError):
+    """A binary .cfg.bin was given where a text cfg is needed"""
+
+
+def is_cfg_bin(path) -> bool:
+    return str(path).endswith('.bin')
+
+
+def parse_cfg(data, file, cache=None) -> CfgDocument:
+    """
+    CfgDocument of a cfg file's bytes. The .cfg.bin layout is not known yet (no
+    sample of the real format has been examined), so binary files raise
+    CfgBinError and callers fall back to the baseline or their templates
+    instead of guessing.
+    """
+    if is_cfg_bin(file):
+        raise CfgBinError(f"{Path(str(file)).name}: the .cfg.bin format is not decoded yet")
+    return CfgDocument.from_bytes(data, file, cache)
+
+
+def open_cfg(path, cache=None) -> CfgDocument:
+    """
+    Opens a text .cfg as an editable CfgDocument, using the shared parse cache
+    unless another one is given. Raises CfgBinError for .cfg.bin files.
+    """
+    if is_cfg_bin(path):
+        raise CfgBinError(f"{Path(str(path)).name}: the .cfg.bin format is not decoded yet")
+    return CfgDocument.open(path, cache if cache is not None else get_parse_cache())
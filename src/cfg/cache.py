@@ -0,0 +1,121 @@
+"""On-disk cache of parsed cfg indexes, keyed by content hash and parser version"""
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ParseCache:
+    """
+    One file per parsed document: data/cache/cfg/<sha256>_v<parser version>.idx
+    holding the marshalled index (see CfgDocument.dump_index).
+
+    Reads touch the file's mtime, and when the directory grows past `max_bytes`
+    the least recently used entries are deleted. The same directory is shared
+    by every module and by batch builds, so a vanilla file is parsed once per
+    game version rather than once per build.
+    """
+
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, cache_dir: Path = Path("data/cache/cfg"), max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._total = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data, parser_version: int) -> str:
+        return f"{hashlib.sha256(data).hexdigest()}_v{parser_version}"
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.idx"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key: str, payload: bytes):
+        with self._lock:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                path = self._path(key)
+                tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+                tmp_path.write_bytes(payload)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write cfg parse cache entry: {e}")
+                return
+
+            if self._total is None:
+                self._total = self._scan_total()
+            else:
+                self._total += len(payload)
+
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        try:
+            with os.scandir(self.cache_dir) as it:
+                return [entry for entry in it if entry.name.endswith('.idx')]
+        except OSError:
+            return []
+
+    def _scan_total(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        # Удаляем до 90% лимита, чтобы не вытеснять на каждой записи
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+                total -= size
+            except OSError:
+                continue
+        self._total = total
+        logger.debug(f"cfg parse cache trimmed to {total / (1024 * 1024):.1f} MB")
+
+
+_SHARED_CACHE: Optional[ParseCache] = None
+
+
+def get_parse_cache() -> ParseCache:
+    """Process-wide cache used by open_cfg()"""
+    global _SHARED_CACHE
+    if _SHARED_CACHE is None:
+        _SHARED_CACHE = ParseCache()
+    return _SHARED_CACHE
+
+
+def configure_parse_cache(cache_dir: Optional[Path] = None, max_mb: Optional[int] = None) -> ParseCache:
+    cache = get_parse_cache()
+    if cache_dir is not None:
+        cache.cache_dir = Path(cache_dir)
+        cache._total = None
+    if max_mb is not None:
+        cache.max_bytes = max_mb * 1024 * 1024
+    return cache
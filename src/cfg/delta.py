@@ -0,0 +1,200 @@
+"""Minimal override files: only the changed keys, inheriting the rest through refurl/refkey"""
+
+import posixpath
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .document import CfgDocument, CfgStruct, CfgValue
+
+INDENT = '   '
+
+
+class OverrideError(ValueError):
+    """Edits that cannot be combined with what the mod already ships for a file"""
+
+
+def gamedata_relative(path) -> str:
+    """'ObjPrototypes/Foo.cfg' for any path (disk, pak://, output folder) below GameData"""
+    text = str(path).replace('\\', '/')
+    marker = text.rfind('/GameData/')
+    return text[marker + len('/GameData/'):] if marker != -1 else posixpath.basename(text)
+
+
+def override_location(rel_file: str, mod_name: str) -> str:
+    """
+    Where the engine picks up an override of `rel_file`: a folder named after the
+    file next to it ('ObjPrototypes.cfg' -> 'ObjPrototypes/<mod>.cfg').
+    """
+    directory, name = posixpath.split(rel_file)
+    stem = name[:-len('.bin')] if name.endswith('.bin') else name
+    stem = stem[:-len('.cfg')] if stem.endswith('.cfg') else stem
+    return posixpath.join(directory, stem, f"{mod_name}.cfg")
+
+
+def _top_level_refkeys(doc: CfgDocument) -> Dict[int, str]:
+    """id(top-level struct) -> what a refkey names it by: its SID, or its name when that is unique"""
+    names = Counter(struct.name for struct in doc.structs if struct.parent is None)
+    refkeys = {id(struct): struct.name for struct in doc.structs
+               if struct.parent is None and names[struct.name] == 1}
+    refkeys.update({id(value.struct): value.text.strip() for value in doc.values
+                    if value.key == 'SID' and value.struct is not None and value.struct.parent is None})
+    return refkeys
+
+
+def _top(struct: Optional[CfgStruct]) -> Optional[CfgStruct]:
+    while struct is not None and struct.parent is not None:
+        struct = struct.parent
+    return struct
+
+
+def numbered_values(doc: CfgDocument) -> Dict[str, CfgValue]:
+    """path -> value, repeated paths numbered '#2', '#3'... in file order (as diff.value_map)"""
+    result: Dict[str, CfgValue] = {}
+    seen: Dict[str, int] = {}
+    for value in doc.values:
+        count = seen[value.path] = seen.get(value.path, 0) + 1
+        result[value.path if count == 1 else f"{value.path}#{count}"] = value
+    return result
+
+
+def build_delta(doc: CfgDocument, refurl: str) -> Optional[bytes]:
+    """
+    Override text holding only the values changed in `doc`, one struct per touched
+    prototype: `Name : struct.begin {refurl=..;refkey=SID}`, or refkey=Name for a
+    struct without a SID (CoreVariables' DefaultConfig). Returns None when
+    inheritance cannot express the edits (a value outside a top-level struct, a
+    struct name used twice without SIDs, '[*]' items or duplicate keys), in which
+    case the whole file has to be shipped.
+    """
+    changes = doc.changes()
+    if not changes:
+        return b''
+
+    refkeys = _top_level_refkeys(doc)
+    # Повторы ключа считаются внутри одной верхней структуры
+    path_counts = Counter((id(_top(value.struct)), value.path) for value in doc.values)
+
+    # id(верхней структуры) -> вложенное дерево изменённых ключей; одноимённые структуры с разными SID раздельно
+    prototypes: Dict[int, dict] = {}
+    headers: Dict[int, str] = {}
+    for value in changes:
+        top = _top(value.struct)
+        if top is None or id(top) not in refkeys:
+            return None
+        parts = value.path.split('/')
+        if '[*]' in parts or path_counts[id(top), value.path] > 1:
+            return None
+
+        headers[id(top)] = f"{top.name} : struct.begin {{refurl={refurl};refkey={refkeys[id(top)]}}}"
+        node = prototypes.setdefault(id(top), {})
+        for part in parts[1:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = doc.current(value)
+
+    lines: List[str] = []
+
+    def render(tree: dict, depth: int):
+        for key, item in tree.items():
+            if isinstance(item, dict):
+                lines.append(f"{INDENT * depth}{key} : struct.begin")
+                render(item, depth + 1)
+                lines.append(f"{INDENT * depth}struct.end")
+            else:
+                lines.append(f"{INDENT * depth}{key} = {item}")
+
+    for top, tree in prototypes.items():
+        lines.append(headers[top])
+        render(tree, 1)
+        lines.append("struct.end")
+    return ('\r\n'.join(lines) + '\r\n').encode('utf-8')
+
+
+def overlay_override(doc: CfgDocument, rel_file: str, game_data_path: Path, mod_name: str) -> int:
+    """
+    Applies the delta override the mod already ships for `rel_file` to `doc` (the
+    vanilla file), leaving values `doc` already edits alone, so the next delta
+    keeps the earlier edits. Returns how many values were taken over; raises
+    OverrideError when an override value has no counterpart in `doc`.
+    """
+    override_file = Path(game_data_path) / override_location(rel_file, mod_name)
+    if not override_file.exists():
+        return 0
+    shipped = CfgDocument.from_bytes(override_file.read_bytes(), override_file)
+    refkeys = _top_level_refkeys(doc)
+    targets = {refkeys[id(struct)]: struct for struct in doc.structs if id(struct) in refkeys}
+    # Пути ищутся внутри своей верхней структуры: имена верхних структур могут повторяться
+    slots: Dict[int, Dict[str, CfgValue]] = {}
+    for value in doc.values:
+        top = _top(value.struct)
+        if top is not None:
+            slots.setdefault(id(top), {}).setdefault(value.path[len(top.name):], value)
+
+    applied = 0
+    for value in shipped.values:
+        top = _top(value.struct)
+        base = targets.get(top.refs.get('refkey')) if top is not None else None
+        target = slots.get(id(base), {}).get(value.path[len(top.name):]) if base is not None else None
+        if target is None:
+            raise OverrideError(f"{override_file.name}: {value.path} has no counterpart in {rel_file}")
+        if not doc.is_edited(target):
+            doc.set_value(target, shipped.current(value))
+            applied += 1
+    return applied
+
+
+def _apply_to_copy(doc: CfgDocument, full_file: Path):
+    """Carries the edits of `doc` over to the full copy the mod already ships and saves it"""
+    shipped = CfgDocument.from_bytes(full_file.read_bytes(), full_file)
+    slots = numbered_values(shipped)
+    for path, value in numbered_values(doc).items():
+        if not doc.is_edited(value):
+            continue
+        target = slots.get(path)
+        if target is None:
+            raise OverrideError(f"{full_file.name}: {path} is not in the copy the mod already ships")
+        shipped.set_value(target, doc.current(value))
+    doc.close()
+    shipped.save(full_file)
+
+
+def write_override(doc: CfgDocument, rel_file: str, game_data_path: Path, mod_name: str) -> Optional[Path]:
+    """
+    Writes the edits of `doc` into the mod folder, on top of what the mod already
+    ships for that file: into its full copy when there is one, otherwise as a
+    delta override merged with the existing delta, or as the whole edited file
+    when inheritance cannot express the edits. Returns the written file, None
+    when `doc` has no edits and nothing was written. Raises OverrideError when
+    the edits cannot be merged with the shipped file.
+    """
+    full_file = Path(game_data_path) / rel_file
+    if full_file.name.endswith('.bin'):
+        full_file = full_file.with_name(full_file.name[:-len('.bin')])
+    output_file = Path(game_data_path) / override_location(rel_file, mod_name)
+
+    if full_file.exists():
+        # Документ мог быть открыт из самой копии (patch plan, bulk rewrite) или из vanilla
+        if doc.source is not None and Path(str(doc.source)).resolve() == full_file.resolve():
+            doc.save(full_file)
+        elif not doc.changes():
+            doc.close()
+            return None
+        else:
+            _apply_to_copy(doc, full_file)
+        return full_file
+
+    overlay_override(doc, rel_file, game_data_path, mod_name)
+    delta = build_delta(doc, f"../{posixpath.basename(full_file.name)}")
+    if delta is None:
+        doc.save(full_file)
+        if output_file.exists():
+            # Её значения уже в полной копии
+            output_file.unlink()
+        return full_file
+
+    doc.close()
+    if not delta:
+        return None
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_bytes(delta)
+    return output_file
@@ -0,0 +1,123 @@
+"""Structural cfg diffs: changed keys between two documents and between two extractions"""
+
+import hashlib
+import logging
+import marshal
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .binary import parse_cfg
+from .document import CfgDocument
+from .resolver import extraction_reader
+from .sid_index import list_cfg_files
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = ".extraction_manifest"
+MANIFEST_VERSION = 1
+
+
+class KeyChange(NamedTuple):
+    path: str
+    old: Optional[str]      # None - ключ добавлен
+    new: Optional[str]      # None - ключ удалён
+
+    @property
+    def kind(self) -> str:
+        if self.old is None:
+            return 'added'
+        if self.new is None:
+            return 'removed'
+        return 'changed'
+
+
+def value_map(doc, current: bool = False) -> Dict[str, str]:
+    """path -> value text in file order; repeated paths ('[*]', duplicate keys) get '#2', '#3'..."""
+    result: Dict[str, str] = {}
+    seen: Dict[str, int] = {}
+    for value in doc.values:
+        count = seen[value.path] = seen.get(value.path, 0) + 1
+        path = value.path if count == 1 else f"{value.path}#{count}"
+        text = doc.current(value) if current else value.text
+        result[path] = text.strip()
+    return result
+
+
+def diff_maps(old: Dict[str, str], new: Dict[str, str]) -> List[KeyChange]:
+    changes = [KeyChange(path, old.get(path), value) for path, value in new.items() if old.get(path) != value]
+    changes += [KeyChange(path, value, None) for path, value in old.items() if path not in new]
+    return changes
+
+
+def parse(file: str, data: bytes):
+    return parse_cfg(data, file)
+
+
+# ----------------------------------------------------------------------
+# Extraction manifests
+# ----------------------------------------------------------------------
+
+def build_manifest(extract_dir: Path) -> Dict[str, str]:
+    """GameData cfg path -> sha1 of its content, saved next to the extraction"""
+    extract_dir = Path(extract_dir)
+    read = extraction_reader(extract_dir)
+    manifest = {file: hashlib.sha1(read(file)).hexdigest() for file in list_cfg_files(extract_dir)}
+    manifest_file = extract_dir / MANIFEST_FILE
+    tmp_file = manifest_file.with_name(MANIFEST_FILE + '.tmp')
+    tmp_file.write_bytes(marshal.dumps((MANIFEST_VERSION, manifest)))
+    os.replace(tmp_file, manifest_file)
+    return manifest
+
+
+def get_manifest(extract_dir: Path, build: bool = True) -> Optional[Dict[str, str]]:
+    """Manifest saved next to the extraction; built on first use"""
+    try:
+        version, manifest = marshal.loads((Path(extract_dir) / MANIFEST_FILE).read_bytes())
+        if version == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    return build_manifest(extract_dir) if build else None
+
+
+class ExtractionDiff(NamedTuple):
+    added: List[str]
+    removed: List[str]
+    changed: List[str]
+    keys: Dict[str, List[KeyChange]]    # файл -> изменения ключей (для всех трёх списков)
+    total: int                          # файлов в новой распаковке
+
+
+def diff_extractions(old_dir: Path, new_dir: Path) -> ExtractionDiff:
+    """
+    Compares the manifests of two extractions and diffs only the files whose
+    hash differs. A .cfg that became .cfg.bin (or back) counts as the same file.
+    """
+    old_manifest = get_manifest(old_dir)
+    new_manifest = get_manifest(new_dir)
+
+    def by_name(manifest) -> Dict[str, Tuple[str, str]]:
+        return {(file[:-len('.bin')] if file.endswith('.bin') else file): (file, digest)
+                for file, digest in manifest.items()}
+
+    old_files, new_files = by_name(old_manifest), by_name(new_manifest)
+    added = sorted(name for name in new_files if name not in old_files)
+    removed = sorted(name for name in old_files if name not in new_files)
+    changed = sorted(name for name in new_files if name in old_files and new_files[name][1] != old_files[name][1])
+
+    old_read, new_read = extraction_reader(old_dir), extraction_reader(new_dir)
+    keys: Dict[str, List[KeyChange]] = {}
+    for name in added + removed + changed:
+        old_data = old_read(old_files[name][0]) if name in old_files else None
+        new_data = new_read(new_files[name][0]) if name in new_files else None
+        try:
+            old = value_map(parse(old_files[name][0], old_data)) if old_data is not None else {}
+            new = value_map(parse(new_files[name][0], new_data)) if new_data is not None else {}
+        except ValueError as e:
+            logger.warning(f"Cannot diff {name}: {e}")
+            continue
+        file_changes = diff_maps(old, new)
+        if file_changes:
+            keys[name] = file_changes
+    return ExtractionDiff(added, removed, changed, keys, len(new_files))
@@ -0,0 +1,399 @@
+"""Bytes-level cfg documents: parsed in place over mmap, saved by copying unchanged byte ranges"""
+
+import fnmatch
+import io
+import marshal
+import mmap
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+BOM = b'\xef\xbb\xbf'
+
+# Меняется при любом изменении разбора: старые записи кэша перестают совпадать
+PARSER_VERSION = 1
+
+# Непустая строка без ведущих/замыкающих пробелов
+_LINE = re.compile(rb'^[ \t]*(\S[^\r\n]*?)[ \t]*\r?$', re.M)
+_STRUCT_BEGIN = re.compile(rb'(.*?)\s*:\s*struct\.begin\b\s*(?:\{([^}]*)\})?')
+
+
+class CfgStruct:
+    """`Name : struct.begin {refs}` ... `struct.end` block (byte offsets into the document)"""
+
+    __slots__ = ('name', 'path', 'parent', 'start', 'end', 'refs_span', 'doc')
+
+    def __init__(self, doc: 'CfgDocument', name: str, path: str, parent: Optional['CfgStruct'],
+                 start: int, refs_span: Optional[Tuple[int, int]]):
+        self.doc = doc
+        self.name = name
+        self.path = path
+        self.parent = parent
+        self.start = start
+        self.end = None
+        self.refs_span = refs_span
+
+    @property
+    def refs(self) -> Dict[str, str]:
+        """{refurl=..;refkey=..} of the header as a dict"""
+        if self.refs_span is None:
+            return {}
+        result = {}
+        for part in self.doc.text(*self.refs_span).split(';'):
+            key, sep, value = part.partition('=')
+            if sep:
+                result[key.strip()] = value.strip()
+        return result
+
+    def __repr__(self):
+        return f"CfgStruct({self.path!r})"
+
+
+class CfgValue:
+    """`Key = Value` line; start/end delimit the value bytes"""
+
+    __slots__ = ('key', 'path', 'struct', 'start', 'end', 'doc')
+
+    def __init__(self, doc: 'CfgDocument', key: str, path: str, struct: Optional[CfgStruct], start: int, end: int):
+        self.doc = doc
+        self.key = key
+        self.path = path
+        self.struct = struct
+        self.start = start
+        self.end = end
+
+    @property
+    def text(self) -> str:
+        return self.doc.text(self.start, self.end)
+
+    def __repr__(self):
+        return f"CfgValue({self.path!r}={self.text!r})"
+
+
+def _is_wildcard(segment: str) -> bool:
+    return '*' in segment or '?' in segment
+
+
+def _match_segment(segment: str, part: str) -> bool:
+    if not _is_wildcard(segment):
+        return segment == part
+    # '[0]' в cfg - обычное имя, а не класс символов fnmatch
+    return fnmatch.fnmatchcase(part, segment.replace('[', '[[]'))
+
+
+def _match_segments(pattern: Tuple[str, ...], parts: Tuple[str, ...]) -> bool:
+    if not pattern:
+        return not parts
+    head = pattern[0]
+    if head == '**':
+        return any(_match_segments(pattern[1:], parts[i:]) for i in range(len(parts) + 1))
+    return bool(parts) and _match_segment(head, parts[0]) and _match_segments(pattern[1:], parts[1:])
+
+
+def path_matches(pattern: str, path: str) -> bool:
+    """Whether a value path matches a select() pattern ('**/Key', 'Knife/**')"""
+    return _match_segments(tuple(pattern.split('/')), tuple(path.split('/')))
+
+
+class CfgDocument:
+    """
+    A cfg file kept as raw bytes (an mmap for files on disk).
+
+    The structure is indexed once with bytes patterns; only values that are asked
+    for are decoded. Edits are recorded as (start, end, new bytes) spans, and
+    saving writes the untouched ranges of the original buffer straight through,
+    so nothing outside the edited values is decoded or re-encoded.
+
+    Paths are struct names joined by '/', ending with the key:
+    'DefaultWeightParams/MaxInventoryMass'. Patterns use fnmatch per segment
+    plus '**' for any number of levels.
+    """
+
+    def __init__(self, buffer, source: Optional[Path] = None, mapped: Optional[mmap.mmap] = None, file=None,
+                 cache=None):
+        self.buffer = buffer
+        self.source = source
+        self.cache = cache
+        self._mmap = mapped
+        self._file = file
+        self._edits: Dict[int, Tuple[int, bytes]] = {}
+        self._structs: Optional[List[CfgStruct]] = None
+        self._values: Optional[List[CfgValue]] = None
+
+    @classmethod
+    def from_bytes(cls, data: bytes, source: Optional[Path] = None, cache=None) -> 'CfgDocument':
+        return cls(data, source, cache=cache)
+
+    @classmethod
+    def open(cls, path, cache=None) -> 'CfgDocument':
+        """
+        Maps a file on disk; anything else with read_bytes() (e.g. a VfsPath) is read into memory.
+        With a ParseCache the index is loaded from it instead of being parsed.
+        """
+        if not isinstance(path, Path):
+            return cls.from_bytes(path.read_bytes(), path, cache)
+
+        f = open(path, 'rb')
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                f.close()
+                return cls.from_bytes(b'', path, cache)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        return cls(mapped, path, mapped, f, cache)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+        self.buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Parsing
+    # ------------------------------------------------------------------
+
+    def text(self, start: int, end: int, encoding: str = 'utf-8') -> str:
+        return self.buffer[start:end].decode(encoding, errors='replace')
+
+    def _parse(self):
+        buf = self.buffer
+        structs: List[CfgStruct] = []
+        values: List[CfgValue] = []
+        stack: List[CfgStruct] = []
+
+        for m in _LINE.finditer(buf):
+            start, end = m.span(1)
+            if start == 0 and buf[:3] == BOM:
+                start += 3
+            line = buf[start:end]
+
+            comment = line.find(b'//')
+            if comment != -1:
+                line = line[:comment].rstrip()
+                end = start + len(line)
+            if not line:
+                continue
+
+            if line == b'struct.end':
+                if stack:
+                    stack.pop().end = m.end(1)
+                continue
+
+            if b'struct.begin' in line:
+                sm = _STRUCT_BEGIN.match(line)
+                if sm:
+                    name = sys.intern(sm.group(1).strip().decode('utf-8', errors='replace'))
+                    parent = stack[-1] if stack else None
+                    path = f"{parent.path}/{name}" if parent else name
+                    refs_span = (start + sm.start(2), start + sm.end(2)) if sm.group(2) is not None else None
+                    struct = CfgStruct(self, name, path, parent, start, refs_span)
+                    structs.append(struct)
+                    stack.append(struct)
+                    continue
+
+            eq = line.find(b'=')
+            if eq == -1:
+                continue
+
+            key = sys.intern(line[:eq].strip().decode('utf-8', errors='replace'))
+            value_start = start + eq + 1
+            while value_start < end and buf[value_start:value_start + 1] in (b' ', b'\t'):
+                value_start += 1
+            parent = stack[-1] if stack else None
+            path = f"{parent.path}/{key}" if parent else key
+            values.append(CfgValue(self, key, path, parent, value_start, end))
+
+        self._structs = structs
+        self._values = values
+
+    def dump_index(self) -> bytes:
+        """
+        Compact form of the parsed index: flat tuples of names, parent numbers and
+        offsets. Names are interned, so marshal writes each distinct key once.
+        """
+        struct_ids = {id(struct): number for number, struct in enumerate(self.structs)}
+
+        def parent_id(struct):
+            return struct_ids[id(struct)] if struct is not None else -1
+
+        structs = tuple(
+            (s.name, parent_id(s.parent), s.start, -1 if s.end is None else s.end,
+             s.refs_span[0] if s.refs_span else -1, s.refs_span[1] if s.refs_span else -1)
+            for s in self.structs
+        )
+        values = tuple((v.key, parent_id(v.struct), v.start, v.end) for v in self.values)
+        return marshal.dumps((PARSER_VERSION, structs, values))
+
+    def load_index(self, data: bytes):
+        version, struct_rows, value_rows = marshal.loads(data)
+        if version != PARSER_VERSION:
+            raise ValueError(f"index was written by parser version {version}")
+
+        structs: List[CfgStruct] = []
+        for name, parent_number, start, end, refs_start, refs_end in struct_rows:
+            parent = structs[parent_number] if parent_number >= 0 else None
+            name = sys.intern(name)
+            struct = CfgStruct(self, name, f"{parent.path}/{name}" if parent else name, parent, start,
+                               (refs_start, refs_end) if refs_start >= 0 else None)
+            struct.end = end if end >= 0 else None
+            structs.append(struct)
+
+        values: List[CfgValue] = []
+        for key, parent_number, start, end in value_rows:
+            parent = structs[parent_number] if parent_number >= 0 else None
+            key = sys.intern(key)
+            values.append(CfgValue(self, key, f"{parent.path}/{key}" if parent else key, parent, start, end))
+
+        self._structs = structs
+        self._values = values
+
+    def _ensure_index(self):
+        if self._structs is not None:
+            return
+        if self.cache is None:
+            self._parse()
+            return
+
+        key = self.cache.key(self.buffer, PARSER_VERSION)
+        cached = self.cache.get(key)
+        if cached is not None:
+            try:
+                self.load_index(cached)
+                return
+            except (ValueError, EOFError, TypeError, IndexError):
+                # повреждённая запись просто перезаписывается
+                self._structs = None
+
+        self._parse()
+        self.cache.put(key, self.dump_index())
+
+    @property
+    def structs(self) -> List[CfgStruct]:
+        self._ensure_index()
+        return self._structs
+
+    @property
+    def values(self) -> List[CfgValue]:
+        self._ensure_index()
+        return self._values
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def select(self, pattern: str) -> List[CfgValue]:
+        """Every value whose path matches `pattern`, in file order"""
+        segments = tuple(pattern.split('/'))
+        key = None if _is_wildcard(segments[-1]) else segments[-1]
+        if key is not None and len(segments) == 2 and segments[0] == '**':
+            # '**/Key' - любой путь, достаточно сравнить ключ
+            return [value for value in self.values if value.key == key]
+        result = []
+        for value in self.values:
+            if key is not None and value.key != key:
+                continue
+            if _match_segments(segments, tuple(value.path.split('/'))):
+                result.append(value)
+        return result
+
+    def find(self, pattern: str) -> Optional[CfgValue]:
+        found = self.select(pattern)
+        return found[0] if found else None
+
+    def get(self, pattern: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.find(pattern)
+        return self.current(value) if value is not None else default
+
+    def first_after(self, pattern: str, offset: int) -> Optional[CfgValue]:
+        """First matching value located after a byte offset (e.g. after an anchor value)"""
+        for value in self.select(pattern):
+            if value.start > offset:
+                return value
+        return None
+
+    def find_bytes(self, needle: Union[bytes, str], start: int = 0) -> int:
+        if isinstance(needle, str):
+            needle = needle.encode('utf-8')
+        return self.buffer.find(needle, start)
+
+    def struct_values(self, struct: CfgStruct) -> List[CfgValue]:
+        """Direct `Key = Value` children of a struct"""
+        return [value for value in self.values if value.struct is struct]
+
+    # ------------------------------------------------------------------
+    # Editing
+    # ------------------------------------------------------------------
+
+    def current(self, value: CfgValue) -> str:
+        """Value text including pending edits"""
+        edit = self._edits.get(value.start)
+        if edit is not None:
+            return edit[1].decode('utf-8')
+        return value.text
+
+    def is_edited(self, value: CfgValue) -> bool:
+        """Whether the value has a pending edit (even one back to its original text)"""
+        return value.start in self._edits
+
+    def set_value(self, value: CfgValue, new_value) -> None:
+        self._edits[value.start] = (value.end, str(new_value).encode('utf-8'))
+
+    def set(self, pattern: str, new_value) -> int:
+        """Sets every matching value; returns how many were changed"""
+        found = self.select(pattern)
+        for value in found:
+            self.set_value(value, new_value)
+        return len(found)
+
+    @property
+    def modified(self) -> bool:
+        return bool(self._edits)
+
+    def changes(self) -> List[CfgValue]:
+        """Values whose pending edit differs from the original text, in file order"""
+        return [value for value in self.values
+                if value.start in self._edits and self.current(value) != value.text]
+
+    def write_to(self, stream):
+        """Writes the edited document to a binary stream, copying unchanged ranges as they are"""
+        pos = 0
+        with memoryview(self.buffer) as view:
+            for start in sorted(self._edits):
+                end, data = self._edits[start]
+                stream.write(view[pos:start])
+                stream.write(data)
+                pos = end
+            stream.write(view[pos:])
+
+    def to_bytes(self) -> bytes:
+        out = io.BytesIO()
+        self.write_to(out)
+        return out.getvalue()
+
+    def save(self, output_file: Path):
+        """
+        Writes the document with its edits. Output may be the source file itself:
+        it is written to a temporary file and swapped in after the mapping is closed.
+        """
+        output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = output_file.with_name(output_file.name + '.tmp')
+
+        with open(tmp_file, 'wb') as f:
+            self.write_to(f)
+
+        self.close()
+        os.replace(tmp_file, output_file)
@@ -0,0 +1,231 @@
+"""Value rules such as `Damage *= 1.5 if Class == Rifle`, compiled once and applied to every matching value"""
+
+import ast
+import math
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .document import CfgDocument, CfgValue
+
+_RULE = re.compile(r'^\s*(\S+?)\s*([*/+-]?)=(?!=)\s*(.+?)(?:\s+if\s+(.+?))?\s*$')
+# EWeaponType::Rifle и подобные перечисления - строковые литералы
+_ENUM = re.compile(r'\b[A-Za-z_]\w*(?:::\w+)+')
+_NUMBER = re.compile(r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(f?)\s*$')
+
+_FUNCTIONS = {'min': min, 'max': max, 'abs': abs, 'round': round}
+
+# Поля-счётчики: игра читает их как целые, поэтому *=, /=, += и -= округляют результат
+INTEGER_KEYS = frozenset({'Count', 'MinCount', 'MaxCount', 'Cost'})
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call,
+    ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+    ast.And, ast.Or, ast.Not, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Tuple, ast.List,
+)
+# Узлы, которые numpy считает поэлементно без изменений в выражении
+_VECTOR_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+_OPERATORS = {
+    '': lambda old, new: new,
+    '*': lambda old, new: old * new,
+    '/': lambda old, new: old / new,
+    '+': lambda old, new: old + new,
+    '-': lambda old, new: old - new,
+}
+
+
+class RuleError(ValueError):
+    pass
+
+
+def rule_target(rule: str) -> str:
+    """select() pattern of the values a rule edits, without compiling it"""
+    match = _RULE.match(rule)
+    if not match:
+        raise RuleError(f"cannot parse rule {rule!r}")
+    target = match.group(1)
+    return target if '/' in target else f"**/{target}"
+
+
+def parse_number(text: str) -> Optional[float]:
+    match = _NUMBER.match(text)
+    return float(match.group(1)) if match else None
+
+
+def format_number(number: float, original: str, integral: bool = False) -> str:
+    """
+    Writes a number the way the original value was written ('51.f' stays a float
+    literal). Whole results of whole originals stay whole; other results are
+    written as floats, since vanilla writes many float fields as '1'. With
+    `integral` the number is rounded to the nearest integer first.
+    """
+    if integral:
+        number = round(number)
+    match = _NUMBER.match(original)
+    is_int = match is not None and not match.group(2) and not re.search(r'[.eE]', match.group(1))
+    if is_int and float(number).is_integer():
+        return str(int(number))
+    text = f"{float(number):.6f}".rstrip('0')
+    if text.endswith('.') and not (match is not None and match.group(1).endswith('.')):
+        text += '0'
+    return text + ('f' if match is not None and match.group(2) else '')
+
+
+class _Scope(dict):
+    """Names of a rule: keys of the struct being edited; unknown names read as their own text"""
+
+    def __missing__(self, name):
+        if name in _FUNCTIONS:
+            raise KeyError(name)
+        return name
+
+
+def _value_of(text: str):
+    number = parse_number(text)
+    return number if number is not None else text.strip()
+
+
+def _compile(source: str, what: str, rule: str):
+    source = _ENUM.sub(lambda m: repr(m.group(0)), source)
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as e:
+        raise RuleError(f"bad {what} in rule {rule!r}: {e.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise RuleError(f"{type(node).__name__} is not allowed in rule {rule!r}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS):
+            raise RuleError(f"only {', '.join(_FUNCTIONS)} can be called in rule {rule!r}")
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} - set(_FUNCTIONS)
+    vectorizable = all(isinstance(node, _VECTOR_NODES) for node in ast.walk(tree))
+    return compile(tree, f"<rule {rule}>", 'eval'), names, vectorizable
+
+
+class CompiledRule:
+    """
+    `Target op= expression [if condition]`:
+
+        Damage *= 1.5 if Class == EWeaponType::Rifle
+        **/Bleeding = max(Bleeding, 10)
+        Knife/Damage += 5
+
+    Target is a document pattern ('Damage' means '**/Damage'); op is one of = *= /= += -=.
+    The expression and condition see the other keys of the edited value's struct
+    by name, the current number as `value`, and min/max/abs/round. Both are
+    compiled to bytecode once. When numpy is available and the expression is
+    plain arithmetic on the value itself, all matches are computed as one array.
+    Results are only rounded when the rule calls round() or an arithmetic op
+    (not `=`) edits one of INTEGER_KEYS.
+    """
+
+    def __init__(self, rule: str):
+        match = _RULE.match(rule)
+        if not match:
+            raise RuleError(f"cannot parse rule {rule!r}")
+        target, op, expression, condition = match.groups()
+
+        self.rule = rule
+        self.key = target.rsplit('/', 1)[-1]
+        self.pattern = target if '/' in target else f"**/{target}"
+        self.combine = _OPERATORS[op]
+        self.integral = bool(op) and self.key in INTEGER_KEYS
+        self.expression, names, self.vectorizable = _compile(expression, 'expression', rule)
+        self.condition = None
+        condition_names = set()
+        if condition:
+            self.condition, condition_names, _ = _compile(condition, 'condition', rule)
+        # Соседние ключи нужны, только если выражение ссылается на что-то кроме самого значения
+        self.needs_struct = bool((names | condition_names) - {'value', self.key})
+        self.vectorizable = self.vectorizable and not (names - {'value', self.key})
+
+    @staticmethod
+    def _siblings(doc: CfgDocument) -> Dict[int, Dict[str, object]]:
+        """id(struct) -> {key: value} for the whole document in one pass"""
+        result: Dict[int, Dict[str, object]] = {}
+        for value in doc.values:
+            if value.struct is not None:
+                result.setdefault(id(value.struct), {}).setdefault(value.key, _value_of(doc.current(value)))
+        return result
+
+    def _scope(self, value: CfgValue, number: float, siblings: Optional[Dict[int, Dict[str, object]]]) -> _Scope:
+        scope = _Scope()
+        if siblings is not None and value.struct is not None:
+            scope.update(siblings.get(id(value.struct), {}))
+        scope[self.key] = number
+        scope['value'] = number
+        return scope
+
+    def _evaluate(self, code, scope: _Scope):
+        try:
+            return eval(code, {'__builtins__': {}, **_FUNCTIONS}, scope)
+        except (ArithmeticError, TypeError) as e:
+            raise RuleError(f"rule {self.rule!r} failed on {scope.get(self.key)!r}: {e}")
+
+    def matches(self, docs: Iterable[CfgDocument]) -> List[Tuple[CfgDocument, CfgValue, float, Optional[_Scope]]]:
+        """Numeric values the rule applies to (condition already checked)"""
+        result = []
+        need_scope = self.condition is not None or np is None or not self.vectorizable
+        for doc in docs:
+            siblings = self._siblings(doc) if self.needs_struct else None
+            for value in doc.select(self.pattern):
+                number = parse_number(doc.current(value))
+                if number is None:
+                    continue
+                # Для векторного расчёта без условия имена не нужны
+                scope = self._scope(value, number, siblings) if need_scope else None
+                if self.condition is not None and not self._evaluate(self.condition, scope):
+                    continue
+                result.append((doc, value, number, scope))
+        return result
+
+    def apply(self, docs) -> int:
+        """Applies the rule to one document or many; returns how many values changed"""
+        if isinstance(docs, CfgDocument):
+            docs = [docs]
+        found = self.matches(docs)
+        if not found:
+            return 0
+
+        old = [number for _, _, number, _ in found]
+        if np is not None and self.vectorizable:
+            array = np.array(old, dtype=float)
+            with np.errstate(all='raise'):
+                try:
+                    computed = eval(self.expression, {'__builtins__': {}}, {self.key: array, 'value': array})
+                    new = self.combine(array, computed)
+                except (ArithmeticError, FloatingPointError) as e:
+                    raise RuleError(f"rule {self.rule!r} failed: {e}")
+            new = np.broadcast_to(new, array.shape).tolist()
+        else:
+            try:
+                new = [self.combine(number, self._evaluate(self.expression, scope))
+                       for (_, _, number, scope) in found]
+            except ArithmeticError as e:
+                raise RuleError(f"rule {self.rule!r} failed: {e}")
+
+        changed = 0
+        for (doc, value, number, _), result in zip(found, new):
+            if isinstance(result, bool) or not isinstance(result, (int, float)) or not math.isfinite(result):
+                raise RuleError(f"rule {self.rule!r} produced {result!r} for {value.path}")
+            if result == number:
+                continue
+            # Поле-счётчик округляется, и значение может не измениться
+            text = format_number(result, value.text, self.integral)
+            if text != doc.current(value):
+                doc.set_value(value, text)
+                changed += 1
+        return changed
+
+
+@lru_cache(maxsize=256)
+def compile_rule(rule: str) -> CompiledRule:
+    return CompiledRule(rule)
@@ -0,0 +1,196 @@
+"""Inverted key index: key name -> every place it is set in GameData, stored next to the extraction"""
+
+import bisect
+import fnmatch
+import logging
+import marshal
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.core.extraction_store import ExtractionStore
+from .binary import CfgBinError, parse_cfg
+from .cache import get_parse_cache
+from .sid_index import list_cfg_files
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".extraction_key_index"
+INDEX_VERSION = 1
+
+BATCH_SIZE = 64
+
+# Короткие значения (числа, перечисления) хранятся в индексе, длинные читаются из файла по запросу
+INLINE_VALUE_LIMIT = 48
+
+
+class KeyHit(NamedTuple):
+    """`key = value` in `file`; start/end are byte offsets in the file"""
+    file: str
+    struct: str
+    key: str
+    start: int
+    end: int
+    value: Optional[str]
+
+    @property
+    def path(self) -> str:
+        return f"{self.struct}/{self.key}" if self.struct else self.key
+
+
+def _postings(doc, file_no: int, paths: Dict[str, int], postings: Dict[str, list]):
+    for value in doc.values:
+        struct_path = value.struct.path if value.struct is not None else ''
+        path_no = paths.setdefault(struct_path, len(paths))
+        start, end = value.start, value.end
+        text = value.text.strip() if end - start <= INLINE_VALUE_LIMIT else None
+        if text is not None and len(text) > INLINE_VALUE_LIMIT:
+            text = None
+        postings.setdefault(value.key, []).append((file_no, path_no, start, end, text))
+
+
+def _index_batch(extract_dir: str, files: List[str], first_file_no: int) -> Tuple[List[str], Dict[str, list]]:
+    """Worker: postings of a batch, with struct paths numbered per batch"""
+    paths: Dict[str, int] = {}
+    postings: Dict[str, list] = {}
+    cache = get_parse_cache()
+    store = ExtractionStore.open(Path(extract_dir))
+    try:
+        for offset, file in enumerate(files):
+            try:
+                data = store.read(file) if store is not None else (Path(extract_dir) / file).read_bytes()
+                doc = parse_cfg(data, file, cache)
+                _postings(doc, first_file_no + offset, paths, postings)
+            except (CfgBinError, OSError) as e:
+                logger.debug(f"Key index: skipped {file}: {e}")
+    finally:
+        if store is not None:
+            store.close()
+    path_table = sorted(paths, key=paths.get)
+    return path_table, postings
+
+
+class KeyIndex:
+    """
+    key -> [(file number, struct path number, start, end, short value)].
+
+    Keys are matched case-insensitively: exact ('RealToGameTimeCoef'), prefix
+    ('Durability*') or any fnmatch wildcard ('*SellMin*'). Values can be filtered
+    with an fnmatch pattern too; long values are read from the files only then.
+    """
+
+    def __init__(self, files: List[str], paths: List[str], postings: Dict[str, list]):
+        self.files = files
+        self.paths = paths
+        self._postings = postings
+        self._by_lower: Dict[str, List[str]] = {}
+        for key in postings:
+            self._by_lower.setdefault(key.lower(), []).append(key)
+        self._sorted = sorted(self._by_lower)
+
+    def __len__(self):
+        return len(self._postings)
+
+    def keys(self, pattern: str) -> List[str]:
+        """Keys matching an exact name, a prefix ending with '*' or a wildcard pattern"""
+        pattern = pattern.lower()
+        head = pattern.rstrip('*')
+        if not any(c in pattern for c in '*?['):
+            lowered = [pattern] if pattern in self._by_lower else []
+        elif pattern.endswith('*') and not any(c in head for c in '*?['):
+            start = bisect.bisect_left(self._sorted, head)
+            end = bisect.bisect_left(self._sorted, head + '\uffff')
+            lowered = self._sorted[start:end]
+        else:
+            lowered = fnmatch.filter(self._sorted, pattern)
+        return sorted(key for low in lowered for key in self._by_lower[low])
+
+    def query(self, key_pattern: str, value_pattern: Optional[str] = None, file_pattern: Optional[str] = None,
+              read: Optional[Callable[[str], bytes]] = None, limit: Optional[int] = None) -> List[KeyHit]:
+        """
+        Every place a matching key is set. `file_pattern` is a substring or fnmatch
+        pattern of the file path; `read` (file -> bytes) is needed to filter long
+        values that are not stored in the index.
+        """
+        file_match = None
+        if file_pattern:
+            if any(c in file_pattern for c in '*?['):
+                file_match = lambda file: fnmatch.fnmatch(file, file_pattern)
+            else:
+                file_match = lambda file: file_pattern.lower() in file.lower()
+
+        hits: List[KeyHit] = []
+        for key in self.keys(key_pattern):
+            for file_no, path_no, start, end, value in self._postings[key]:
+                file = self.files[file_no]
+                if file_match is not None and not file_match(file):
+                    continue
+                if value_pattern is not None:
+                    if value is None and read is not None and end >= 0:
+                        value = read(file)[start:end].decode('utf-8', errors='replace').strip()
+                    if value is None or not fnmatch.fnmatchcase(value, value_pattern):
+                        continue
+                hits.append(KeyHit(file, self.paths[path_no], key, start, end, value))
+                if limit is not None and len(hits) >= limit:
+                    return hits
+        return hits
+
+    def save(self, extract_dir: Path):
+        index_file = Path(extract_dir) / INDEX_FILE
+        tmp_file = index_file.with_name(INDEX_FILE + '.tmp')
+        tmp_file.write_bytes(marshal.dumps((INDEX_VERSION, self.files, self.paths, self._postings)))
+        os.replace(tmp_file, index_file)
+
+    @classmethod
+    def load(cls, extract_dir: Path) -> Optional['KeyIndex']:
+        try:
+            version, files, paths, postings = marshal.loads((Path(extract_dir) / INDEX_FILE).read_bytes())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        if version != INDEX_VERSION:
+            return None
+        return cls(files, paths, postings)
+
+
+def build_key_index(extract_dir: Path, workers: Optional[int] = None) -> KeyIndex:
+    """Indexes every key of the extraction's GameData across worker processes and saves the index"""
+    start = time.perf_counter()
+    files = list_cfg_files(extract_dir)
+    batches = [(i, files[i:i + BATCH_SIZE]) for i in range(0, len(files), BATCH_SIZE)]
+
+    paths: Dict[str, int] = {}
+    postings: Dict[str, list] = {}
+
+    def merge(result):
+        # Номера путей структур у каждого пакета свои - переводим в общую таблицу
+        path_table, batch_postings = result
+        remap = [paths.setdefault(path, len(paths)) for path in path_table]
+        for key, rows in batch_postings.items():
+            postings.setdefault(key, []).extend(
+                (file_no, remap[path_no], row_start, row_end, value)
+                for file_no, path_no, row_start, row_end, value in rows
+            )
+
+    if len(batches) <= 1:
+        for first, batch in batches:
+            merge(_index_batch(str(extract_dir), batch, first))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_index_batch, [str(extract_dir)] * len(batches),
+                                   [batch for _, batch in batches], [first for first, _ in batches]):
+                merge(result)
+
+    index = KeyIndex(files, sorted(paths, key=paths.get), postings)
+    index.save(extract_dir)
+    logger.info(f"Key index: {len(postings)} keys in {len(files)} files ({time.perf_counter() - start:.1f}s)")
+    return index
+
+
+def get_key_index(extract_dir: Path, build: bool = True) -> Optional[KeyIndex]:
+    """Index saved next to the extraction; built on first use"""
+    index = KeyIndex.load(extract_dir)
+    if index is None and build:
+        index = build_key_index(extract_dir)
+    return index
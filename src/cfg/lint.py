@@ -0,0 +1,265 @@
+"""Lint of the cfg files a mod ships: structure, literals, references and value types"""
+
+import logging
+import os
+import posixpath
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .binary import CfgBinError
+from .delta import gamedata_relative
+from .expressions import parse_number
+from .resolver import CfgResolveError, InheritanceResolver
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 32
+
+_STRUCT_BEGIN = re.compile(r'^(.*?)\s*:\s*struct\.begin\b\s*(?:\{([^}]*)\})?\s*$')
+# Похоже на число, но игра такое не прочитает: '102.0.f', '1..5'
+_NUMBER_LIKE = re.compile(r'^[-+]?\.?\d[\d.]*f?$')
+# Арифметика в значении не вычисляется: '1.0 / 2.0'
+_EXPRESSION = re.compile(r'^[-+]?(?:\d+\.?\d*|\.\d+)f?\s*[-+*/]\s*\S')
+
+
+class LintIssue(NamedTuple):
+    file: str           # путь в GameData
+    line: int
+    severity: str       # 'error' | 'warning'
+    message: str
+
+    def __str__(self):
+        return f"{self.file}:{self.line}: {self.severity}: {self.message}"
+
+
+class _Reference(NamedTuple):
+    line: int
+    struct: str
+    refurl: Optional[str]
+    refkey: Optional[str]
+
+
+class _TypedValue(NamedTuple):
+    line: int
+    sid: str            # прототип, от которого значение наследуется (refkey, SID или имя структуры)
+    hint: Optional[str] # файл, где искать этот прототип в базовой базе
+    path: str           # путь внутри прототипа
+    value: str
+
+
+class FileLint(NamedTuple):
+    issues: List[LintIssue]
+    references: List[_Reference]
+    values: List[_TypedValue]
+    names: List[str]    # имена и SID верхних структур
+
+
+def _parse_refs(text: Optional[str]) -> Dict[str, str]:
+    refs = {}
+    for part in (text or '').split(';'):
+        key, sep, value = part.partition('=')
+        if sep:
+            refs[key.strip()] = value.strip()
+    return refs
+
+
+def lint_text(rel_file: str, text: str) -> FileLint:
+    """Structure and literal checks of one file; references and values are collected for lint_tree"""
+    issues: List[LintIssue] = []
+    references: List[_Reference] = []
+    values: List[_TypedValue] = []
+    names: List[str] = []
+    # (имя, строка, refs) открытых структур; у верхней ещё (sid, hint) для проверки типов
+    stack: List[Tuple[str, int, Dict[str, str]]] = []
+    top: Optional[List] = None
+
+    def issue(line_no, severity, message):
+        issues.append(LintIssue(rel_file, line_no, severity, message))
+
+    for line_no, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip().lstrip('﻿')
+        comment = line.find('//')
+        if comment != -1:
+            line = line[:comment].rstrip()
+        if not line:
+            continue
+
+        if line == 'struct.end':
+            if not stack:
+                issue(line_no, 'error', "struct.end without a matching struct.begin")
+            else:
+                stack.pop()
+            continue
+
+        if 'struct.begin' in line:
+            match = _STRUCT_BEGIN.match(line)
+            if match is None or not match.group(1):
+                issue(line_no, 'error', f"malformed struct header: {line}")
+                continue
+            name, refs = match.group(1), _parse_refs(match.group(2))
+            if refs.get('refurl') or refs.get('refkey'):
+                references.append(_Reference(line_no, name, refs.get('refurl'), refs.get('refkey')))
+            if not stack:
+                names.append(name)
+                hint = posixpath.basename(refs['refurl']).split('.')[0] if refs.get('refurl') else None
+                top = [refs.get('refkey') or name, hint]
+            stack.append((name, line_no, refs))
+            continue
+
+        key, sep, value = line.partition('=')
+        if not sep:
+            issue(line_no, 'warning', f"line ignored by the parser: {line}")
+            continue
+        key, value = key.strip(), value.strip()
+
+        literal_ok = False
+        if _EXPRESSION.match(value):
+            issue(line_no, 'error', f"{key} = {value}: expressions are not evaluated, write the resulting number")
+        elif _NUMBER_LIKE.match(value) and parse_number(value) is None:
+            issue(line_no, 'error', f"{key} = {value}: bad number literal")
+        else:
+            literal_ok = True
+
+        if stack:
+            if len(stack) == 1 and key == 'SID':
+                names.append(value)
+                if not stack[0][2]:
+                    top[0] = value
+            inner = '/'.join([entry[0] for entry in stack[1:]] + [key])
+            if literal_ok and '[*]' not in inner:
+                values.append(_TypedValue(line_no, top[0], top[1], inner, value))
+
+    for name, line_no, refs in stack:
+        issue(line_no, 'error', f"struct {name} is never closed (missing struct.end)")
+    return FileLint(issues, references, values, names)
+
+
+def refurl_target(rel_file: str, refurl: str) -> Optional[str]:
+    """GameData path a refurl in `rel_file` points to (relative to the file's folder); None outside GameData"""
+    target = posixpath.normpath(posixpath.join(posixpath.dirname(rel_file), refurl))
+    return None if target == '..' or target.startswith('../') else target
+
+
+def lint_file(rel_file: str, text: str) -> List[LintIssue]:
+    """Checks of one file that need no other files: lint_text plus refurls leading outside GameData"""
+    result = lint_text(rel_file, text)
+    issues = list(result.issues)
+    for ref in result.references:
+        if ref.refurl and refurl_target(rel_file, ref.refurl) is None:
+            issues.append(LintIssue(rel_file, ref.line, 'error', f"refurl {ref.refurl} points outside GameData"))
+    return sorted(issues, key=lambda issue: issue.line)
+
+
+def _lint_batch(root: str, files: List[str]) -> Dict[str, FileLint]:
+    """Worker: lint_text for a batch of staged files"""
+    results = {}
+    for rel_file in files:
+        try:
+            text = (Path(root) / rel_file).read_bytes().decode('utf-8', errors='replace')
+        except OSError as e:
+            results[rel_file] = FileLint([LintIssue(rel_file, 0, 'error', f"cannot read: {e}")], [], [], [])
+            continue
+        results[rel_file] = lint_text(rel_file, text)
+    return results
+
+
+def _kind(value: str) -> str:
+    if parse_number(value) is not None:
+        return 'number'
+    if value.lower() in ('true', 'false'):
+        return 'bool'
+    if '::' in value:
+        return 'enum'
+    return 'text'
+
+
+def lint_tree(game_data_path: Path, sid_index=None, baseline=None, vanilla_files: Optional[Iterable[str]] = None,
+              read: Optional[Callable[[str], bytes]] = None, workers: Optional[int] = None) -> List[LintIssue]:
+    """
+    Lints every .cfg below a staged GameData folder (in worker processes when
+    there are many), then checks refurl targets against the staged and vanilla
+    files, refkeys against the SID index (or the target file itself) and value
+    types against the vanilla baseline. `vanilla_files` are extraction paths of
+    the game's cfg files and `read` reads them; checks needing them are skipped
+    without.
+    """
+    start = time.perf_counter()
+    root = Path(game_data_path)
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        files.extend(name if rel_dir == '.' else f"{rel_dir}/{name}" for name in filenames if name.endswith('.cfg'))
+    files.sort()
+    batches = [files[i:i + BATCH_SIZE] for i in range(0, len(files), BATCH_SIZE)]
+
+    results: Dict[str, FileLint] = {}
+    if len(batches) <= 1:
+        for batch in batches:
+            results.update(_lint_batch(str(root), batch))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch_results in pool.map(_lint_batch, [str(root)] * len(batches), batches):
+                results.update(batch_results)
+
+    issues = [issue for rel_file in files for issue in results[rel_file].issues]
+
+    vanilla = None
+    if vanilla_files is not None:
+        vanilla = {}
+        for path in vanilla_files:
+            rel = gamedata_relative(path)
+            vanilla[rel[:-len('.bin')] if rel.endswith('.bin') else rel] = path
+    resolver = InheritanceResolver(read) if read is not None else None
+
+    def has_struct(target: str, name: str) -> Optional[bool]:
+        """Whether `target` defines `name`; None when it cannot be told"""
+        if target in results:
+            return name in results[target].names
+        path = vanilla.get(target) if vanilla is not None else None
+        if path is None:
+            return None
+        if sid_index is not None and any(entry.file == path for entry in sid_index.lookup(name)):
+            return True
+        if resolver is None:
+            return None
+        try:
+            return resolver.find_struct(path, name) is not None
+        except (CfgResolveError, CfgBinError, OSError):
+            return None
+
+    for rel_file in files:
+        for ref in results[rel_file].references:
+            target = rel_file
+            if ref.refurl:
+                target = refurl_target(rel_file, ref.refurl)
+                if target is None:
+                    issues.append(LintIssue(rel_file, ref.line, 'error', f"refurl {ref.refurl} points outside GameData"))
+                    continue
+                if target not in results and vanilla is not None and target not in vanilla:
+                    issues.append(LintIssue(rel_file, ref.line, 'error',
+                                            f"refurl {ref.refurl} points to a missing file ({target})"))
+                    continue
+            name = ref.refkey or ref.struct
+            if has_struct(target, name) is False:
+                issues.append(LintIssue(rel_file, ref.line, 'error', f"refkey {name} is not defined in {target}"))
+
+        if baseline is None:
+            continue
+        for item in results[rel_file].values:
+            expected = baseline.value(item.sid, item.path, item.hint)
+            if expected is None:
+                continue
+            expected_kind, kind = _kind(expected), _kind(item.value)
+            if expected_kind in ('number', 'bool') and kind != expected_kind:
+                issues.append(LintIssue(rel_file, item.line, 'error',
+                                        f"{item.path} = {item.value}: expected a {expected_kind} "
+                                        f"(vanilla {item.sid}: {expected})"))
+            elif expected_kind == 'enum' and kind != 'enum':
+                issues.append(LintIssue(rel_file, item.line, 'warning',
+                                        f"{item.path} = {item.value}: vanilla {item.sid} uses an enum ({expected})"))
+
+    logger.info(f"Lint: {len(files)} file(s), {len(issues)} issue(s) ({time.perf_counter() - start:.2f}s)")
+    return issues
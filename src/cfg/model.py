@@ -0,0 +1,244 @@
+"""Compact read-only cfg trees: the whole GameData resident as flat arrays over lazily mapped sources"""
+
+import marshal
+import mmap
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.core.extraction_store import ExtractionStore
+from .binary import CfgBinError, is_cfg_bin
+from .cache import get_parse_cache
+from .document import PARSER_VERSION, CfgDocument
+from .sid_index import list_cfg_files
+
+
+class KeyTable:
+    """Key and struct names shared by every tree of a model, stored once as interned strings"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def id(self, name: str) -> int:
+        number = self.ids.get(name)
+        if number is None:
+            number = self.ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return number
+
+
+class CfgTree:
+    """
+    One file as parallel arrays (4 bytes per field):
+
+        structs  name id, parent struct (-1 for top level), start, end, refs start/end
+        values   key id, struct (-1 outside structs), value start, value end
+
+    No per-node Python objects and no path strings are kept; names come from the
+    model's KeyTable and value text is sliced from the source only when read.
+    """
+
+    __slots__ = ('model', 'file', 'struct_name', 'struct_parent', 'struct_start', 'struct_end',
+                 'refs_start', 'refs_end', 'value_key', 'value_struct', 'value_start', 'value_end')
+
+    def __init__(self, model: 'GameDataModel', file: str, struct_rows, value_rows):
+        self.model = model
+        self.file = file
+        key_id = model.keys.id
+        self.struct_name = array('i', [key_id(row[0]) for row in struct_rows])
+        self.struct_parent = array('i', [row[1] for row in struct_rows])
+        self.struct_start = array('i', [row[2] for row in struct_rows])
+        self.struct_end = array('i', [row[3] for row in struct_rows])
+        self.refs_start = array('i', [row[4] for row in struct_rows])
+        self.refs_end = array('i', [row[5] for row in struct_rows])
+        self.value_key = array('i', [key_id(row[0]) for row in value_rows])
+        self.value_struct = array('i', [row[1] for row in value_rows])
+        self.value_start = array('i', [row[2] for row in value_rows])
+        self.value_end = array('i', [row[3] for row in value_rows])
+
+    def __len__(self):
+        return len(self.value_key)
+
+    @property
+    def struct_count(self) -> int:
+        return len(self.struct_name)
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).itemsize * len(getattr(self, name)) for name in self.__slots__[2:])
+
+    # Структуры
+
+    def struct_path(self, struct: int) -> str:
+        names = self.model.keys.names
+        parts = []
+        while struct >= 0:
+            parts.append(names[self.struct_name[struct]])
+            struct = self.struct_parent[struct]
+        return '/'.join(reversed(parts))
+
+    def refs(self, struct: int) -> Dict[str, str]:
+        if self.refs_start[struct] < 0:
+            return {}
+        result = {}
+        for part in self.model.text(self.file, self.refs_start[struct], self.refs_end[struct]).split(';'):
+            key, sep, value = part.partition('=')
+            if sep:
+                result[key.strip()] = value.strip()
+        return result
+
+    def struct_values(self, struct: int) -> List[int]:
+        return [i for i, owner in enumerate(self.value_struct) if owner == struct]
+
+    def sid(self, struct: int) -> Optional[str]:
+        sid_id = self.model.keys.ids.get('SID')
+        for i, owner in enumerate(self.value_struct):
+            if owner == struct and self.value_key[i] == sid_id:
+                return sys.intern(self.text(i).strip())
+        return None
+
+    # Значения
+
+    def key(self, value: int) -> str:
+        return self.model.keys.names[self.value_key[value]]
+
+    def path(self, value: int) -> str:
+        struct = self.value_struct[value]
+        return f"{self.struct_path(struct)}/{self.key(value)}" if struct >= 0 else self.key(value)
+
+    def text(self, value: int) -> str:
+        return self.model.text(self.file, self.value_start[value], self.value_end[value])
+
+    def raw(self, value: int) -> bytes:
+        return self.model.raw(self.file, self.value_start[value], self.value_end[value])
+
+    def values_with_key(self, key: str) -> List[int]:
+        key_id = self.model.keys.ids.get(key)
+        if key_id is None:
+            return []
+        return [i for i, k in enumerate(self.value_key) if k == key_id]
+
+    def to_document(self) -> CfgDocument:
+        """Editable CfgDocument of the same file"""
+        return CfgDocument.from_bytes(bytes(self.model.buffer(self.file)), self.file, self.model.cache)
+
+
+class GameDataModel:
+    """
+    Every GameData cfg of an extraction as CfgTree arrays. Indexes come from the
+    parse cache when possible, sources are only kept in a small LRU of mapped
+    files (`max_open`), so resident memory is the arrays plus the key table.
+    """
+
+    def __init__(self, extract_dir: Path, cache=None, max_open: int = 64):
+        self.extract_dir = Path(extract_dir)
+        self.cache = cache if cache is not None else get_parse_cache()
+        self.max_open = max_open
+        self.keys = KeyTable()
+        self.trees: Dict[str, CfgTree] = {}
+        self.source_bytes = 0
+        self._store = ExtractionStore.open(self.extract_dir)
+        self._open: 'OrderedDict[str, object]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            for buffer in self._open.values():
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+            self._open.clear()
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def _load_source(self, file: str):
+        if is_cfg_bin(file):
+            raise CfgBinError(f"{file}: the .cfg.bin format is not decoded yet")
+        if self._store is not None:
+            return self._store.read(file)
+        path = self.extract_dir / file
+        if path.stat().st_size > 0:
+            with open(path, 'rb') as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return path.read_bytes()
+
+    def buffer(self, file: str):
+        with self._lock:
+            buffer = self._open.get(file)
+            if buffer is not None:
+                self._open.move_to_end(file)
+                return buffer
+            buffer = self._load_source(file)
+            self._open[file] = buffer
+            while len(self._open) > self.max_open:
+                _, old = self._open.popitem(last=False)
+                if isinstance(old, mmap.mmap):
+                    old.close()
+            return buffer
+
+    def raw(self, file: str, start: int, end: int) -> bytes:
+        return self.buffer(file)[start:end]
+
+    def text(self, file: str, start: int, end: int) -> str:
+        return self.raw(file, start, end).decode('utf-8', errors='replace')
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _index_rows(self, file: str) -> Tuple[tuple, tuple]:
+        buffer = self.buffer(file)
+        self.source_bytes += len(buffer)
+        key = self.cache.key(buffer, PARSER_VERSION)
+        cached = self.cache.get(key)
+        if cached is not None:
+            try:
+                version, struct_rows, value_rows = marshal.loads(cached)
+                if version == PARSER_VERSION:
+                    return struct_rows, value_rows
+            except (ValueError, EOFError, TypeError):
+                pass
+        payload = CfgDocument.from_bytes(buffer, file).dump_index()
+        self.cache.put(key, payload)
+        version, struct_rows, value_rows = marshal.loads(payload)
+        return struct_rows, value_rows
+
+    def load(self, files: Optional[List[str]] = None) -> 'GameDataModel':
+        for file in files if files is not None else list_cfg_files(self.extract_dir):
+            if file in self.trees:
+                continue
+            try:
+                struct_rows, value_rows = self._index_rows(file)
+            except (CfgBinError, OSError):
+                continue
+            self.trees[file] = CfgTree(self, file, struct_rows, value_rows)
+        return self
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def values_with_key(self, key: str) -> Iterator[Tuple[CfgTree, int]]:
+        for tree in self.trees.values():
+            for value in tree.values_with_key(key):
+                yield tree, value
+
+    def nbytes(self) -> int:
+        """Approximate resident size: tree arrays plus the shared key table"""
+        arrays = sum(tree.nbytes() + sys.getsizeof(tree) for tree in self.trees.values())
+        names = sum(sys.getsizeof(name) for name in self.keys.names)
+        return arrays + names + sys.getsizeof(self.keys.ids) + sys.getsizeof(self.trees)
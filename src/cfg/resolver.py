@@ -0,0 +1,266 @@
+"""refkey/refurl inheritance resolver: flattens prototypes into their effective key/value trees"""
+
+import hashlib
+import posixpath
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .binary import parse_cfg
+from .cache import get_parse_cache
+from .document import CfgDocument, CfgStruct
+
+# Effective tree: key -> value text or nested tree. Trees returned by the resolver
+# are shared between descendants and must be treated as read-only.
+Tree = Dict[str, Union[str, 'Tree']]
+
+
+class CfgResolveError(Exception):
+    pass
+
+
+def _merge(base: Tree, own: Tree) -> Tree:
+    """Overlays `own` on `base`; untouched nested trees of the base are shared, not copied"""
+    result = dict(base)
+    next_index = sum(1 for key in base if key.startswith('[') and key[1:-1].isdigit())
+    for key, value in own.items():
+        if key.startswith('[*]#'):
+            # [*] добавляет новый элемент массива
+            key = f"[{next_index}]"
+            next_index += 1
+        if isinstance(value, dict):
+            current = result.get(key)
+            result[key] = _merge(current if isinstance(current, dict) else {}, value)
+        else:
+            result[key] = value
+    return result
+
+
+def get_path(tree: Tree, path: str):
+    """Value at 'A/B/Key' in an effective tree (None if missing)"""
+    node = tree
+    for part in path.split('/'):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+
+class InheritanceResolver:
+    """
+    Resolves `{refkey=X}` (struct X in the same file) and `{refurl=../File.cfg;refkey=X}`
+    (struct X in another file, path relative to the referencing file) chains.
+
+    Every resolved struct, ancestors included, is memoized, so resolving all
+    descendants of a base costs one pass over the base. Each memo entry remembers
+    the files its chain was built from; when a file's content hash changes
+    (refresh()) or it is invalidated explicitly, only entries depending on it are dropped.
+    """
+
+    def __init__(self, read_bytes: Callable[[str], bytes], sid_index=None, cache=None):
+        self.read_bytes = read_bytes
+        self.sid_index = sid_index
+        self.cache = cache if cache is not None else get_parse_cache()
+        self._docs: Dict[str, CfgDocument] = {}
+        self._hashes: Dict[str, str] = {}
+        self._top_level: Dict[str, Dict[str, CfgStruct]] = {}
+        self._layouts: Dict[str, Dict[int, Tuple[list, list]]] = {}
+        self._resolved: Dict[Tuple[str, str], Tree] = {}
+        self._depends: Dict[Tuple[str, str], Set[str]] = {}
+        self._dependents: Dict[str, Set[Tuple[str, str]]] = {}
+        self._in_progress: Set[Tuple[str, str]] = set()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Documents
+    # ------------------------------------------------------------------
+
+    def document(self, file: str) -> CfgDocument:
+        doc = self._docs.get(file)
+        if doc is None:
+            data = self.read_bytes(file)
+            self._hashes[file] = hashlib.sha1(data).hexdigest()
+            doc = parse_cfg(data, file, self.cache)
+            self._docs[file] = doc
+        return doc
+
+    def _top_level_structs(self, file: str) -> Dict[str, CfgStruct]:
+        """Top-level structs of a file by name and by SID"""
+        table = self._top_level.get(file)
+        if table is None:
+            doc = self.document(file)
+            table = {}
+            for struct in doc.structs:
+                if struct.parent is None:
+                    table.setdefault(struct.name, struct)
+            for value in doc.values:
+                if value.key == 'SID' and value.struct is not None and value.struct.parent is None:
+                    table.setdefault(value.text.strip(), value.struct)
+            self._top_level[file] = table
+        return table
+
+    def find_struct(self, file: str, name: str) -> Optional[CfgStruct]:
+        if '/' in name:
+            return next((s for s in self.document(file).structs if s.path == name), None)
+        return self._top_level_structs(file).get(name)
+
+    # ------------------------------------------------------------------
+    # Resolution
+    # ------------------------------------------------------------------
+
+    def _layout(self, file: str) -> Dict[int, Tuple[list, list]]:
+        """id(struct) -> (direct values, direct child structs), built in one pass over the file"""
+        layout = self._layouts.get(file)
+        if layout is None:
+            doc = self.document(file)
+            layout = {}
+            for struct in doc.structs:
+                layout[id(struct)] = ([], [])
+                if struct.parent is not None:
+                    layout[id(struct.parent)][1].append(struct)
+            for value in doc.values:
+                if value.struct is not None:
+                    layout[id(value.struct)][0].append(value)
+            self._layouts[file] = layout
+        return layout
+
+    def _own_tree(self, file: str, struct: CfgStruct) -> Tuple[Tree, Set[str]]:
+        """
+        Values and nested structs written in `struct` itself, '[*]' items kept as
+        placeholders so they append to the inherited array. Nested structs with refs
+        of their own are resolved (and memoized) separately.
+        """
+        values, nested = self._layout(file)[id(struct)]
+        tree: Tree = {}
+        depends: Set[str] = set()
+        star = 0
+        for child in sorted(values + nested, key=lambda node: node.start):
+            key = child.name if isinstance(child, CfgStruct) else child.key
+            if key == '[*]':
+                key = f"[*]#{star}"
+                star += 1
+            if isinstance(child, CfgStruct):
+                if child.refs:
+                    tree[key] = self.resolve_struct(file, child)
+                    depends |= self._depends.get((file, child.start), set())
+                else:
+                    tree[key], child_depends = self._own_tree(file, child)
+                    depends |= child_depends
+            else:
+                tree[key] = child.text
+        return tree, depends
+
+    def _base_of(self, file: str, struct: CfgStruct) -> Optional[Tuple[str, CfgStruct]]:
+        refs = struct.refs
+        refurl, refkey = refs.get('refurl'), refs.get('refkey')
+        if not refurl and not refkey:
+            return None
+
+        target_file = file
+        if refurl:
+            target_file = posixpath.normpath(posixpath.join(posixpath.dirname(file), refurl))
+        target_name = refkey or struct.name
+
+        try:
+            target = self.find_struct(target_file, target_name)
+        except OSError as e:
+            raise CfgResolveError(f"{file}:{struct.path} refers to missing {target_file}: {e}")
+        if target is None:
+            raise CfgResolveError(f"{file}:{struct.path} refers to unknown {target_name} in {target_file}")
+        if target_file == file and target is struct:
+            return None
+        return target_file, target
+
+    def resolve_struct(self, file: str, struct: CfgStruct) -> Tree:
+        # Путь структуры не уникален (одноимённые структуры, [*]), смещение — уникально
+        memo_key = (file, struct.start)
+        cached = self._resolved.get(memo_key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        if memo_key in self._in_progress:
+            raise CfgResolveError(f"inheritance cycle at {file}:{struct.path}")
+        self._in_progress.add(memo_key)
+        try:
+            depends = {file}
+
+            base: Tree = {}
+            base_ref = self._base_of(file, struct)
+            if base_ref is not None:
+                base_file, base_struct = base_ref
+                base = self.resolve_struct(base_file, base_struct)
+                depends |= self._depends.get((base_file, base_struct.start), {base_file})
+
+            own, own_depends = self._own_tree(file, struct)
+            depends |= own_depends
+            tree = _merge(base, own)
+        finally:
+            self._in_progress.discard(memo_key)
+
+        self._resolved[memo_key] = tree
+        self._depends[memo_key] = depends
+        for dep in depends:
+            self._dependents.setdefault(dep, set()).add(memo_key)
+        return tree
+
+    def resolve(self, file: str, name: str) -> Tree:
+        """Effective tree of a top-level struct (by name or SID) or a struct path in `file`"""
+        struct = self.find_struct(file, name)
+        if struct is None:
+            raise CfgResolveError(f"{name} not found in {file}")
+        return self.resolve_struct(file, struct)
+
+    def resolve_sid(self, sid: str, file_hint: Optional[str] = None) -> Tree:
+        """Effective tree of a SID located through the SID index"""
+        if self.sid_index is None:
+            raise CfgResolveError("no SID index to locate prototypes")
+        entry = self.sid_index.find(sid, file_hint)
+        if entry is None:
+            raise CfgResolveError(f"SID {sid} is not defined in any indexed file")
+        return self.resolve(entry.file, entry.path)
+
+    def effective_value(self, file: str, name: str, key_path: str) -> Optional[str]:
+        value = get_path(self.resolve(file, name), key_path)
+        return value if isinstance(value, str) else None
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def invalidate(self, file: str):
+        """Drops a file and every resolved tree whose chain goes through it"""
+        self._docs.pop(file, None)
+        self._hashes.pop(file, None)
+        self._top_level.pop(file, None)
+        self._layouts.pop(file, None)
+        for memo_key in self._dependents.pop(file, set()):
+            self._resolved.pop(memo_key, None)
+            for dep in self._depends.pop(memo_key, set()):
+                if dep != file:
+                    self._dependents.get(dep, set()).discard(memo_key)
+
+    def refresh(self) -> List[str]:
+        """Re-hashes every loaded file and invalidates the changed ones; returns them"""
+        changed = []
+        for file, old_hash in list(self._hashes.items()):
+            try:
+                new_hash = hashlib.sha1(self.read_bytes(file)).hexdigest()
+            except OSError:
+                new_hash = None
+            if new_hash != old_hash:
+                changed.append(file)
+                self.invalidate(file)
+        return changed
+
+
+def extraction_reader(extract_dir: Path) -> Callable[[str], bytes]:
+    """read_bytes for files of an extraction folder (loose files or its container)"""
+    from src.core.extraction_store import ExtractionStore
+
+    store = ExtractionStore.open(extract_dir)
+    if store is not None:
+        return store.read
+    root = Path(extract_dir)
+    return lambda file: (root / file).read_bytes()
@@ -0,0 +1,193 @@
+"""SID index over every GameData cfg of an extraction, built in parallel and stored next to it"""
+
+import logging
+import marshal
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.core.extraction_store import ExtractionStore, has_container, in_scope
+from .binary import CfgBinError, parse_cfg
+from .cache import get_parse_cache
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".extraction_sid_index"
+INDEX_VERSION = 1
+
+GAMEDATA_PATH = "Stalker2/Content/GameLite/GameData"
+
+BATCH_SIZE = 64
+
+
+class SidEntry(NamedTuple):
+    """Where a prototype is defined; start/end are byte offsets in the file"""
+    file: str
+    path: str
+    start: int
+    end: int
+    refurl: Optional[str]
+    refkey: Optional[str]
+
+
+def _is_cfg(path: str) -> bool:
+    return path.endswith('.cfg') or path.endswith('.cfg.bin')
+
+
+def list_cfg_files(extract_dir: Path) -> List[str]:
+    """GameData cfg files of an extraction (loose or container), relative to its root"""
+    if has_container(extract_dir):
+        with ExtractionStore.open(extract_dir) as store:
+            return sorted(p for p in store.paths() if in_scope(p, 'gamedata') and _is_cfg(p))
+
+    root = Path(extract_dir)
+    game_data = root / GAMEDATA_PATH
+    result = []
+    for dirpath, dirnames, filenames in os.walk(game_data):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        result.extend(f"{rel_dir}/{name}" for name in filenames if _is_cfg(name))
+    return sorted(result)
+
+
+def _index_document(doc, file: str, sids: Dict[str, List[tuple]]) -> List[str]:
+    sid_values = {}
+    keys = set()
+    for value in doc.values:
+        keys.add(value.key)
+        if value.key == 'SID' and value.struct is not None:
+            sid_values[id(value.struct)] = value.text.strip()
+
+    for struct in doc.structs:
+        sid = sid_values.get(id(struct))
+        if sid is None and struct.parent is None:
+            sid = struct.name
+        if not sid:
+            continue
+        refs = struct.refs
+        sids.setdefault(sid, []).append((file, struct.path, struct.start, struct.end or -1, refs.get('refurl'), refs.get('refkey')))
+
+    return sorted(keys)
+
+
+def _index_batch(extract_dir: str, files: List[str]) -> Tuple[Dict[str, List[tuple]], Dict[str, List[str]]]:
+    """Worker: parses a batch of files and returns (sid -> rows, file -> keys)"""
+    sids: Dict[str, List[tuple]] = {}
+    file_keys: Dict[str, List[str]] = {}
+    # Разобранные здесь файлы попадают в кэш и для индекса ключей, и для модулей
+    cache = get_parse_cache()
+    store = ExtractionStore.open(Path(extract_dir))
+    try:
+        for file in files:
+            try:
+                data = store.read(file) if store is not None else (Path(extract_dir) / file).read_bytes()
+                doc = parse_cfg(data, file, cache)
+                file_keys[file] = _index_document(doc, file, sids)
+            except (CfgBinError, OSError) as e:
+                logger.debug(f"SID index: skipped {file}: {e}")
+    finally:
+        if store is not None:
+            store.close()
+    return sids, file_keys
+
+
+class SidIndex:
+    """SID -> definitions, plus the set of keys used in each file"""
+
+    def __init__(self, sids: Dict[str, List[tuple]], file_keys: Dict[str, List[str]]):
+        self._sids = sids
+        self.file_keys = file_keys
+
+    def __len__(self):
+        return len(self._sids)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._sids
+
+    def entries(self) -> Iterator[SidEntry]:
+        """Every definition of every SID"""
+        for rows in self._sids.values():
+            for row in rows:
+                yield SidEntry(*row)
+
+    def items(self) -> Iterator[Tuple[str, SidEntry]]:
+        """(SID, definition) pairs; the SID of a top-level struct without one is its name"""
+        for sid, rows in self._sids.items():
+            for row in rows:
+                yield sid, SidEntry(*row)
+
+    def lookup(self, sid: str) -> List[SidEntry]:
+        return [SidEntry(*row) for row in self._sids.get(sid, ())]
+
+    def find(self, sid: str, file_hint: Optional[str] = None) -> Optional[SidEntry]:
+        """First definition of a SID, preferring files whose name contains `file_hint`"""
+        entries = self.lookup(sid)
+        if file_hint:
+            hinted = [entry for entry in entries if file_hint in entry.file]
+            entries = hinted or entries
+        return entries[0] if entries else None
+
+    def files_with_key(self, key: str) -> List[str]:
+        return [file for file, keys in self.file_keys.items() if key in keys]
+
+    def sids_in(self, file_part: str) -> List[str]:
+        """SIDs defined in files whose path contains `file_part` (e.g. 'WeaponPrototypes')"""
+        return sorted(sid for sid, rows in self._sids.items() if any(file_part in row[0] for row in rows))
+
+    def save(self, extract_dir: Path):
+        index_file = Path(extract_dir) / INDEX_FILE
+        tmp_file = index_file.with_name(INDEX_FILE + '.tmp')
+        tmp_file.write_bytes(marshal.dumps((INDEX_VERSION, self._sids, self.file_keys)))
+        os.replace(tmp_file, index_file)
+
+    @classmethod
+    def load(cls, extract_dir: Path) -> Optional['SidIndex']:
+        index_file = Path(extract_dir) / INDEX_FILE
+        try:
+            version, sids, file_keys = marshal.loads(index_file.read_bytes())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        if version != INDEX_VERSION:
+            return None
+        return cls(sids, file_keys)
+
+
+def build_sid_index(extract_dir: Path, workers: Optional[int] = None) -> SidIndex:
+    """Parses every GameData cfg of the extraction across worker processes and saves the index"""
+    start = time.perf_counter()
+    files = list_cfg_files(extract_dir)
+    batches = [files[i:i + BATCH_SIZE] for i in range(0, len(files), BATCH_SIZE)]
+
+    sids: Dict[str, List[tuple]] = {}
+    file_keys: Dict[str, List[str]] = {}
+
+    def merge(result):
+        batch_sids, batch_keys = result
+        for sid, rows in batch_sids.items():
+            sids.setdefault(sid, []).extend(rows)
+        file_keys.update(batch_keys)
+
+    if len(batches) <= 1:
+        for batch in batches:
+            merge(_index_batch(str(extract_dir), batch))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_index_batch, [str(extract_dir)] * len(batches), batches):
+                merge(result)
+
+    for rows in sids.values():
+        rows.sort()
+
+    index = SidIndex(sids, file_keys)
+    index.save(extract_dir)
+    logger.info(f"SID index: {len(sids)} SIDs in {len(files)} files ({time.perf_counter() - start:.1f}s)")
+    return index
+
+
+def get_sid_index(extract_dir: Path, build: bool = True) -> Optional[SidIndex]:
+    """Index saved next to the extraction; built on first use"""
+    index = SidIndex.load(extract_dir)
+    if index is None and build:
+        index = build_sid_index(extract_dir)
+    return index
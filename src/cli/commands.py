@@ -0,0 +1,252 @@
+"""Non-interactive commands: python main.py <command> [options]"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List
+
+from ..cfg.delta import gamedata_relative
+from ..cfg.diff import diff_extractions
+from ..cfg.key_index import get_key_index
+from ..cfg.resolver import extraction_reader
+from ..core.extraction import get_latest_extraction, list_extractions
+from ..i18n import _
+
+EXTRACT_ROOT = Path("data/extract")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main.py", description=_("S.T.A.L.K.E.R. 2 Mod Builder commands"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help=_("Find where a cfg key is set in GameData"))
+    query.add_argument("key", help=_("Key name, prefix (Durability*) or wildcard (*SellMin*)"))
+    query.add_argument("--value", help=_("Only values matching this pattern (e.g. '0.*')"))
+    query.add_argument("--file", help=_("Only files whose path contains this text or matches this pattern"))
+    query.add_argument("--limit", type=int, default=200, help=_("Maximum number of results (0 = all)"))
+    query.add_argument("--extraction", type=Path, help=_("Extraction folder (latest by default)"))
+    query.set_defaults(handler=cmd_query)
+
+    diff = commands.add_parser("diff-extractions", help=_("Show which keys a game patch changed, by module"))
+    diff.add_argument("old", type=Path, nargs="?", help=_("Older extraction folder (second newest by default)"))
+    diff.add_argument("new", type=Path, nargs="?", help=_("Newer extraction folder (newest by default)"))
+    diff.add_argument("--all", action="store_true", help=_("Also list changes no module targets"))
+    diff.set_defaults(handler=cmd_diff_extractions)
+
+    build = commands.add_parser("build", help=_("Build one modpack for several game versions at once"))
+    build.add_argument("config", type=Path, help=_("JSON file with module configurations ({module: config})"))
+    build.add_argument("--target", action="append",
+                       help=_("Extraction folder or game version (e.g. 1.8.1, 1.7); repeat for each version"))
+    build.add_argument("--name", help=_("Mod name (artifacts get a version suffix)"))
+    build.add_argument("--dry-run", action="store_true",
+                       help=_("Only show what the modpack changes against the current game files"))
+    build.add_argument("--json", action="store_true", help=_("Print the dry-run report as JSON"))
+    build.set_defaults(handler=cmd_build)
+
+    conflicts = commands.add_parser("mod-conflicts", help=_("Show files that several installed mods ship"))
+    conflicts.add_argument("--mods-dir", type=Path, help=_("~mods folder (of the configured game by default)"))
+    conflicts.add_argument("--files", action="store_true", help=_("List every overlapping file"))
+    conflicts.set_defaults(handler=cmd_mod_conflicts)
+
+    merge = commands.add_parser("merge-mods", help=_("Merge several mod paks into one pak"))
+    merge.add_argument("paks", nargs="+", help=_("Pak files, or names of paks in the ~mods folder"))
+    merge.add_argument("--name", required=True, help=_("Name of the merged pak (written to output/paks)"))
+    merge.add_argument("--mods-dir", type=Path, help=_("~mods folder (of the configured game by default)"))
+    merge.set_defaults(handler=cmd_merge_mods)
+
+    return parser
+
+
+def _extraction(path) -> Path:
+    extract_dir = path or get_latest_extraction(EXTRACT_ROOT)
+    if extract_dir is None:
+        raise SystemExit(_("No completed extraction found. Extract game files first."))
+    return extract_dir
+
+
+def cmd_query(args) -> int:
+    extract_dir = _extraction(args.extraction)
+    index = get_key_index(extract_dir)
+
+    start = time.perf_counter()
+    hits = index.query(args.key, args.value, args.file, read=extraction_reader(extract_dir),
+                       limit=args.limit or None)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for hit in hits:
+        value = hit.value if hit.value is not None else "..."
+        print(f"{gamedata_relative(hit.file)}  {hit.path} = {value}")
+
+    print(_("{} result(s) in {:.1f} ms").format(len(hits), elapsed))
+    if args.limit and len(hits) >= args.limit:
+        print(_("Output limited to {} results (--limit 0 shows all)").format(args.limit))
+    return 0
+
+
+def _print_changes(file: str, changes) -> None:
+    print(f"  {file}")
+    marks = {'added': '+', 'removed': '-', 'changed': '~'}
+    for change in changes:
+        if change.kind == 'changed':
+            print(f"    ~ {change.path}: {change.old} -> {change.new}")
+        else:
+            print(f"    {marks[change.kind]} {change.path} = {change.old if change.new is None else change.new}")
+
+
+def cmd_diff_extractions(args) -> int:
+    from ..modules.module_loader import ModuleLoader
+
+    if args.old is None or args.new is None:
+        extractions = list_extractions(EXTRACT_ROOT)
+        if len(extractions) < 2:
+            raise SystemExit(_("Two completed extractions are needed to compare."))
+        new_dir, old_dir = args.new or extractions[0], args.old or extractions[1]
+    else:
+        old_dir, new_dir = args.old, args.new
+
+    start = time.perf_counter()
+    result = diff_extractions(old_dir, new_dir)
+
+    module_loader = ModuleLoader()
+    module_loader.discover_modules()
+    modules = module_loader.get_available_modules()
+
+    # Изменения раскладываются по модулям, которые правят эти ключи
+    by_module = {module.display_name: {} for module in modules}
+    untargeted = {}
+    for file, changes in result.keys.items():
+        file = gamedata_relative(file)
+        for change in changes:
+            owners = [module.display_name for module in modules if module.targets(file, change.path)]
+            for owner in owners:
+                by_module[owner].setdefault(file, []).append(change)
+            if not owners:
+                untargeted.setdefault(file, []).append(change)
+    elapsed = time.perf_counter() - start
+
+    print(_("{} -> {}").format(old_dir.name, new_dir.name))
+    print(_("Files: {} changed, {} added, {} removed (of {})").format(
+        len(result.changed), len(result.added), len(result.removed), result.total))
+
+    for name, files in by_module.items():
+        if not files:
+            continue
+        print(f"\n== {name}")
+        for file, changes in sorted(files.items()):
+            _print_changes(file, changes)
+
+    affected = [name for name, files in by_module.items() if files]
+    untargeted_keys = sum(len(changes) for changes in untargeted.values())
+    if args.all and untargeted:
+        print("\n== " + _("Not targeted by any module"))
+        for file, changes in sorted(untargeted.items()):
+            _print_changes(file, changes)
+    print()
+    print(_("{} module(s) affected; {} other key change(s) in {} file(s)").format(
+        len(affected), untargeted_keys, len(untargeted)))
+    print(_("Compared in {:.2f}s").format(elapsed))
+    return 0
+
+
+def cmd_build(args) -> int:
+    from ..config.config_manager import ConfigManager
+    from ..core.mod_builder import ModBuilder
+    from ..core.pak_manager import PakManager
+    from ..modules.module_loader import ModuleLoader
+
+    configurations = json.loads(args.config.read_text(encoding='utf-8'))
+    config_manager = ConfigManager()
+    module_loader = ModuleLoader()
+    module_loader.discover_modules()
+    builder = ModBuilder(config_manager, PakManager(config_manager), module_loader)
+
+    if args.dry_run:
+        if args.target:
+            raise SystemExit(_("--dry-run previews the current game files and takes no --target"))
+        return 0 if builder.build_mod(configurations, args.name, dry_run=True, as_json=args.json) else 1
+    if not args.target:
+        raise SystemExit(_("At least one --target is needed (or --dry-run)"))
+
+    try:
+        results = builder.build_mod_versions(configurations, args.target, args.name)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return 0 if results and all(results.values()) else 1
+
+
+def cmd_mod_conflicts(args) -> int:
+    from ..config.config_manager import ConfigManager
+    from ..core.pak_manager import PakManager
+
+    pak_manager = PakManager(ConfigManager())
+    mods_dir = args.mods_dir or pak_manager.get_mods_dir()
+    if mods_dir is None or not mods_dir.is_dir():
+        raise SystemExit(_("~mods folder not found. Set the game path or pass --mods-dir."))
+
+    start = time.perf_counter()
+    scan = pak_manager.scan_installed_mods(mods_dir)
+    elapsed = time.perf_counter() - start
+
+    groups = scan.by_paks()
+    for paks, paths in groups.items():
+        # Победитель загружается последним
+        print(_("{} wins over {}: {} file(s)").format(paks[-1].name, ', '.join(p.name for p in paks[:-1]),
+                                                     len(paths)))
+        for path in paths if args.files else paths[:3]:
+            print(f"    {path}")
+        if not args.files and len(paths) > 3:
+            print("    " + _("... {} more (--files lists all)").format(len(paths) - 3))
+    for pak_file, reason in scan.unreadable.items():
+        print(_("Cannot read {}: {}").format(pak_file.name, reason))
+
+    print()
+    print(_("{} pak(s), {} file(s), {} overlapping ({:.3f}s)").format(
+        len(scan.paks), len(scan.files), len(scan.overlaps), elapsed))
+    return 0
+
+
+def cmd_merge_mods(args) -> int:
+    from ..config.config_manager import ConfigManager
+    from ..core.pak_manager import PakManager
+
+    pak_manager = PakManager(ConfigManager())
+    mods_dir = args.mods_dir or pak_manager.get_mods_dir()
+    paks = []
+    for name in args.paks:
+        pak_file = Path(name)
+        if not pak_file.is_file() and mods_dir is not None:
+            pak_file = mods_dir / name
+        if not pak_file.is_file():
+            raise SystemExit(_("Pak not found: {}").format(name))
+        paks.append(pak_file)
+    if len({p.resolve() for p in paks}) < 2:
+        raise SystemExit(_("At least two different paks are needed to merge."))
+
+    start = time.perf_counter()
+    output_pak = Path("output/paks") / f"{args.name}.pak"
+    result = pak_manager.merge_mods(paks, output_pak)
+    if result is None:
+        print(_("✗ Merge failed, see the log"))
+        return 1
+    elapsed = time.perf_counter() - start
+
+    for path in result.merged:
+        print(_("Merged: {}").format(path))
+    for conflict in result.conflicts:
+        values = ', '.join(f"{pak}={value}" for pak, value in conflict.values.items())
+        print(_("Conflict: {} {} ({}); kept {}").format(conflict.file, conflict.path, values, conflict.kept))
+    for file, path, pak in result.dropped:
+        print(_("Not merged: {} {} from {} (key is not in the merged file)").format(file, path, pak))
+    for path, pak_names in result.overridden.items():
+        print(_("Not a cfg, {} wins: {} (also in {})").format(pak_names[-1], path, ', '.join(pak_names[:-1])))
+
+    print()
+    print(_("{} file(s) from {} pak(s) -> {} ({:.2f}s)").format(len(result.files), len(paks), output_pak, elapsed))
+    print(_("Remove the merged paks from ~mods and install {} instead.").format(output_pak.name))
+    return 0
+
+
+def run(argv: List[str]) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
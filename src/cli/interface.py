@@ -3,6 +3,8 @@ from pathlib import Path
 from datetime import datetime
 from typing import Optional, List, Any
 from .menus import MenuSystem
+from ..core.extraction import list_extractions
+from ..core.game_vfs import extraction_root
 from .prompts import UserPrompts
 from ..i18n import i18n, _
 
@@ -34,16 +36,8 @@ class CLIInterface:
         return self._extraction_completed
     
     def _check_extraction_folder_size(self, extract_path: Path) -> bool:
-        """Проверяет размер папки распаковки"""
-        try:
-            for item in extract_path.iterdir():
-                if item.is_dir():
-                    folder_name = item.name.lower()
-                    if 'pakchunk' in folder_name:
-                        return True
-            return False
-        except Exception:
-            return False
+        """Проверяет, есть ли завершённая распаковка"""
+        return bool(list_extractions(extract_path))
     
     def _refresh_extraction_status(self):
         """Обновляет статус распаковки"""
@@ -198,18 +192,15 @@ class CLIInterface:
             result['warnings'].append(_("No extracted files found"))
             return result
         
-        # Находим самую свежую распакованную папку
-        extractions = []
-        for item in extract_path.iterdir():
-            if item.is_dir() and 'pakchunk' in item.name.lower():
-                extractions.append(item)
+        # Находим самую свежую завершённую распаковку
+        extractions = list_extractions(extract_path)
         
         if not extractions:
             result['warnings'].append(_("No extraction folders found"))
             return result
         
-        latest = max(extractions, key=lambda p: p.stat().st_mtime)
-        game_data = latest / "Stalker2" / "Content" / "GameLite" / "GameData"
+        latest = extractions[0]
+        game_data = extraction_root(latest) / "Stalker2" / "Content" / "GameLite" / "GameData"
         
         if not game_data.exists():
             result['warnings'].append(
@@ -367,6 +358,7 @@ class CLIInterface:
                 _("View Current Settings"),
                 _("Clear Cache"),
                 _("Refresh Extraction Status"),
+                _("Modpack Profiles"),
                 _("Language Settings"),
                 _("Back")
             ]
@@ -385,10 +377,91 @@ class CLIInterface:
                 self.prompts.show_success(f"{_('Extraction status refreshed')}: {status}")
                 input(_("Press Enter to continue..."))
             elif choice == "5":
+                self.profiles_menu()
+            elif choice == "6":
                 self.language_menu()
+            elif choice == "7":
+                break
+    
+    def profiles_menu(self):
+        """Меню профилей модпаков (~mods)"""
+        profile_manager = self.app.profile_manager
+        
+        while True:
+            active = profile_manager.get_active_profile()
+            options = [
+                _("Activate Profile"),
+                _("Save Built Paks as Profile"),
+                _("Save Current ~mods as Profile"),
+                _("Delete Profile"),
+                _("Deactivate Profile"),
+                _("Back")
+            ]
+            
+            choice = self.menu_system.show_menu(
+                _("Modpack Profiles (active: {})").format(active or _("none")),
+                options
+            )
+            
+            if choice == "1":
+                name = self._select_profile()
+                if name:
+                    self._show_profile_stats(profile_manager.activate_profile(name))
+            elif choice == "2":
+                paks = sorted(Path("output/paks").glob("*.pak"))
+                if not paks:
+                    self.prompts.show_error(_("No built paks found in output/paks"))
+                    continue
+                selected = [p for p in paks if self.prompts.confirm(_("Include {}?").format(p.name))]
+                name = self.prompts.get_string(_("Profile name: "), allow_empty=False)
+                if name and profile_manager.create_profile(name, selected):
+                    self.prompts.show_success(_("Profile {} saved").format(name))
+                else:
+                    self.prompts.show_error(_("Failed to save profile"))
+            elif choice == "3":
+                name = self.prompts.get_string(_("Profile name: "), allow_empty=False)
+                if name and profile_manager.snapshot_mods_directory(name):
+                    self.prompts.show_success(_("Profile {} saved").format(name))
+                else:
+                    self.prompts.show_error(_("Failed to save profile"))
+            elif choice == "4":
+                name = self._select_profile()
+                if name and self.prompts.confirm(_("Delete profile {}?").format(name)):
+                    profile_manager.delete_profile(name)
+                    profile_manager.collect_garbage()
+                    self.prompts.show_success(_("Profile {} deleted").format(name))
+            elif choice == "5":
+                self._show_profile_stats(profile_manager.deactivate())
             elif choice == "6":
                 break
     
+    def _select_profile(self) -> Optional[str]:
+        """Выбор сохранённого профиля"""
+        profiles = self.app.profile_manager.list_profiles()
+        if not profiles:
+            self.prompts.show_error(_("No profiles saved yet"))
+            return None
+        
+        choice = self.menu_system.show_menu(_("Select profile"), profiles + [_("Back")])
+        try:
+            idx = int(choice) - 1
+            if 0 <= idx < len(profiles):
+                return profiles[idx]
+        except ValueError:
+            self.prompts.show_error(_("Invalid selection"))
+        return None
+    
+    def _show_profile_stats(self, stats: Optional[dict]):
+        """Показывает результат синхронизации ~mods"""
+        if stats is None:
+            self.prompts.show_error(_("Profile switch failed"))
+            return
+        
+        print(_("Linked: {linked}, removed: {removed}, unchanged: {unchanged}, skipped: {skipped}").format(**stats))
+        if stats['copied']:
+            print(_("⚠ {} pak(s) were copied because links are not supported here").format(stats['copied']))
+        input(_("Press Enter to continue..."))
+    
     def show_current_settings(self):
         """Показывает текущие настройки"""
         self.clear_screen()
@@ -0,0 +1,145 @@
+"""Bulk rewrite: value rules over many GameData files at once, sharded across worker processes"""
+
+import fnmatch
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional
+
+from ..cfg.binary import CfgBinError, parse_cfg
+from ..cfg.delta import gamedata_relative, overlay_override, write_override
+from ..cfg.document import CfgDocument
+from ..cfg.expressions import RuleError, compile_rule
+from ..cfg.sid_index import GAMEDATA_PATH, list_cfg_files
+from .extraction_store import ExtractionStore
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 32
+
+
+class BulkRewriteError(Exception):
+    pass
+
+
+class RewrittenFile(NamedTuple):
+    file: str           # путь в GameData исходного файла
+    changed: int        # сколько значений изменено
+    output_file: str    # записанный файл (дельта или полный)
+
+
+def _rewrite_file(file: str, data: bytes, rules: List[str], game_data_path: Path,
+                  mod_name: str) -> Optional[RewrittenFile]:
+    rel_file = gamedata_relative(file)
+
+    # Полная копия, уже записанная другим модулем, правится на месте
+    shipped = game_data_path / (rel_file[:-len('.bin')] if rel_file.endswith('.bin') else rel_file)
+    if shipped.exists():
+        doc = CfgDocument.open(shipped)
+    else:
+        doc = parse_cfg(data, file)
+        # Правила применяются поверх дельты, которую мод уже записал
+        overlay_override(doc, rel_file, game_data_path, mod_name)
+
+    with doc:
+        changed = sum(compile_rule(rule).apply(doc) for rule in rules)
+        if not changed:
+            return None
+        output_file = write_override(doc, rel_file, game_data_path, mod_name)
+    if output_file is None:
+        return None
+    return RewrittenFile(rel_file, changed, str(output_file))
+
+
+def _rewrite_batch(read: Callable[[str], bytes], files: List[str], rules: List[str], game_data_path: Path,
+                   mod_name: str) -> List[RewrittenFile]:
+    results = []
+    for file in files:
+        try:
+            result = _rewrite_file(file, read(file), rules, game_data_path, mod_name)
+        except (CfgBinError, OSError) as e:
+            logger.debug(f"Bulk rewrite: skipped {file}: {e}")
+            continue
+        if result is not None:
+            results.append(result)
+    return results
+
+
+def _rewrite_batch_in_worker(extract_dir: str, files: List[str], rules: List[str], game_data_path: str,
+                             mod_name: str) -> List[RewrittenFile]:
+    """Worker: reads its shard straight from the extraction (folder or container)"""
+    store = ExtractionStore.open(Path(extract_dir))
+    try:
+        read = store.read if store is not None else (lambda file: (Path(extract_dir) / file).read_bytes())
+        return _rewrite_batch(read, files, rules, Path(game_data_path), mod_name)
+    finally:
+        if store is not None:
+            store.close()
+
+
+class BulkRewriter:
+    """
+    Applies value rules (src.cfg.expressions) to every GameData cfg they touch and
+    writes only the files that changed, as delta overrides where possible.
+
+    Candidate files come from the SID index (files containing the rule keys) or a
+    full listing, narrowed by an fnmatch pattern on the GameData-relative path
+    ('WeaponData/*'). With an extraction the files are split into shards parsed by
+    a process pool; with only the pak VFS, or when called from a thread other
+    than the main one (multi-version builds), they are processed in this process.
+    """
+
+    def __init__(self, extract_dir: Optional[Path] = None, vfs=None, sid_index=None, workers: Optional[int] = None):
+        if extract_dir is None and vfs is None:
+            raise BulkRewriteError("bulk rewrite needs an extraction or the pak VFS")
+        self.extract_dir = Path(extract_dir) if extract_dir is not None else None
+        self.vfs = vfs
+        self.sid_index = sid_index
+        self.workers = workers
+
+    def candidate_files(self, rules: List[str], include: str = '*') -> List[str]:
+        keys = {compile_rule(rule).key for rule in rules}
+        if self.sid_index is not None:
+            files = {file for key in keys for file in self.sid_index.files_with_key(key)}
+        elif self.extract_dir is not None:
+            files = list_cfg_files(self.extract_dir)
+        else:
+            files = [p.path for p in self.vfs.rglob('*.cfg', GAMEDATA_PATH)]
+            files += [p.path for p in self.vfs.rglob('*.cfg.bin', GAMEDATA_PATH)]
+        return sorted(file for file in files if fnmatch.fnmatchcase(gamedata_relative(file), include))
+
+    def rewrite(self, rules: List[str], game_data_path: Path, mod_name: str, include: str = '*') -> List[RewrittenFile]:
+        try:
+            for rule in rules:
+                compile_rule(rule)
+        except RuleError as e:
+            raise BulkRewriteError(str(e))
+
+        start = time.perf_counter()
+        game_data_path = Path(game_data_path)
+        files = self.candidate_files(rules, include)
+        batches = [files[i:i + BATCH_SIZE] for i in range(0, len(files), BATCH_SIZE)]
+
+        results: List[RewrittenFile] = []
+        try:
+            if self.extract_dir is None:
+                results = _rewrite_batch(self.vfs.read_bytes, files, rules, game_data_path, mod_name)
+            elif len(batches) <= 1 or threading.current_thread() is not threading.main_thread():
+                # fork из рабочего потока может унаследовать захваченные другими потоками блокировки
+                for batch in batches:
+                    results += _rewrite_batch_in_worker(str(self.extract_dir), batch, rules, str(game_data_path),
+                                                        mod_name)
+            else:
+                count = len(batches)
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    for batch_results in pool.map(_rewrite_batch_in_worker, [str(self.extract_dir)] * count, batches,
+                                                  [rules] * count, [str(game_data_path)] * count, [mod_name] * count):
+                        results += batch_results
+        except RuleError as e:
+            raise BulkRewriteError(str(e))
+
+        logger.info(f"Bulk rewrite: {sum(r.changed for r in results)} value(s) in {len(results)} of "
+                    f"{len(files)} file(s) ({time.perf_counter() - start:.1f}s)")
+        return results
@@ -0,0 +1,368 @@
+"""Extraction bookkeeping: completion markers, resumable checkpoints and live progress"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .extraction_store import ExtractionStore, in_scope
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS_MARKER = ".extraction_in_progress"
+COMPLETE_MARKER = ".extraction_complete"
+CHECKPOINT_FILE = ".extraction_checkpoint"
+
+
+def pak_identity(pak_file: Path) -> Dict[str, Any]:
+    """Identifies a pak by name, size and mtime (enough to tell game updates apart)"""
+    stat = pak_file.stat()
+    return {'pak': pak_file.name, 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+
+class ExtractionState:
+    """
+    Marker files inside an extraction folder.
+
+    * .extraction_in_progress - written before the first file, holds the pak identity and totals
+    * .extraction_checkpoint  - one finished entry path per line (append-only journal)
+    * .extraction_complete    - written last; only folders with it are used as a source
+
+    Folders created before markers existed (no marker at all) are treated as complete
+    if they contain game data, so old extractions keep working.
+    """
+
+    CHECKPOINT_FLUSH_INTERVAL = 1.0
+
+    def __init__(self, extract_dir: Path):
+        self.extract_dir = Path(extract_dir)
+        self.in_progress_file = self.extract_dir / IN_PROGRESS_MARKER
+        self.complete_file = self.extract_dir / COMPLETE_MARKER
+        self.checkpoint_file = self.extract_dir / CHECKPOINT_FILE
+        self._journal = None
+        self._last_flush = 0.0
+
+    def is_complete(self) -> bool:
+        if self.complete_file.exists():
+            return True
+        if self.in_progress_file.exists() or self.checkpoint_file.exists():
+            return False
+        return (self.extract_dir / "Stalker2").is_dir()
+
+    def is_in_progress(self) -> bool:
+        return self.in_progress_file.exists() and not self.complete_file.exists()
+
+    def _read_json(self, path: Path) -> Dict[str, Any]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def read_in_progress(self) -> Dict[str, Any]:
+        return self._read_json(self.in_progress_file)
+
+    def read_completion(self) -> Dict[str, Any]:
+        return self._read_json(self.complete_file)
+
+    def matches(self, identity: Dict[str, Any]) -> bool:
+        return self.read_in_progress().get('identity') == identity
+
+    def begin(self, identity: Dict[str, Any], total_files: Optional[int], total_bytes: Optional[int]):
+        self.extract_dir.mkdir(parents=True, exist_ok=True)
+        self.complete_file.unlink(missing_ok=True)
+        with open(self.in_progress_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'identity': identity,
+                'total_files': total_files,
+                'total_bytes': total_bytes,
+                'started_at': datetime.now().isoformat()
+            }, f, indent=2)
+
+    def load_checkpoint(self) -> Set[str]:
+        if not self.checkpoint_file.exists():
+            return set()
+        with open(self.checkpoint_file, 'r', encoding='utf-8', errors='ignore') as f:
+            # последняя строка могла быть записана не полностью
+            lines = f.read().split('\n')
+        return {line for line in lines[:-1] if line}
+
+    def record(self, entry_path: str):
+        """Journals a finished entry; the journal is flushed about once per second"""
+        if self._journal is None:
+            self._journal = open(self.checkpoint_file, 'a', encoding='utf-8')
+        self._journal.write(entry_path + '\n')
+        now = time.monotonic()
+        if now - self._last_flush >= self.CHECKPOINT_FLUSH_INTERVAL:
+            self._journal.flush()
+            self._last_flush = now
+
+    def close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def complete(self, stats: Dict[str, Any]):
+        self.close_journal()
+        data = dict(self.read_in_progress())
+        data.update(stats)
+        data['completed_at'] = datetime.now().isoformat()
+
+        tmp_file = self.complete_file.with_name(COMPLETE_MARKER + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_file, self.complete_file)
+
+        self.in_progress_file.unlink(missing_ok=True)
+        self.checkpoint_file.unlink(missing_ok=True)
+
+
+def _sort_time(extract_dir: Path) -> float:
+    marker = extract_dir / COMPLETE_MARKER
+    try:
+        return marker.stat().st_mtime if marker.exists() else extract_dir.stat().st_mtime
+    except OSError:
+        return 0
+
+
+def list_extractions(extract_root: Path, complete_only: bool = True) -> List[Path]:
+    """Extraction folders (pakchunk*), newest first; incomplete ones are skipped unless asked for"""
+    extract_root = Path(extract_root)
+    if not extract_root.exists():
+        return []
+
+    result = []
+    try:
+        for item in extract_root.iterdir():
+            if item.is_dir() and 'pakchunk' in item.name.lower():
+                if not complete_only or ExtractionState(item).is_complete():
+                    result.append(item)
+    except OSError as e:
+        logger.error(f"Failed to list extractions in {extract_root}: {e}")
+
+    return sorted(result, key=_sort_time, reverse=True)
+
+
+def get_latest_extraction(extract_root: Path) -> Optional[Path]:
+    extractions = list_extractions(extract_root)
+    return extractions[0] if extractions else None
+
+
+def find_resumable_extraction(extract_root: Path, identity: Dict[str, Any]) -> Optional[Path]:
+    """Newest unfinished extraction of exactly this pak, if any"""
+    for item in list_extractions(extract_root, complete_only=False):
+        state = ExtractionState(item)
+        if state.is_in_progress() and state.matches(identity):
+            return item
+    return None
+
+
+def previous_totals(extract_root: Path, identity: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """File/byte totals of an earlier complete extraction of the same pak (used when the index is unreadable)"""
+    for item in list_extractions(extract_root):
+        completion = ExtractionState(item).read_completion()
+        if completion.get('identity') == identity:
+            return completion.get('files'), completion.get('bytes')
+    return None, None
+
+
+class ExtractionProgress:
+    """Single-line console progress: files, files/s, MB/s and ETA"""
+
+    def __init__(self, total_files: Optional[int] = None, total_bytes: Optional[int] = None,
+                 interval: float = 0.5, stream=None):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.files = 0
+        self.bytes = 0
+        self._base_files = 0
+        self._base_bytes = 0
+        self._start = time.monotonic()
+        self._last_render = 0.0
+        self._lock = threading.Lock()
+
+    def skip(self, files: int, nbytes: int):
+        """Counts work already done in an earlier run (excluded from the speed)"""
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+            self._base_files += files
+            self._base_bytes += nbytes
+
+    def advance(self, files: int = 1, nbytes: int = 0):
+        with self._lock:
+            self.files += files
+            self.bytes += nbytes
+        self.render()
+
+    def set_absolute(self, files: int, nbytes: int):
+        with self._lock:
+            self.files = files
+            self.bytes = nbytes
+        self.render()
+
+    @staticmethod
+    def _format_eta(seconds: float) -> str:
+        seconds = int(seconds)
+        hours, rest = divmod(seconds, 3600)
+        minutes, secs = divmod(rest, 60)
+        return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._start, 1e-6)
+            files_rate = (self.files - self._base_files) / elapsed
+            bytes_rate = (self.bytes - self._base_bytes) / elapsed
+
+            eta = None
+            if self.total_bytes and bytes_rate > 0:
+                eta = max(self.total_bytes - self.bytes, 0) / bytes_rate
+            elif self.total_files and files_rate > 0:
+                eta = max(self.total_files - self.files, 0) / files_rate
+
+            return {
+                'files': self.files,
+                'bytes': self.bytes,
+                'files_per_second': files_rate,
+                'mb_per_second': bytes_rate / (1024 * 1024),
+                'eta_seconds': eta,
+                'elapsed_seconds': elapsed
+            }
+
+    def format_line(self) -> str:
+        snap = self.snapshot()
+        if self.total_files:
+            percent = min(100.0, snap['files'] * 100.0 / self.total_files)
+            done = f"{snap['files']:,}/{self.total_files:,} files ({percent:5.1f}%)"
+        else:
+            done = f"{snap['files']:,} files"
+        eta = self._format_eta(snap['eta_seconds']) if snap['eta_seconds'] is not None else "--:--"
+        return (f"  {done} | {snap['files_per_second']:,.0f} files/s | "
+                f"{snap['mb_per_second']:.1f} MB/s | ETA {eta}")
+
+    def render(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_render < self.interval:
+            return
+        self._last_render = now
+        self.stream.write("\r" + self.format_line().ljust(79))
+        self.stream.flush()
+
+    def finish(self):
+        self.render(force=True)
+        self.stream.write("\n")
+        self.stream.flush()
+
+
+class DirectoryProgressMonitor(threading.Thread):
+    """Feeds ExtractionProgress by periodically counting what an external tool has written"""
+
+    def __init__(self, directory: Path, progress: ExtractionProgress, interval: float = 2.0):
+        super().__init__(daemon=True)
+        self.directory = Path(directory)
+        self.progress = progress
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def _count(self) -> Tuple[int, int]:
+        files = 0
+        total = 0
+        stack = [str(self.directory)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif not entry.name.startswith('.extraction'):
+                            files += 1
+                            # на Windows stat() из scandir не требует отдельного системного вызова
+                            total += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+        return files, total
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.progress.set_absolute(*self._count())
+
+    def stop(self) -> Tuple[int, int]:
+        self._stop_event.set()
+        self.join()
+        counts = self._count()
+        self.progress.set_absolute(*counts)
+        return counts
+
+
+def extract_pak_resumable(reader, extract_dir: Path, state: ExtractionState,
+                          progress: ExtractionProgress) -> Tuple[int, int]:
+    """
+    Extracts every entry of an opened PakReader in pak order, journaling each finished
+    file. Entries already in the journal (from an interrupted run) are skipped.
+    Returns (files, bytes) of the whole pak.
+    """
+    done = state.load_checkpoint()
+    entries = sorted(reader.entries.values(), key=lambda e: e.offset)
+
+    skipped = [entry for entry in entries if entry.path in done]
+    if skipped:
+        logger.info(f"Resuming extraction, {len(skipped)} of {len(entries)} files already done")
+        progress.skip(len(skipped), sum(entry.uncompressed_size for entry in skipped))
+
+    created_dirs = set()
+    try:
+        with open(reader.pak_file, 'rb') as f:
+            for entry in entries:
+                if entry.path in done:
+                    continue
+
+                f.seek(entry.offset)
+                data = reader.decode_entry(entry, f.read(reader.stored_size(entry)))
+
+                target = extract_dir / entry.path
+                if target.parent not in created_dirs:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    created_dirs.add(target.parent)
+                with open(target, 'wb') as out:
+                    out.write(data)
+
+                state.record(entry.path)
+                progress.advance(1, len(data))
+    finally:
+        state.close_journal()
+
+    return len(entries), reader.total_size()
+
+
+def extract_pak_to_store(reader, store: ExtractionStore, progress: ExtractionProgress,
+                         scope: str = 'gamedata') -> Tuple[int, int]:
+    """
+    Like extract_pak_resumable, but into a single-file container. Rows already in
+    the container (from an interrupted run) are skipped. Returns (files, bytes) stored.
+    """
+    entries = sorted((e for e in reader.entries.values() if in_scope(e.path, scope)), key=lambda e: e.offset)
+    done = store.sizes()
+
+    if done:
+        logger.info(f"Resuming extraction, {len(done)} of {len(entries)} files already stored")
+        progress.skip(len(done), sum(done.values()))
+
+    with open(reader.pak_file, 'rb') as f:
+        for entry in entries:
+            if entry.path in done:
+                continue
+
+            f.seek(entry.offset)
+            data = reader.decode_entry(entry, f.read(reader.stored_size(entry)))
+            store.add(entry.path, data)
+            progress.advance(1, len(data))
+
+    store.finalize()
+    return len(entries), sum(entry.uncompressed_size for entry in entries)
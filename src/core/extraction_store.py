@@ -0,0 +1,160 @@
+"""Single-file extraction container (SQLite blob store) used instead of loose files"""
+
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_FILE = "extraction.s2db"
+
+# Файлы, нужные модулям; остальное (ассеты) в контейнер по умолчанию не кладётся
+GAMEDATA_MARKER = "/GameData/"
+
+
+def container_path(extract_dir: Path) -> Path:
+    return Path(extract_dir) / CONTAINER_FILE
+
+
+def has_container(extract_dir: Path) -> bool:
+    return container_path(extract_dir).is_file()
+
+
+def in_scope(path: str, scope: str) -> bool:
+    """'gamedata' keeps only GameData files, 'all' keeps everything"""
+    return scope == 'all' or GAMEDATA_MARKER in '/' + path
+
+
+class ExtractionStore:
+    """
+    All extracted files in one SQLite database: (path, lowercase name, size, data).
+
+    Writes are committed in batches about once per second, so an interrupted
+    extraction resumes from the rows already stored (no separate journal).
+    A finished container is a single file: lookups are index queries and
+    removing an extraction deletes one file.
+    """
+
+    COMMIT_INTERVAL = 1.0
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_name ON files(name);
+    """
+
+    def __init__(self, db_file: Path, readonly: bool = True):
+        self.db_file = Path(db_file)
+        self.readonly = readonly
+        if readonly:
+            self.conn = sqlite3.connect(f"{self.db_file.resolve().as_uri()}?mode=ro", uri=True,
+                                        check_same_thread=False)
+        else:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(self.SCHEMA)
+        self._last_commit = time.monotonic()
+
+    @classmethod
+    def open(cls, extract_dir: Path) -> Optional['ExtractionStore']:
+        """Read-only store of an extraction folder, None if it has none"""
+        if not has_container(extract_dir):
+            return None
+        try:
+            return cls(container_path(extract_dir))
+        except sqlite3.Error as e:
+            logger.error(f"Cannot open extraction container in {extract_dir}: {e}")
+            return None
+
+    def close(self):
+        if self.conn is not None:
+            if not self.readonly:
+                self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def sizes(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT path, size FROM files"))
+
+    def paths(self) -> Set[str]:
+        return {row[0] for row in self.conn.execute("SELECT path FROM files")}
+
+    def find(self, filename: str) -> Optional[str]:
+        """Shallowest stored path whose file name matches (case-insensitive)"""
+        rows = self.conn.execute("SELECT path FROM files WHERE name = ?", (filename.lower(),)).fetchall()
+        if not rows:
+            return None
+        return min((row[0] for row in rows), key=lambda p: (p.count('/'), p))
+
+    def read(self, path: str) -> bytes:
+        row = self.conn.execute("SELECT data FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(path)
+        return bytes(row[0])
+
+    def totals(self) -> Tuple[int, int]:
+        count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        return count, size
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def add(self, path: str, data: bytes):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, name, size, data) VALUES (?, ?, ?, ?)",
+            (path, path.rpartition('/')[2].lower(), len(data), data)
+        )
+        now = time.monotonic()
+        if now - self._last_commit >= self.COMMIT_INTERVAL:
+            self.conn.commit()
+            self._last_commit = now
+
+    def import_directory(self, source_dir: Path, scope: str = 'all',
+                         on_file: Optional[Callable[[int], None]] = None) -> Tuple[int, int]:
+        """Moves loose files (e.g. from repak) into the container; returns (files, bytes)"""
+        root = str(source_dir)
+        files = 0
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+            rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+            for filename in filenames:
+                path = rel_dir + filename
+                if not in_scope(path, scope):
+                    continue
+                with open(os.path.join(dirpath, filename), 'rb') as f:
+                    data = f.read()
+                self.add(path, data)
+                files += 1
+                total += len(data)
+                if on_file:
+                    on_file(len(data))
+        self.conn.commit()
+        return files, total
+
+    def finalize(self):
+        """Folds the WAL back into the database so the container is one file again"""
+        self.conn.commit()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("PRAGMA journal_mode=DELETE")
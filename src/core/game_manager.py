@@ -8,6 +8,9 @@ from typing import Optional
 import tkinter as tk
 from tkinter import filedialog
 
+from .extraction import list_extractions
+from .game_vfs import extraction_root
+
 logger = logging.getLogger(__name__)
 
 class GameManager:
@@ -118,10 +121,11 @@ class GameManager:
         """Returns path to the main game PAK file"""
         return self.game_path / "Stalker2" / "Content" / "Paks" / "pakchunk0-Windows.pak"
     
-    def get_mods_directory(self) -> Path:
-        """Returns path to the ~mods directory and creates it if needed"""
+    def get_mods_directory(self, create: bool = True) -> Path:
+        """Returns path to the ~mods directory and creates it if needed (unless create is False)"""
         mods_dir = self.game_path / "Stalker2" / "Content" / "Paks" / "~mods"
-        mods_dir.mkdir(parents=True, exist_ok=True)
+        if create:
+            mods_dir.mkdir(parents=True, exist_ok=True)
         return mods_dir
     
     def is_extraction_completed(self) -> bool:
@@ -136,16 +140,8 @@ class GameManager:
         return self._check_extraction_folder_size(extract_path)
     
     def _check_extraction_folder_size(self, extract_path: Path) -> bool:
-        """Checks if extraction folder contains valid data"""
-        try:
-            for item in extract_path.iterdir():
-                if item.is_dir():
-                    folder_name = item.name.lower()
-                    if 'pakchunk' in folder_name:
-                        return True
-            return False
-        except Exception:
-            return False
+        """Checks if extraction folder contains a complete extraction"""
+        return bool(list_extractions(extract_path))
     
     def check_game_version(self) -> Optional[str]:
         """Checks game version from Steam news (legacy method)"""
@@ -196,18 +192,15 @@ class GameManager:
             if not extract_path.exists():
                 return "unknown (no extraction)"
             
-            # Find latest extraction folder
-            extractions = []
-            for item in extract_path.iterdir():
-                if item.is_dir() and 'pakchunk' in item.name.lower():
-                    extractions.append(item)
+            # Find latest complete extraction folder
+            extractions = list_extractions(extract_path)
             
             if not extractions:
                 return "unknown (no extraction folders)"
             
-            extract_dir = max(extractions, key=lambda p: p.stat().st_mtime)
+            extract_dir = extractions[0]
         
-        game_data = extract_dir / "Stalker2" / "Content" / "GameLite" / "GameData"
+        game_data = extraction_root(extract_dir) / "Stalker2" / "Content" / "GameLite" / "GameData"
         if not game_data.exists():
             return "unknown (no GameData)"
         
@@ -222,12 +215,11 @@ class GameManager:
         core_vars = game_data / "CoreVariables.cfg"
         if core_vars.exists():
             try:
-                with open(core_vars, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read(4096)
-                    if 'StaminaRegenStateCoefs' in content:
-                        return "1.8.1+ (modern parameters)"
-                    elif 'WeaponDurability' in content:
-                        return "1.7.x"
+                content = core_vars.read_text(encoding='utf-8', errors='ignore')[:4096]
+                if 'StaminaRegenStateCoefs' in content:
+                    return "1.8.1+ (modern parameters)"
+                elif 'WeaponDurability' in content:
+                    return "1.7.x"
             except:
                 pass
         
@@ -0,0 +1,374 @@
+"""Read-only virtual filesystem over the game pak (with an on-disk extraction as fallback)"""
+
+import atexit
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, Optional
+
+from .pak_format import PakReader, PakFormatError, load_oodle
+from .extraction import pak_identity
+from .extraction_store import ExtractionStore, container_path, has_container
+
+logger = logging.getLogger(__name__)
+
+
+class _Stat:
+    """Minimal os.stat_result stand-in for pak entries"""
+
+    def __init__(self, size: int, mtime: float):
+        self.st_size = size
+        self.st_mtime = mtime
+
+
+class VfsPath:
+    """Path inside GameVFS; mirrors the small part of pathlib.Path the modules use"""
+
+    __slots__ = ('vfs', 'path')
+
+    def __init__(self, vfs: 'GameVFS', path: str):
+        self.vfs = vfs
+        self.path = path.strip('/')
+
+    @property
+    def name(self) -> str:
+        return PurePosixPath(self.path).name
+
+    @property
+    def suffix(self) -> str:
+        return PurePosixPath(self.path).suffix
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self.path).stem
+
+    @property
+    def parent(self) -> 'VfsPath':
+        return VfsPath(self.vfs, self.path.rpartition('/')[0])
+
+    @property
+    def parts(self):
+        return PurePosixPath(self.path).parts
+
+    def __truediv__(self, other) -> 'VfsPath':
+        return VfsPath(self.vfs, f"{self.path}/{str(other).strip('/')}" if self.path else str(other))
+
+    def exists(self) -> bool:
+        return self.vfs.exists(self.path)
+
+    def is_file(self) -> bool:
+        return self.vfs.is_file(self.path)
+
+    def is_dir(self) -> bool:
+        return self.vfs.is_dir(self.path)
+
+    def stat(self) -> _Stat:
+        return self.vfs.stat(self.path)
+
+    def read_bytes(self) -> bytes:
+        return self.vfs.read_bytes(self.path)
+
+    def read_text(self, encoding: str = 'utf-8', errors: str = 'strict') -> str:
+        return self.read_bytes().decode(encoding, errors)
+
+    def rglob(self, pattern: str) -> Iterator['VfsPath']:
+        return self.vfs.rglob(pattern, self.path)
+
+    def relative_to(self, other: 'VfsPath') -> PurePosixPath:
+        return PurePosixPath(self.path).relative_to(other.path)
+
+    def __str__(self):
+        return f"pak://{self.path}"
+
+    def __repr__(self):
+        return f"VfsPath({self.path!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, VfsPath) and other.vfs is self.vfs and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class GameVFS:
+    """
+    Resolves game paths (e.g. 'Stalker2/Content/GameLite/GameData/CoreVariables.cfg')
+    against the pak index and reads entries straight out of the mmapped pak.
+    Decoded entries are kept in a byte-bounded LRU cache. Entries the pak reader
+    cannot decode here (no AES key support / no Oodle) are read from the on-disk
+    extraction when one exists, either loose files or its single-file container.
+    """
+
+    DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, reader: Optional[PakReader] = None, extraction_dir: Optional[Path] = None,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES):
+        self.reader = reader
+        self.extraction_dir = Path(extraction_dir) if extraction_dir else None
+        self.cache_bytes = cache_bytes
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_size = 0
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._file = None
+        self._store: Optional[ExtractionStore] = None
+        self._store_sizes: Dict[str, int] = {}
+        self._files: Dict[str, str] = {}
+        self._dirs = {''}
+        self._by_name: Dict[str, List[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._build_lookup()
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def open(cls, pak_file: Optional[Path], aes_key: Optional[str] = None,
+             extraction_dir: Optional[Path] = None, cache_dir: Optional[Path] = Path("data/cache/pak_index"),
+             cache_bytes: int = DEFAULT_CACHE_BYTES) -> Optional['GameVFS']:
+        """Opens the pak index (cached by pak identity) and/or the extraction; None if neither is usable"""
+        reader = None
+        if pak_file and Path(pak_file).exists():
+            reader = cls._load_reader(Path(pak_file), aes_key, cache_dir)
+
+        if reader is None and not (extraction_dir and Path(extraction_dir).exists()):
+            return None
+
+        return cls(reader, extraction_dir, cache_bytes)
+
+    @staticmethod
+    def _load_reader(pak_file: Path, aes_key: Optional[str], cache_dir: Optional[Path]) -> Optional[PakReader]:
+        oodle = load_oodle()
+        cache_file = None
+        if cache_dir is not None:
+            identity = pak_identity(pak_file)
+            cache_file = Path(cache_dir) / f"{pak_file.stem}_{identity['size']}_{identity['mtime']}.idx"
+            if cache_file.exists():
+                try:
+                    return PakReader.from_dumped_index(pak_file, cache_file.read_bytes(), aes_key, oodle)
+                except Exception as e:
+                    logger.warning(f"Ignoring pak index cache {cache_file.name}: {e}")
+
+        try:
+            reader = PakReader(pak_file, aes_key=aes_key, oodle=oodle)
+        except (PakFormatError, OSError, ValueError) as e:
+            logger.info(f"VFS: pak index not readable ({e}), using extraction only")
+            return None
+
+        if cache_file is not None:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                cache_file.write_bytes(reader.dump_index())
+            except OSError as e:
+                logger.warning(f"Could not cache pak index: {e}")
+
+        return reader
+
+    def _register(self, path: str, source: str):
+        self._files[path] = source
+        self._by_name.setdefault(path.rpartition('/')[2].lower(), []).append(path)
+        parent = path.rpartition('/')[0]
+        while parent not in self._dirs:
+            self._dirs.add(parent)
+            self._by_name.setdefault(parent.rpartition('/')[2].lower(), []).append(parent)
+            parent = parent.rpartition('/')[0]
+
+    def _build_lookup(self):
+        if self.reader is not None:
+            for path, entry in self.reader.entries.items():
+                if self.reader.can_read(entry):
+                    self._register(path, 'pak')
+
+        if self.extraction_dir is not None:
+            self._store = ExtractionStore.open(self.extraction_dir)
+
+        if self._store is not None:
+            self._store_sizes = self._store.sizes()
+            for path in self._store_sizes:
+                if path not in self._files:
+                    self._register(path, 'store')
+        elif self.reader is not None and self.extraction_dir is not None:
+            # Пак уже дал список файлов: с диска берутся только записи, которые здесь не декодируются
+            for path, entry in self.reader.entries.items():
+                if path not in self._files and (self.extraction_dir / path).is_file():
+                    self._register(path, 'disk')
+        elif self.extraction_dir is not None and self.extraction_dir.exists():
+            root = str(self.extraction_dir)
+            for dirpath, dirnames, filenames in os.walk(root):
+                rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+                rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+                for filename in filenames:
+                    if filename.startswith('.extraction'):
+                        continue
+                    path = rel_dir + filename
+                    if path not in self._files:
+                        self._register(path, 'disk')
+
+        for paths in self._by_name.values():
+            paths.sort(key=lambda p: (p.count('/'), p))
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def root(self) -> VfsPath:
+        return VfsPath(self, '')
+
+    def exists(self, path: str) -> bool:
+        path = path.strip('/')
+        return path in self._files or path in self._dirs
+
+    def is_file(self, path: str) -> bool:
+        return path.strip('/') in self._files
+
+    def is_dir(self, path: str) -> bool:
+        return path.strip('/') in self._dirs
+
+    def find(self, filename: str):
+        """First file named `filename` (shallowest path wins); Path for disk files, VfsPath for pak entries"""
+        for path in self._by_name.get(filename.lower(), []):
+            if path in self._files:
+                return self._public_path(path)
+        return None
+
+    def find_dir(self, dirname: str):
+        for path in self._by_name.get(dirname.lower(), []):
+            if path in self._dirs:
+                if self.reader is None and self._store is None:
+                    return self.extraction_dir / path
+                return VfsPath(self, path)
+        return None
+
+    def _public_path(self, path: str):
+        if self._files.get(path) == 'disk':
+            return self.extraction_dir / path
+        return VfsPath(self, path)
+
+    def rglob(self, pattern: str, base: str = '') -> Iterator[VfsPath]:
+        prefix = base.strip('/') + '/' if base.strip('/') else ''
+        for path in sorted(self._files):
+            if path.startswith(prefix) and PurePosixPath(path).match(pattern):
+                yield VfsPath(self, path)
+
+    def stat(self, path: str) -> _Stat:
+        path = path.strip('/')
+        source = self._files.get(path)
+        if source == 'pak':
+            return _Stat(self.reader.entries[path].uncompressed_size, self.reader.pak_file.stat().st_mtime)
+        if source == 'disk':
+            stat = (self.extraction_dir / path).stat()
+            return _Stat(stat.st_size, stat.st_mtime)
+        if source == 'store':
+            return _Stat(self._store_sizes[path], self._store.db_file.stat().st_mtime)
+        raise FileNotFoundError(path)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _map(self) -> mmap.mmap:
+        if self._mmap is None:
+            self._file = open(self.reader.pak_file, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def read_bytes(self, path: str) -> bytes:
+        path = path.strip('/')
+        with self._lock:
+            data = self._cache.get(path)
+            if data is not None:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+            source = self._files.get(path)
+            if source == 'pak':
+                entry = self.reader.entries[path]
+                mapped = self._map()
+                raw = memoryview(mapped)[entry.offset:entry.offset + self.reader.stored_size(entry)]
+                try:
+                    data = self.reader.decode_entry(entry, raw)
+                finally:
+                    raw.release()
+            elif source == 'disk':
+                data = (self.extraction_dir / path).read_bytes()
+            elif source == 'store':
+                data = self._store.read(path)
+            else:
+                raise FileNotFoundError(path)
+
+            self._remember(path, data)
+            return data
+
+    def _remember(self, path: str, data: bytes):
+        if len(data) > self.cache_bytes:
+            return
+        self._cache[path] = data
+        self._cache_size += len(data)
+        while self._cache_size > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_size -= len(evicted)
+
+    def read_text(self, path: str, encoding: str = 'utf-8', errors: str = 'ignore') -> str:
+        return self.read_bytes(path).decode(encoding, errors)
+
+
+# Контейнер -> (размер, mtime, VFS): один открытый VFS на контейнер вместо нового на каждый вызов
+_container_roots: Dict[str, tuple] = {}
+_container_lock = threading.Lock()
+
+
+def extraction_root(extract_dir: Path):
+    """
+    Root of an extraction for path-style access: the folder itself, or a VfsPath
+    into its container. The container VFS is shared between calls and reopened
+    only when the container file changes.
+    """
+    if not has_container(extract_dir):
+        return Path(extract_dir)
+    db_file = container_path(extract_dir)
+    stat = db_file.stat()
+    key = str(db_file.resolve())
+    with _container_lock:
+        cached = _container_roots.get(key)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2].root()
+        if cached is not None:
+            cached[2].close()
+        vfs = GameVFS(None, extract_dir)
+        _container_roots[key] = (stat.st_size, stat.st_mtime_ns, vfs)
+        return vfs.root()
+
+
+def close_extraction_roots():
+    """Closes the shared container VFSs of extraction_root"""
+    with _container_lock:
+        for _, _, vfs in _container_roots.values():
+            vfs.close()
+        _container_roots.clear()
+
+
+atexit.register(close_extraction_roots)
@@ -1,13 +1,59 @@
+import asyncio
+import contextlib
+import copy
+import io
+import json
 import logging
 import shutil
+import sys
+import tempfile
+import threading
+import time
 import zipfile
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+
+from ..cfg.baseline import version_slug
+from ..cfg.binary import CfgBinError
+from ..cfg.diff import KeyChange
+from ..cfg.lint import lint_tree
+from ..cfg.resolver import extraction_reader
+from ..cfg.sid_index import GAMEDATA_PATH, list_cfg_files
+from .extraction import list_extractions
+from .game_vfs import extraction_root
+from .patch_plan import PatchPlan, PatchPlanError
+from .preview import BuildPreview, format_preview, preview_json
 
 logger = logging.getLogger(__name__)
 
+
+class _ThreadOutput(io.TextIOBase):
+    """sys.stdout stand-in: prints of a capturing thread go to its own buffer, the rest to `stream`"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.captured: Dict[str, io.StringIO] = {}
+        self._buffers: Dict[int, io.StringIO] = {}
+    
+    @contextlib.contextmanager
+    def capture(self, label: str):
+        buffer = self.captured[label] = io.StringIO()
+        self._buffers[threading.get_ident()] = buffer
+        try:
+            yield buffer
+        finally:
+            self._buffers.pop(threading.get_ident(), None)
+    
+    def write(self, text: str) -> int:
+        return self._buffers.get(threading.get_ident(), self.stream).write(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+
 class ModBuilder:
     
     def __init__(self, config_manager, pak_manager, module_loader):
@@ -24,26 +70,23 @@ class ModBuilder:
         mod_base_path = config.get('mod_base_path', 'data')
         extract_path = Path(mod_base_path) / "data" / "extract"
         
+        if extract_path.exists() and self._check_extraction_folder_size(extract_path):
+            return True
+        
+        # Без распаковки можно собирать, если GameData читается прямо из pak
+        vfs = self.pak_manager.open_game_vfs()
+        if vfs is not None and vfs.find_dir("GameData") is not None:
+            logger.info("No extraction folder, reading game files from the pak")
+            return True
+        
         if not extract_path.exists():
             logger.error("Extraction directory does not exist")
-            return False
-        
-        if not self._check_extraction_folder_size(extract_path):
+        else:
             logger.error("No valid extraction folder found")
-            return False
-        
-        return True
+        return False
     
     def _check_extraction_folder_size(self, extract_path: Path) -> bool:
-        try:
-            for item in extract_path.iterdir():
-                if item.is_dir():
-                    folder_name = item.name.lower()
-                    if 'pakchunk' in folder_name:
-                        return True
-            return False
-        except Exception:
-            return False
+        return bool(list_extractions(extract_path))
     
     def _get_source_files_path(self) -> Path:
         pak_manager_latest = self.pak_manager.get_latest_extraction()
@@ -57,21 +100,13 @@ class ModBuilder:
         if not extract_path.exists():
             raise Exception("No extraction folder found")
         
-        extractions = []
-        for item in extract_path.iterdir():
-            if item.is_dir() and 'pakchunk' in item.name.lower():
-                try:
-                    extractions.append((item.stat().st_mtime, item))
-                except:
-                    extractions.append((0, item))
-        
+        extractions = list_extractions(extract_path)
         if extractions:
-            extractions.sort(key=lambda x: x[0], reverse=True)
-            latest_path = extractions[0][1]
+            latest_path = extractions[0]
             print(f"Using extraction folder: {latest_path.name}")
             return latest_path
         
-        raise Exception("No extraction folder found")
+        raise Exception("No complete extraction folder found")
     
     def _analyze_game_version(self) -> dict:
         """Анализирует версию игры по распакованным файлам"""
@@ -91,17 +126,14 @@ class ModBuilder:
                 result['warnings'].append("No extracted files found")
                 return result
             
-            extractions = []
-            for item in extract_path.iterdir():
-                if item.is_dir() and 'pakchunk' in item.name.lower():
-                    extractions.append(item)
+            extractions = list_extractions(extract_path)
             
             if not extractions:
                 result['warnings'].append("No extraction folders found")
                 return result
             
-            latest = max(extractions, key=lambda p: p.stat().st_mtime)
-            game_data = latest / "Stalker2" / "Content" / "GameLite" / "GameData"
+            latest = extractions[0]
+            game_data = extraction_root(latest) / "Stalker2" / "Content" / "GameLite" / "GameData"
             
             if not game_data.exists():
                 result['warnings'].append(f"GameData folder not found in {latest.name}")
@@ -185,7 +217,47 @@ class ModBuilder:
             logger.warning(f"Vortex ZIP creation failed: {e}")
             return None
     
-    def build_mod(self, configurations: Dict[str, Any], mod_name: Optional[str] = None) -> bool:
+    def _game_sources(self) -> Tuple[Any, Optional[Path]]:
+        """(pak VFS or None, extraction folder or None) the modules read game files from"""
+        vfs = self.pak_manager.open_game_vfs()
+        try:
+            source_path = self._get_source_files_path()
+        except Exception:
+            if vfs is None:
+                raise
+            source_path = None
+            print("Reading game files directly from the pak")
+        return vfs, source_path
+    
+    def _vanilla_files(self, vfs, source_path: Optional[Path]) -> Tuple[Any, List[str]]:
+        """(reader, cfg paths) of the game files: from the pak VFS or the extraction"""
+        if vfs is not None:
+            files = [p.path for p in vfs.rglob('*.cfg', GAMEDATA_PATH)]
+            files += [p.path for p in vfs.rglob('*.cfg.bin', GAMEDATA_PATH)]
+            return vfs.read_bytes, files
+        return extraction_reader(source_path), list_cfg_files(source_path)
+    
+    def _lint_build(self, build_dir: Path, vfs, source_path: Optional[Path], sid_index, baseline,
+                    label: str = "") -> bool:
+        """Lints the staged cfg files before packing; False (and nothing packed) on errors"""
+        read, files = self._vanilla_files(vfs, source_path) if vfs is not None or source_path else (None, None)
+        issues = lint_tree(build_dir / GAMEDATA_PATH, sid_index, baseline, files, read)
+        errors = [issue for issue in issues if issue.severity == 'error']
+        prefix = f"{label}: " if label else ""
+        for issue in issues:
+            print(f"  {'✗' if issue.severity == 'error' else '⚠'} {prefix}{issue}")
+        if errors:
+            logger.error(f"{prefix}lint found {len(errors)} error(s) in staged cfg files")
+            print(f"✗ {prefix}{len(errors)} error(s) in staged cfg files, the mod is not packed")
+            return False
+        return True
+    
+    def build_mod(self, configurations: Dict[str, Any], mod_name: Optional[str] = None,
+                  dry_run: bool = False, as_json: bool = False) -> bool:
+        """Builds and packs the modpack; with dry_run only previews its changes (see preview_mod)"""
+        if dry_run:
+            return self.preview_mod(configurations, mod_name, as_json) is not None
+        
         try:
             if not self.validate_prerequisites():
                 logger.error("Prerequisites not met for mod building")
@@ -203,7 +275,10 @@ class ModBuilder:
                 shutil.rmtree(build_dir)
             build_dir.mkdir(parents=True, exist_ok=True)
             
-            source_path = self._get_source_files_path()
+            vfs, source_path = self._game_sources()
+            
+            sid_index = self.pak_manager.get_sid_index(source_path) if source_path else None
+            baseline = self.pak_manager.get_baseline(source_path) if source_path else None
             
             logger.info(f"Building mod: {mod_name}")
             print(f"Building mod: {mod_name}")
@@ -216,57 +291,10 @@ class ModBuilder:
                 print("  Modules will apply changes incrementally (later modules preserve earlier changes)")
                 print()
             
-            success_count = 0
-            
-            # 🔥 ИСПРАВЛЕНИЕ: Правильный поиск модулей
-            all_modules = self.module_loader.get_available_modules()
-            modules_by_name = {m.name: m for m in all_modules}
-            modules_by_display = {m.display_name: m for m in all_modules}
+            if not self._apply_modules(configurations, build_dir, mod_name, source_path, vfs, sid_index, baseline):
+                return False
             
-            for module_key, config in configurations.items():
-                # Пробуем найти модуль разными способами
-                module = None
-                
-                # 1. По имени класса (module.name)
-                if module_key in modules_by_name:
-                    module = modules_by_name[module_key]
-                    logger.info(f"Found module by class name: {module_key}")
-                
-                # 2. По отображаемому имени
-                elif module_key in modules_by_display:
-                    module = modules_by_display[module_key]
-                    logger.info(f"Found module by display name: {module_key}")
-                
-                # 3. Поиск по всем модулям
-                else:
-                    for m in all_modules:
-                        if m.name.lower().replace('module', '') == module_key.lower().replace('module', ''):
-                            module = m
-                            logger.info(f"Found module by fuzzy match: {m.name}")
-                            break
-                
-                if module:
-                    logger.info(f"Applying module: {module.name}")
-                    print(f"Applying module: {module.display_name}")
-                    
-                    module.source_dir = source_path
-                    
-                    if module.apply_configuration(config, build_dir):
-                        success_count += 1
-                        print(f"✓ {module.display_name} applied successfully")
-                    else:
-                        logger.error(f"Failed to apply module: {module.name}")
-                        print(f"✗ Failed to apply {module.display_name}")
-                        return False
-                else:
-                    logger.error(f"Module not found for key: {module_key}")
-                    print(f"✗ Module not found: {module_key}")
-                    print(f"Available modules: {[m.display_name for m in all_modules]}")
-                    return False
-            
-            if success_count == 0:
-                logger.error("No modules were applied successfully")
-                print("ERROR: No modules were applied successfully")
+            if not self._lint_build(build_dir, vfs, source_path, sid_index, baseline):
                 return False
             
             paks_dir = Path("output/paks")
@@ -335,6 +363,270 @@ class ModBuilder:
             print(f"ERROR: Mod build failed: {e}")
             return False
     
+    def preview_mod(self, configurations: Dict[str, Any], mod_name: Optional[str] = None,
+                    as_json: bool = False) -> Optional[Dict[str, List[KeyChange]]]:
+        """
+        Dry run: applies every module, prints each changed key (struct path, vanilla,
+        new) per file and returns them. Modules and the patch plan write exactly as
+        in a build (delta overrides included), but into a temporary folder that is
+        removed afterwards, so the report lists the files the build would ship.
+        Nothing is written to the build or output folders, packed or zipped.
+        With as_json the report is JSON on stdout and module output goes to stderr.
+        """
+        mod_name = mod_name or "preview"
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(sys.stderr) if as_json else contextlib.nullcontext():
+                if not self.validate_prerequisites():
+                    print("ERROR: Game files must be extracted first!")
+                    return None
+                
+                vfs, source_path = self._game_sources()
+                # Предпросмотр ничего не пишет: индексы берутся, только если уже построены
+                sid_index = self.pak_manager.get_sid_index(source_path, build=False) if source_path else None
+                baseline = self.pak_manager.get_baseline(source_path, build=False) if source_path else None
+                
+                read, files = self._vanilla_files(vfs, source_path)
+                
+                with tempfile.TemporaryDirectory(prefix="dry_run_") as staging:
+                    staging = Path(staging)
+                    if not self._apply_modules(configurations, staging, mod_name, source_path, vfs, sid_index,
+                                               baseline):
+                        return None
+                    changes = BuildPreview(read, files).run(staging / "Stalker2/Content/GameLite/GameData")
+        except Exception as e:
+            logger.error(f"Mod preview error: {e}")
+            print(f"ERROR: Mod preview failed: {e}")
+            return None
+        
+        elapsed = time.perf_counter() - start
+        if as_json:
+            print(json.dumps(preview_json(mod_name, changes), indent=2, ensure_ascii=False))
+        else:
+            print()
+            print("=" * 60)
+            print(f"    DRY RUN: {mod_name}")
+            print("=" * 60)
+            for line in format_preview(changes):
+                print(line)
+            print(f"\n{sum(len(c) for c in changes.values())} key(s) in {len(changes)} file(s), "
+                  f"nothing written ({elapsed:.2f}s)")
+        return changes
+    
+    def _find_module(self, all_modules: List[Any], module_key: str) -> Optional[Any]:
+        # 1. По имени класса (module.name)
+        for m in all_modules:
+            if m.name == module_key:
+                logger.info(f"Found module by class name: {module_key}")
+                return m
+        
+        # 2. По отображаемому имени
+        for m in all_modules:
+            if m.display_name == module_key:
+                logger.info(f"Found module by display name: {module_key}")
+                return m
+        
+        # 3. Поиск по всем модулям
+        for m in all_modules:
+            if m.name.lower().replace('module', '') == module_key.lower().replace('module', ''):
+                logger.info(f"Found module by fuzzy match: {m.name}")
+                return m
+        return None
+    
+    def _apply_modules(self, configurations: Dict[str, Any], build_dir: Path, mod_name: str,
+                       source_path: Optional[Path], vfs, sid_index, baseline,
+                       game_version: Optional[str] = None) -> bool:
+        """
+        Applies every configured module into build_dir. With `game_version` each
+        module works on its own instance bound to that version, so builds for several
+        versions can run side by side.
+        """
+        success_count = 0
+        
+        # Правки cfg всех модулей собираются в один план: каждый файл читается и пишется один раз
+        plan = PatchPlan()
+        planned_modules = []
+        
+        all_modules = self.module_loader.get_available_modules()
+        
+        for module_key, config in configurations.items():
+            module = self._find_module(all_modules, module_key)
+            if module is None:
+                logger.error(f"Module not found for key: {module_key}")
+                print(f"✗ Module not found: {module_key}")
+                print(f"Available modules: {[m.display_name for m in all_modules]}")
+                return False
+            
+            if game_version is not None:
+                module = module.clone()
+                module.set_game_version(game_version)
+            
+            logger.info(f"Applying module: {module.name}")
+            print(f"Applying module: {module.display_name}")
+            
+            module.source_dir = source_path
+            # Все оверрайды мода - в одном файле на цель, иначе игра применит только последний
+            module.set_mod_name(mod_name)
+            module.set_vfs(vfs)
+            module.set_sid_index(sid_index)
+            if baseline is not None:
+                module.set_baseline(baseline)
+            
+            edits = module.plan_edits(config)
+            if edits is not None:
+                plan.extend(edits)
+                planned_modules.append(module)
+                continue
+            
+            if module.apply_configuration(config, build_dir):
+                success_count += 1
+                print(f"✓ {module.display_name} applied successfully")
+            else:
+                logger.error(f"Failed to apply module: {module.name}")
+                print(f"✗ Failed to apply {module.display_name}")
+                return False
+        
+        # После модулей, пишущих файлы сами: их полные копии правятся планом на месте
+        if planned_modules:
+            game_data_path = build_dir / "Stalker2/Content/GameLite/GameData"
+            try:
+                written = plan.execute(game_data_path, planned_modules[0].find_file_in_extraction, mod_name)
+            except (PatchPlanError, CfgBinError, OSError) as e:
+                logger.error(f"Patch plan failed: {e}")
+                print(f"✗ {e}")
+                return False
+            logger.info(f"Patch plan: {len(plan)} edit(s) in {len(written)} file(s)")
+            for module in planned_modules:
+                success_count += 1
+                print(f"✓ {module.display_name} applied successfully")
+        
+        if success_count == 0:
+            logger.error("No modules were applied successfully")
+            print("ERROR: No modules were applied successfully")
+            return False
+        return True
+    
+    def resolve_build_targets(self, targets: List[str]) -> List[Tuple[str, Path]]:
+        """
+        (game version, extraction folder) for each target: an extraction folder, or a
+        version ('1.8.1', '1.7') matched against the detected versions of the extractions
+        """
+        config = self.config_manager.get_app_config()
+        extract_root = Path(config.get('mod_base_path', 'data')) / "data" / "extract"
+        detected = {}
+        
+        def version_of(extract_dir: Path) -> str:
+            if extract_dir not in detected:
+                detected[extract_dir] = self.pak_manager.detect_game_version_precise(extract_dir)['version']
+            return detected[extract_dir]
+        
+        resolved = []
+        for target in targets:
+            path = Path(target)
+            if path.is_dir():
+                resolved.append((version_of(path), path))
+                continue
+            match = next((e for e in list_extractions(extract_root) if target in version_of(e)), None)
+            if match is None:
+                raise ValueError(f"No extraction found for game version {target}")
+            resolved.append((version_of(match), match))
+        
+        # Одна сборка на версию: артефакты различаются только суффиксом версии
+        unique = {}
+        for version, extract_dir in resolved:
+            if version in unique:
+                logger.warning(f"Skipping {extract_dir.name}: version {version} already built from "
+                               f"{unique[version].name}")
+                continue
+            unique[version] = extract_dir
+        return list(unique.items())
+    
+    def _build_version_tree(self, configurations: Dict[str, Any], mod_name: str, version: str,
+                            extract_dir: Path, sid_index, baseline, output: _ThreadOutput) -> Optional[Path]:
+        build_dir = Path("data/build/temp") / f"{mod_name}_{version_slug(version)}"
+        if build_dir.exists():
+            shutil.rmtree(build_dir)
+        build_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Pak VFS открыт для установленной игры, поэтому каждая версия читает свою распаковку;
+        # настройки копируются, чтобы модули разных версий не делили изменяемые словари
+        with output.capture(version):
+            if self._apply_modules(copy.deepcopy(configurations), build_dir, mod_name, extract_dir, None,
+                                   sid_index, baseline, game_version=version):
+                return build_dir
+        shutil.rmtree(build_dir, ignore_errors=True)
+        return None
+    
+    def build_mod_versions(self, configurations: Dict[str, Any], targets: List[str],
+                           mod_name: Optional[str] = None) -> Dict[str, Optional[Path]]:
+        """
+        Builds the same configurations against several game versions at once (see
+        resolve_build_targets). Module trees are built concurrently and packed in
+        parallel; each version gets <mod>_<version>.pak, its unpacked copy and a
+        Vortex ZIP. Returns version -> pak file (None for versions that failed).
+        """
+        if not mod_name:
+            timestamp = datetime.now().strftime("%d_%m_%Y__%H_%M_%S")
+            mod_name = f"custom_multi_mod_{timestamp}"
+        
+        versions = self.resolve_build_targets(targets)
+        print(f"Building mod: {mod_name} for {', '.join(version for version, _ in versions)}")
+        
+        # Индексы строятся пулами процессов - до запуска потоков, чтобы не делать fork из потока
+        indexes = {version: (self.pak_manager.get_sid_index(extract_dir),
+                             self.pak_manager.get_baseline(extract_dir, version))
+                   for version, extract_dir in versions}
+        
+        # Вывод модулей каждой версии копится отдельно и печатается целиком, а не вперемешку
+        output = _ThreadOutput(sys.stdout)
+        with contextlib.redirect_stdout(output), ThreadPoolExecutor(max_workers=max(1, len(versions))) as pool:
+            futures = {version: pool.submit(self._build_version_tree, configurations, mod_name, version, extract_dir,
+                                            *indexes[version], output)
+                       for version, extract_dir in versions}
+            build_dirs = {}
+            for version, future in futures.items():
+                try:
+                    build_dirs[version] = future.result()
+                except Exception as e:
+                    logger.error(f"Build for {version} failed: {e}")
+                    build_dirs[version] = None
+        
+        for version, _ in versions:
+            if version in output.captured:
+                print(f"\n--- {version} ---")
+                print(output.captured[version].getvalue(), end='')
+        
+        # Проверка в основном потоке: линтер тоже может запустить пул процессов
+        for version, build_dir in build_dirs.items():
+            if build_dir is not None and not self._lint_build(build_dir, None, dict(versions)[version],
+                                                              *indexes[version], label=version):
+                shutil.rmtree(build_dir, ignore_errors=True)
+                build_dirs[version] = None
+        
+        paks_dir = Path("output/paks")
+        paks_dir.mkdir(parents=True, exist_ok=True)
+        jobs = {version: (build_dir, paks_dir / f"{build_dir.name}.pak")
+                for version, build_dir in build_dirs.items() if build_dir is not None}
+        packed = asyncio.run(self.pak_manager.pack_mods_async(list(jobs.values()))) if jobs else []
+        
+        results: Dict[str, Optional[Path]] = {version: None for version in build_dirs}
+        for (version, (build_dir, output_pak)), success in zip(jobs.items(), packed):
+            if success:
+                results[version] = output_pak
+                self._create_vortex_zip(output_pak, build_dir.name, Path("output/vortex"))
+                mod_destination = Path("output/mods") / build_dir.name
+                if mod_destination.exists():
+                    shutil.rmtree(mod_destination)
+                shutil.copytree(build_dir, mod_destination)
+            else:
+                logger.error(f"Failed to pack mod for {version}")
+            shutil.rmtree(build_dir, ignore_errors=True)
+        
+        print()
+        for version, output_pak in results.items():
+            print(f"{'✓' if output_pak else '✗'} {version}: {output_pak or 'build failed'}")
+        return results
+    
     def _ask_install_to_game(self) -> bool:
         while True:
             response = input("Install mod to game directory? (y/n): ").strip().lower()
@@ -373,12 +665,35 @@ class ModBuilder:
             shutil.copy2(pak_file, dest_file)
             
             print(f"✓ Mod installed to game directory: {dest_file}")
+            self._report_mod_conflicts(mods_dir, dest_file)
             return True
             
         except Exception as e:
             print(f"ERROR: Failed to install mod: {e}")
             return False
     
+    def _report_mod_conflicts(self, mods_dir: Path, pak_file: Path):
+        """Warns about installed mods that ship the same files as the just installed pak"""
+        try:
+            scan = self.pak_manager.scan_installed_mods(mods_dir)
+        except Exception as e:
+            logger.warning(f"Mod conflict scan failed: {e}")
+            return
+        if scan is None:
+            return
+        for paks, paths in scan.by_paks().items():
+            if pak_file not in paks:
+                continue
+            others = ', '.join(p.name for p in paks if p != pak_file)
+            if paks[-1] == pak_file:
+                print(f"⚠ {len(paths)} file(s) also in {others}; {pak_file.name} loads last and wins")
+            else:
+                print(f"⚠ {len(paths)} file(s) overridden by {paks[-1].name} (also in {others})")
+            for path in paths[:5]:
+                print(f"    {path}")
+            if len(paths) > 5:
+                print(f"    ... {len(paths) - 5} more")
+    
     def _check_file_conflicts(self, configurations: Dict[str, Any]) -> dict[str, list[str]]:
         file_usage = {}
         
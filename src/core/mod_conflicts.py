@@ -0,0 +1,123 @@
+"""Overlapping files between installed mod paks, found from the pak indices alone"""
+
+import logging
+import marshal
+import os
+import posixpath
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .pak_format import PakFormatError, PakReader
+
+logger = logging.getLogger(__name__)
+
+MODS_INDEX_CACHE = Path("data/cache/mods_index.bin")
+MODS_INDEX_VERSION = 1
+
+
+def game_path_of(pak: PakReader, entry_path: str) -> str:
+    """Path of a pak entry below the game root ('../../../' mount points are dropped)"""
+    path = posixpath.normpath(posixpath.join(pak.mount_point.replace('\\', '/'), entry_path))
+    while path.startswith('../'):
+        path = path[3:]
+    return path.lstrip('/')
+
+
+def load_order_key(pak_file: Path) -> Tuple[str, str]:
+    # Игра монтирует моды по имени файла; при совпадении пути выигрывает последний
+    return Path(pak_file).name.lower(), str(pak_file).lower()
+
+
+def load_order(mods_dir: Path) -> List[Path]:
+    """Paks of a ~mods folder (subfolders included) in mount order: the last one wins an overlap"""
+    return sorted(Path(mods_dir).rglob('*.pak'), key=load_order_key)
+
+
+class ModsScan(NamedTuple):
+    paks: List[Path]                    # в порядке загрузки
+    files: Dict[str, List[Path]]        # путь -> паки с этим файлом, в порядке загрузки
+    unreadable: Dict[Path, str]         # пак -> причина
+
+    @property
+    def overlaps(self) -> Dict[str, List[Path]]:
+        return {path: paks for path, paks in self.files.items() if len(paks) > 1}
+
+    def winner(self, path: str) -> Optional[Path]:
+        paks = self.files.get(path)
+        return paks[-1] if paks else None
+
+    def by_paks(self) -> Dict[Tuple[Path, ...], List[str]]:
+        """Overlapping paths grouped by the paks that ship them (winner last)"""
+        groups: Dict[Tuple[Path, ...], List[str]] = {}
+        for path, paks in sorted(self.overlaps.items()):
+            groups.setdefault(tuple(paks), []).append(path)
+        return groups
+
+
+def _load_cache(cache_file: Path) -> Dict[str, tuple]:
+    try:
+        version, entries = marshal.loads(Path(cache_file).read_bytes())
+        if version == MODS_INDEX_VERSION:
+            return entries
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    return {}
+
+
+def _save_cache(cache_file: Path, entries: Dict[str, tuple]):
+    cache_file = Path(cache_file)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(cache_file.name + '.tmp')
+        tmp_file.write_bytes(marshal.dumps((MODS_INDEX_VERSION, entries)))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.warning(f"Could not cache mod pak indices: {e}")
+
+
+def scan_mods(mods_dir: Path, aes_key: Optional[str] = None,
+              cache_file: Optional[Path] = MODS_INDEX_CACHE) -> ModsScan:
+    """
+    Reads the file list of every pak in `mods_dir` (only the index, no entry is
+    decoded) and maps each game path to the paks that ship it. File lists are
+    cached by pak size and mtime, so an unchanged folder costs a stat per pak.
+    Paths are compared case-insensitively, like the game does.
+    """
+    start = time.perf_counter()
+    cache = _load_cache(cache_file) if cache_file is not None else {}
+    fresh: Dict[str, tuple] = {}
+    paks = load_order(mods_dir)
+    files: Dict[str, List[Path]] = {}
+    names: Dict[str, str] = {}
+    unreadable: Dict[Path, str] = {}
+    read = 0
+
+    for pak_file in paks:
+        stat = pak_file.stat()
+        key = str(pak_file.resolve())
+        cached = cache.get(key)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            paths = cached[2]
+        else:
+            try:
+                reader = PakReader(pak_file, aes_key=aes_key)
+            except (PakFormatError, OSError, ValueError) as e:
+                unreadable[pak_file] = str(e)
+                continue
+            paths = [game_path_of(reader, entry) for entry in reader.entries]
+            read += 1
+        fresh[key] = (stat.st_size, stat.st_mtime_ns, paths)
+
+        for path in paths:
+            lowered = path.lower()
+            name = names.setdefault(lowered, path)
+            owners = files.setdefault(name, [])
+            if not owners or owners[-1] != pak_file:
+                owners.append(pak_file)
+
+    if cache_file is not None and (read or fresh.keys() != cache.keys()):
+        _save_cache(cache_file, fresh)
+    logger.info(f"Scanned {len(paks)} mod pak(s), {read} index(es) read "
+                f"({time.perf_counter() - start:.3f}s)")
+    return ModsScan(paks, files, unreadable)
@@ -0,0 +1,155 @@
+"""Merge of several mod paks into one pak: overlapping cfg files three-way merged against vanilla"""
+
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from ..cfg.diff import value_map
+from ..cfg.document import CfgDocument, CfgValue
+from ..cfg.sid_index import GAMEDATA_PATH
+from .mod_conflicts import game_path_of, load_order_key
+from .pak_format import PakFormatError, PakReader, load_oodle
+
+logger = logging.getLogger(__name__)
+
+
+class MergeConflict(NamedTuple):
+    file: str
+    path: str
+    kept: str                   # пак, чьё значение осталось (последний по порядку загрузки)
+    values: Dict[str, str]      # пак -> значение
+
+
+class MergeResult(NamedTuple):
+    files: Dict[str, bytes]                 # путь в паке -> данные
+    merged: List[str]                       # cfg, собранные из нескольких паков
+    conflicts: List[MergeConflict]          # один ключ изменён по-разному
+    dropped: List[Tuple[str, str, str]]     # (файл, путь, пак): ключ, которого нет в файле победителя
+    overridden: Dict[str, List[str]]        # не-cfg файлы из нескольких паков: берётся последний
+
+
+def _value_slots(doc: CfgDocument) -> Dict[str, CfgValue]:
+    """Same path numbering as value_map ('#2' for repeated paths), pointing at the values"""
+    slots: Dict[str, CfgValue] = {}
+    seen: Dict[str, int] = {}
+    for value in doc.values:
+        count = seen[value.path] = seen.get(value.path, 0) + 1
+        slots[value.path if count == 1 else f"{value.path}#{count}"] = value
+    return slots
+
+
+def merge_cfg(rel_file: str, base: Optional[Dict[str, str]],
+              versions: List[Tuple[str, bytes]]) -> Tuple[bytes, List[MergeConflict], List[Tuple[str, str, str]]]:
+    """
+    Three-way merge of one cfg shipped by several paks (`versions` in load order)
+    against its vanilla values. The last pak's file is the result: keys it
+    leaves vanilla take the change of an earlier pak, top-level structs it does
+    not have are appended whole. Keys changed differently by several paks keep
+    the value of the last one and are reported as conflicts; keys an earlier pak
+    adds inside a struct the result already has cannot be placed and are reported.
+    Without a vanilla file every key counts as changed, so only struct-level
+    additions merge.
+    """
+    base = base or {}
+    docs = [(name, CfgDocument.from_bytes(data, rel_file)) for name, data in versions]
+    winner_name, result = docs[-1]
+    slots = _value_slots(result)
+    own = value_map(result)
+    tops = {struct.name for struct in result.structs if struct.parent is None}
+    newline = b'\r\n' if b'\r\n' in bytes(result.buffer[:4096]) else b'\n'
+
+    appended: List[bytes] = []
+    # путь -> [(пак, значение)] изменений относительно vanilla из более ранних паков
+    changes: Dict[str, List[Tuple[str, str]]] = {}
+    for name, doc in docs[:-1]:
+        moved = set()
+        for struct in doc.structs:
+            if struct.parent is None and struct.name not in tops and struct.end is not None:
+                appended.append(bytes(doc.buffer[struct.start:struct.end]))
+                tops.add(struct.name)
+                moved.add(struct.name)
+        for path, value in value_map(doc).items():
+            if path.partition('/')[0] in moved or base.get(path) == value:
+                continue
+            changes.setdefault(path, []).append((name, value))
+
+    conflicts: List[MergeConflict] = []
+    dropped: List[Tuple[str, str, str]] = []
+    for path, candidates in changes.items():
+        if path in own and own[path] != base.get(path):
+            # Победитель сам изменил ключ: его значение остаётся
+            if any(value != own[path] for _, value in candidates):
+                conflicts.append(MergeConflict(rel_file, path, winner_name,
+                                               {**dict(candidates), winner_name: own[path]}))
+            continue
+        name, value = candidates[-1]
+        if len({value for _, value in candidates}) > 1:
+            conflicts.append(MergeConflict(rel_file, path, name, dict(candidates)))
+        if path in slots:
+            result.set_value(slots[path], value)
+        else:
+            dropped.append((rel_file, path, name))
+
+    data = result.to_bytes()
+    if appended:
+        if not data.endswith(newline):
+            data += newline
+        data += newline.join(appended) + newline
+    return data, conflicts, dropped
+
+
+def merge_paks(paks: List[Path], vanilla: Callable[[str], Optional[Dict[str, str]]],
+               aes_key: Optional[str] = None) -> MergeResult:
+    """
+    Every file of `paks` in one {pak path: data} map. Files only one pak ships
+    are taken as they are; cfg files several paks ship are merged (merge_cfg)
+    against `vanilla(GameData-relative path)`; other overlaps keep the file of
+    the pak that loads last. Paks are taken in game load order, so the result
+    does not depend on the order they are given in.
+    """
+    oodle = load_oodle()
+    # путь в нижнем регистре -> [(пак, ридер, путь записи)]
+    sources: Dict[str, List[Tuple[Path, PakReader, str]]] = {}
+    names: Dict[str, str] = {}
+    for pak_file in sorted(paks, key=load_order_key):
+        try:
+            reader = PakReader(pak_file, aes_key=aes_key, oodle=oodle)
+        except (PakFormatError, OSError, ValueError) as e:
+            raise PakFormatError(f"Cannot read {Path(pak_file).name}: {e}") from e
+        for entry_path in reader.entries:
+            path = game_path_of(reader, entry_path)
+            lowered = path.lower()
+            names.setdefault(lowered, path)
+            sources.setdefault(lowered, []).append((Path(pak_file), reader, entry_path))
+
+    files: Dict[str, bytes] = {}
+    merged: List[str] = []
+    conflicts: List[MergeConflict] = []
+    dropped: List[Tuple[str, str, str]] = []
+    overridden: Dict[str, List[str]] = {}
+    prefix = GAMEDATA_PATH.lower() + '/'
+    for lowered in sorted(sources):
+        path = names[lowered]
+        entries = sources[lowered]
+        if len(entries) == 1:
+            pak_file, reader, entry_path = entries[0]
+            files[path] = reader.read(entry_path)
+            continue
+
+        versions = [(pak_file.name, reader.read(entry_path)) for pak_file, reader, entry_path in entries]
+        if lowered.endswith('.cfg') and lowered.startswith(prefix):
+            rel_file = path[len(prefix):]
+            try:
+                data, file_conflicts, file_dropped = merge_cfg(rel_file, vanilla(rel_file), versions)
+            except ValueError as e:
+                logger.warning(f"Cannot merge {rel_file}, keeping {versions[-1][0]}: {e}")
+            else:
+                files[path] = data
+                merged.append(path)
+                conflicts += file_conflicts
+                dropped += file_dropped
+                continue
+        files[path] = versions[-1][1]
+        overridden[path] = [name for name, _ in versions]
+
+    return MergeResult(files, merged, conflicts, dropped, overridden)
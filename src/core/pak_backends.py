@@ -0,0 +1,246 @@
+"""Pak tool backends: bundled repak.exe, repak from PATH and the pure-Python implementation"""
+
+import asyncio
+import functools
+import logging
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .pak_format import PakReader, PakFormatError, write_pak, read_directory_files
+from .pak_runner import PakToolRunner
+
+logger = logging.getLogger(__name__)
+
+
+async def run_blocking(func, *args):
+    """Runs a blocking call in the default executor (asyncio.to_thread needs Python 3.9)"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+class PakBackend(ABC):
+    """Common interface of everything that can pack or unpack .pak files"""
+
+    name = "base"
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        pass
+
+    def can_unpack(self, pak_file: Path) -> bool:
+        return self.is_available()
+
+    @abstractmethod
+    def unpack(self, pak_file: Path, output_dir: Path, aes_key: Optional[str] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def pack(self, input_dir: Path, output_file: Path) -> bool:
+        pass
+
+    async def unpack_async(self, pak_file: Path, output_dir: Path, aes_key: Optional[str] = None) -> bool:
+        return await run_blocking(self.unpack, pak_file, output_dir, aes_key)
+
+    async def pack_async(self, input_dir: Path, output_file: Path) -> bool:
+        return await run_blocking(self.pack, input_dir, output_file)
+
+    def benchmark(self) -> Optional[float]:
+        """Packs a tiny probe mod and returns the wall time in seconds (None if it failed)"""
+        with tempfile.TemporaryDirectory(prefix="pak_bench_") as tmp:
+            probe_dir = Path(tmp) / "probe"
+            game_data = probe_dir / "Stalker2/Content/GameLite/GameData"
+            game_data.mkdir(parents=True)
+            for i in range(4):
+                (game_data / f"Probe{i}.cfg").write_text(
+                    f"Probe{i} : struct.begin\n   Value = {i}\nstruct.end\n" * 16,
+                    encoding='utf-8'
+                )
+
+            start = time.perf_counter()
+            try:
+                ok = self.pack(probe_dir, Path(tmp) / "probe.pak")
+            except Exception as e:
+                logger.debug(f"Benchmark of {self.name} failed: {e}")
+                return None
+            elapsed = time.perf_counter() - start
+
+        return elapsed if ok else None
+
+
+class RepakBackend(PakBackend):
+    """repak command line tool, driven through PakToolRunner (timeouts, cancellation, log capture)"""
+
+    name = "repak"
+
+    def __init__(self, executable: Optional[Path], runner: Optional[PakToolRunner] = None,
+                 unpack_timeout: Optional[float] = None, pack_timeout: Optional[float] = None):
+        self.executable = executable
+        self.runner = runner or PakToolRunner()
+        self.unpack_timeout = unpack_timeout
+        self.pack_timeout = pack_timeout
+
+    def is_available(self) -> bool:
+        return self.executable is not None and Path(self.executable).is_file()
+
+    def build_unpack_command(self, pak_file: Path, output_dir: Path, aes_key: Optional[str] = None) -> List[str]:
+        cmd = [str(self.executable)]
+        if aes_key:
+            cmd += ["--aes-key", aes_key]
+        cmd += ["unpack", str(pak_file), "--output", str(output_dir)]
+        return cmd
+
+    def build_pack_command(self, input_dir: Path, output_file: Path) -> List[str]:
+        return [str(self.executable), "pack", "--version", "V11", str(input_dir), str(output_file)]
+
+    def _check(self, operation: str, result) -> bool:
+        if not result.ok:
+            logger.error(f"{self.name} {operation} failed: {result}")
+        return result.ok
+
+    def unpack(self, pak_file: Path, output_dir: Path, aes_key: Optional[str] = None) -> bool:
+        result = self.runner.run_sync(
+            self.build_unpack_command(pak_file, output_dir, aes_key),
+            name=f"unpack {pak_file.name}", timeout=self.unpack_timeout
+        )
+        return self._check('unpack', result)
+
+    def pack(self, input_dir: Path, output_file: Path) -> bool:
+        result = self.runner.run_sync(
+            self.build_pack_command(input_dir, output_file),
+            name=f"pack {output_file.name}", timeout=self.pack_timeout, echo=False
+        )
+        return self._check('pack', result)
+
+    async def unpack_async(self, pak_file: Path, output_dir: Path, aes_key: Optional[str] = None) -> bool:
+        result = await self.runner.run(
+            self.build_unpack_command(pak_file, output_dir, aes_key),
+            name=f"unpack {pak_file.name}", timeout=self.unpack_timeout
+        )
+        return self._check('unpack', result)
+
+    async def pack_async(self, input_dir: Path, output_file: Path) -> bool:
+        result = await self.runner.run(
+            self.build_pack_command(input_dir, output_file),
+            name=f"pack {output_file.name}", timeout=self.pack_timeout
+        )
+        return self._check('pack', result)
+
+
+class BundledRepakBackend(RepakBackend):
+    """tools/repak/repak.exe shipped with the builder (Windows only, needs oo2core_9_win64.dll)"""
+
+    name = "repak-bundled"
+
+    def __init__(self, tools_dir: Path = Path("tools/repak"), **kwargs):
+        super().__init__(tools_dir / "repak.exe", **kwargs)
+        self.oodle_dll = tools_dir / "oo2core_9_win64.dll"
+
+    def is_available(self) -> bool:
+        return os.name == 'nt' and super().is_available() and self.oodle_dll.is_file()
+
+
+class PathRepakBackend(RepakBackend):
+    """repak binary found on PATH (e.g. a native Linux build)"""
+
+    name = "repak-path"
+
+    def __init__(self, **kwargs):
+        found = shutil.which("repak")
+        super().__init__(Path(found) if found else None, **kwargs)
+
+
+class PythonPakBackend(PakBackend):
+    """In-process reader/writer for unencrypted V11 paks (uncompressed or zlib)"""
+
+    name = "python"
+
+    def __init__(self, compression: Optional[str] = None):
+        self.compression = compression
+
+    def is_available(self) -> bool:
+        return True
+
+    def can_unpack(self, pak_file: Path) -> bool:
+        try:
+            return PakReader(pak_file).is_supported()
+        except (PakFormatError, OSError) as e:
+            logger.debug(f"Python backend cannot unpack {pak_file}: {e}")
+            return False
+
+    def unpack(self, pak_file: Path, output_dir: Path, aes_key: Optional[str] = None) -> bool:
+        try:
+            count = PakReader(pak_file).extract_all(output_dir)
+            logger.info(f"Extracted {count} files from {pak_file.name}")
+            return True
+        except (PakFormatError, OSError) as e:
+            logger.error(f"Python unpack failed: {e}")
+            return False
+
+    def pack(self, input_dir: Path, output_file: Path) -> bool:
+        try:
+            write_pak(output_file, read_directory_files(input_dir), self.compression)
+            return True
+        except (PakFormatError, OSError) as e:
+            logger.error(f"Python pack failed: {e}")
+            return False
+
+
+_BENCHMARK_CACHE: Dict[str, Optional[float]] = {}
+
+
+def get_default_backends(compression: Optional[str] = None, runner: Optional[PakToolRunner] = None,
+                         unpack_timeout: Optional[float] = None,
+                         pack_timeout: Optional[float] = None) -> List[PakBackend]:
+    runner = runner or PakToolRunner()
+    repak_options = dict(runner=runner, unpack_timeout=unpack_timeout, pack_timeout=pack_timeout)
+    return [
+        BundledRepakBackend(**repak_options),
+        PathRepakBackend(**repak_options),
+        PythonPakBackend(compression)
+    ]
+
+
+def select_pak_backend(operation: str, pak_file: Optional[Path] = None,
+                       backends: Optional[List[PakBackend]] = None,
+                       preferred: Optional[str] = None) -> Optional[PakBackend]:
+    """
+    Picks a backend for 'pack' or 'unpack'.
+    A backend named by `preferred` wins if it is usable; otherwise every usable
+    backend is benchmarked once per process and the fastest one is returned.
+    """
+    backends = backends if backends is not None else get_default_backends()
+
+    if operation == 'unpack':
+        usable = [b for b in backends if b.can_unpack(pak_file)]
+    else:
+        usable = [b for b in backends if b.is_available()]
+
+    if not usable:
+        return None
+
+    if preferred:
+        for backend in usable:
+            if backend.name == preferred:
+                return backend
+        logger.warning(f"Preferred pak backend {preferred} is not usable, selecting automatically")
+
+    if len(usable) == 1:
+        return usable[0]
+
+    timings = []
+    for backend in usable:
+        if backend.name not in _BENCHMARK_CACHE:
+            _BENCHMARK_CACHE[backend.name] = backend.benchmark()
+            logger.info(f"Pak backend {backend.name} benchmark: {_BENCHMARK_CACHE[backend.name]}")
+        elapsed = _BENCHMARK_CACHE[backend.name]
+        if elapsed is not None:
+            timings.append((elapsed, backend))
+
+    if not timings:
+        return usable[0]
+
+    return min(timings, key=lambda x: x[0])[1]
@@ -0,0 +1,665 @@
+"""
+Pure-Python reader/writer for Unreal Engine pak files (version 11, as produced by `repak pack --version V11`).
+
+Writer: uncompressed and zlib-compressed entries, unencrypted index.
+Reader: additionally AES-encrypted indexes/entries (needs the optional `cryptography`
+package) and Oodle-compressed entries (needs oo2core_9_win64.dll, i.e. Windows).
+Layout reference (all little-endian):
+
+    [entry record + data] ...        one per file
+    index                            mount point, record count, path hash seed,
+                                     path hash index / full directory index descriptors,
+                                     encoded entry records
+    path hash index                  fnv64(path) -> encoded entry offset
+    full directory index             directory -> file name -> encoded entry offset
+    footer (221 bytes)               guid, encrypted flag, magic, version, index offset/size/hash,
+                                     5 x 32-byte compression method names
+"""
+
+import ctypes
+import hashlib
+import io
+import logging
+import marshal
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, BinaryIO
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # необязательная зависимость, нужна только для зашифрованных pak
+    Cipher = None
+
+logger = logging.getLogger(__name__)
+
+PAK_MAGIC = 0x5A6F12E1
+PAK_VERSION = 11
+DEFAULT_MOUNT_POINT = "../../../"
+FOOTER_SIZE = 16 + 1 + 4 + 4 + 8 + 8 + 20 + 5 * 32
+COMPRESSION_SLOTS = 5
+COMPRESSION_BLOCK_SIZE = 0x10000
+ZLIB_LEVEL = 6
+AES_BLOCK_SIZE = 16
+DEFAULT_OODLE_DLL = Path("tools/repak/oo2core_9_win64.dll")
+
+
+class PakFormatError(Exception):
+    """Raised when a pak cannot be read or written by the Python implementation"""
+
+
+def fnv64_path(path: str, seed: int = 0) -> int:
+    """Path hash used by the path hash index (FNV-1a 64 over lowercase UTF-16LE)"""
+    value = (0xcbf29ce484222325 + seed) & 0xFFFFFFFFFFFFFFFF
+    for byte in path.lower().encode('utf-16-le'):
+        value ^= byte
+        value = (value * 0x100000001b3) & 0xFFFFFFFFFFFFFFFF
+    return value
+
+
+def _align(size: int) -> int:
+    return (size + AES_BLOCK_SIZE - 1) // AES_BLOCK_SIZE * AES_BLOCK_SIZE
+
+
+def parse_aes_key(key: str) -> bytes:
+    """'0x...' hex string (as passed to repak --aes-key) -> 32 raw key bytes"""
+    key = key[2:] if key.lower().startswith('0x') else key
+    raw = bytes.fromhex(key)
+    if len(raw) != 32:
+        raise PakFormatError("AES key must be 32 bytes (64 hex digits)")
+    return raw
+
+
+def aes_available() -> bool:
+    return Cipher is not None
+
+
+def aes_decrypt(data: bytes, key: bytes) -> bytes:
+    """AES-256-ECB decryption as used for pak indexes and entries"""
+    if Cipher is None:
+        raise PakFormatError("Encrypted pak data needs the 'cryptography' package (pip install cryptography)")
+    decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+    return decryptor.update(data) + decryptor.finalize()
+
+
+class OodleCodec:
+    """OodleLZ_Decompress from the Oodle dll shipped next to repak.exe"""
+
+    def __init__(self, dll_path: Path = DEFAULT_OODLE_DLL):
+        library = ctypes.WinDLL(str(dll_path)) if os.name == 'nt' else ctypes.CDLL(str(dll_path))
+        self._decompress = library.OodleLZ_Decompress
+        self._decompress.restype = ctypes.c_ssize_t
+        self._decompress.argtypes = [
+            ctypes.c_void_p, ctypes.c_ssize_t, ctypes.c_void_p, ctypes.c_ssize_t,
+            ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            ctypes.c_void_p, ctypes.c_ssize_t, ctypes.c_void_p, ctypes.c_void_p,
+            ctypes.c_void_p, ctypes.c_ssize_t, ctypes.c_int
+        ]
+
+    def decompress(self, data: bytes, raw_size: int) -> bytes:
+        out = ctypes.create_string_buffer(raw_size)
+        written = self._decompress(data, len(data), out, raw_size,
+                                   1, 0, 0, None, 0, None, None, None, 0, 3)
+        if written != raw_size:
+            raise PakFormatError(f"Oodle decompression failed ({written} of {raw_size} bytes)")
+        return out.raw
+
+
+_OODLE_CACHE: Dict[str, Optional[OodleCodec]] = {}
+
+
+def load_oodle(dll_path: Path = DEFAULT_OODLE_DLL) -> Optional[OodleCodec]:
+    """Returns an Oodle codec or None when the dll cannot be loaded on this system"""
+    key = str(dll_path)
+    if key not in _OODLE_CACHE:
+        codec = None
+        if Path(dll_path).is_file():
+            try:
+                codec = OodleCodec(dll_path)
+            except (OSError, AttributeError) as e:
+                logger.debug(f"Oodle dll not usable: {e}")
+        _OODLE_CACHE[key] = codec
+    return _OODLE_CACHE[key]
+
+
+def _write_fstring(buf: io.BytesIO, value: str):
+    if not value:
+        buf.write(struct.pack('<i', 0))
+        return
+    try:
+        data = value.encode('ascii') + b'\x00'
+        buf.write(struct.pack('<i', len(data)))
+    except UnicodeEncodeError:
+        data = value.encode('utf-16-le') + b'\x00\x00'
+        buf.write(struct.pack('<i', -(len(data) // 2)))
+    buf.write(data)
+
+
+def _read_fstring(buf: bytes, pos: int) -> Tuple[str, int]:
+    """Reads an FString at pos, returns (value, new position)"""
+    length, = struct.unpack_from('<i', buf, pos)
+    pos += 4
+    if length == 0:
+        return "", pos
+    if length < 0:
+        end = pos - length * 2
+        return bytes(buf[pos:end - 2]).decode('utf-16-le'), end
+    end = pos + length
+    return bytes(buf[pos:end - 1]).decode('utf-8', errors='replace'), end
+
+
+def _entry_record_size(compressed: bool, block_count: int) -> int:
+    """Size of the entry record that precedes the data of every file"""
+    size = 8 + 8 + 8 + 4 + 20 + 1 + 4
+    if compressed:
+        size += 4 + 16 * block_count
+    return size
+
+
+class PakEntry:
+    """One file inside a pak"""
+
+    __slots__ = ('path', 'offset', 'compressed_size', 'uncompressed_size', 'compression_slot',
+                 'encrypted', 'compression_block_size', 'blocks')
+
+    def __init__(self, path: str, offset: int, compressed_size: int, uncompressed_size: int,
+                 compression_slot: Optional[int] = None, encrypted: bool = False,
+                 compression_block_size: int = 0, blocks: Optional[List[Tuple[int, int]]] = None):
+        self.path = path
+        self.offset = offset
+        self.compressed_size = compressed_size
+        self.uncompressed_size = uncompressed_size
+        self.compression_slot = compression_slot
+        self.encrypted = encrypted
+        self.compression_block_size = compression_block_size
+        # (start, end) относительно offset записи (V5+ relative chunk offsets)
+        self.blocks = blocks or []
+
+    @property
+    def data_offset(self) -> int:
+        return self.offset + _entry_record_size(self.compression_slot is not None, len(self.blocks))
+
+    def encode(self) -> bytes:
+        """Serializes the entry in the compact "encoded" index form"""
+        block_size_bits = (self.compression_block_size >> 11) & 0x3f
+        if (block_size_bits << 11) != self.compression_block_size:
+            block_size_bits = 0x3f
+
+        block_count = len(self.blocks) if self.compression_slot is not None else 0
+        size_safe = self.compressed_size <= 0xFFFFFFFF
+        uncompressed_safe = self.uncompressed_size <= 0xFFFFFFFF
+        offset_safe = self.offset <= 0xFFFFFFFF
+
+        flags = (block_size_bits
+                 | (block_count << 6)
+                 | (int(self.encrypted) << 22)
+                 | ((0 if self.compression_slot is None else self.compression_slot + 1) << 23)
+                 | (int(size_safe) << 29)
+                 | (int(uncompressed_safe) << 30)
+                 | (int(offset_safe) << 31))
+
+        out = [struct.pack('<I', flags)]
+        if block_size_bits == 0x3f:
+            out.append(struct.pack('<I', self.compression_block_size))
+        out.append(struct.pack('<I' if offset_safe else '<Q', self.offset))
+        out.append(struct.pack('<I' if uncompressed_safe else '<Q', self.uncompressed_size))
+
+        if self.compression_slot is not None:
+            out.append(struct.pack('<I' if size_safe else '<Q', self.compressed_size))
+            if len(self.blocks) > 1 or self.encrypted:
+                for start, end in self.blocks:
+                    out.append(struct.pack('<I', end - start))
+
+        return b''.join(out)
+
+    @classmethod
+    def decode(cls, path: str, buf: bytes, pos: int) -> 'PakEntry':
+        """Decodes an encoded index record starting at pos"""
+        flags, = struct.unpack_from('<I', buf, pos)
+        pos += 4
+        slot_bits = (flags >> 23) & 0x3f
+        compression_slot = slot_bits - 1 if slot_bits else None
+        encrypted = bool(flags & (1 << 22))
+        block_count = (flags >> 6) & 0xffff
+        block_size = flags & 0x3f
+        if block_size == 0x3f:
+            block_size, = struct.unpack_from('<I', buf, pos)
+            pos += 4
+        else:
+            block_size <<= 11
+
+        values = []
+        for bit in (31, 30, 29):
+            if bit == 29 and compression_slot is None:
+                values.append(values[1])
+                break
+            if flags & (1 << bit):
+                values.append(struct.unpack_from('<I', buf, pos)[0])
+                pos += 4
+            else:
+                values.append(struct.unpack_from('<Q', buf, pos)[0])
+                pos += 8
+        offset, uncompressed, compressed = values
+
+        blocks = []
+        base = _entry_record_size(compression_slot is not None, block_count)
+        if block_count == 1 and not encrypted:
+            blocks.append((base, base + compressed))
+        elif block_count > 0:
+            position = base
+            sizes = struct.unpack_from(f'<{block_count}I', buf, pos)
+            for size in sizes:
+                blocks.append((position, position + size))
+                position += _align(size) if encrypted else size
+
+        return cls(path, offset, compressed, uncompressed, compression_slot,
+                   encrypted, block_size, blocks)
+
+    def record(self, sha1: bytes) -> bytes:
+        """Entry record written in front of the file data"""
+        out = [struct.pack('<QQQI', 0, self.compressed_size, self.uncompressed_size,
+                           0 if self.compression_slot is None else self.compression_slot + 1),
+               sha1]
+        if self.compression_slot is not None:
+            out.append(struct.pack('<I', len(self.blocks)))
+            for start, end in self.blocks:
+                out.append(struct.pack('<QQ', start, end))
+        out.append(struct.pack('<BI', int(self.encrypted), self.compression_block_size))
+        return b''.join(out)
+
+
+class PakReader:
+    """
+    Reads the index and entries of a V10/V11 pak.
+    `aes_key` is needed for encrypted paks, `oodle` for Oodle-compressed entries.
+    """
+
+    INDEX_CACHE_VERSION = 1
+
+    def __init__(self, pak_file: Path, aes_key: Optional[str] = None, oodle: Optional[OodleCodec] = None,
+                 load_index: bool = True):
+        self.pak_file = Path(pak_file)
+        self.mount_point = DEFAULT_MOUNT_POINT
+        self.version = 0
+        self.index_encrypted = False
+        self.compression_methods: List[str] = []
+        self.entries: Dict[str, PakEntry] = {}
+        self._key = parse_aes_key(aes_key) if aes_key else None
+        self._decoders: Dict[str, Callable[[bytes, int], bytes]] = {
+            'zlib': lambda data, raw_size: zlib.decompress(data)
+        }
+        if oodle is not None:
+            self._decoders['oodle'] = oodle.decompress
+        if load_index:
+            self._read_index()
+
+    def dump_index(self) -> bytes:
+        """Serializes the parsed index (marshal) so it can be cached next to other build data"""
+        return marshal.dumps((
+            self.INDEX_CACHE_VERSION, self.mount_point, self.version, self.index_encrypted,
+            self.compression_methods,
+            [(e.path, e.offset, e.compressed_size, e.uncompressed_size,
+              -1 if e.compression_slot is None else e.compression_slot,
+              e.encrypted, e.compression_block_size, e.blocks)
+             for e in self.entries.values()]
+        ))
+
+    @classmethod
+    def from_dumped_index(cls, pak_file: Path, data: bytes, aes_key: Optional[str] = None,
+                          oodle: Optional[OodleCodec] = None) -> 'PakReader':
+        """Recreates a reader from dump_index() output without touching the pak index"""
+        version, mount_point, pak_version, encrypted, methods, entries = marshal.loads(data)
+        if version != cls.INDEX_CACHE_VERSION:
+            raise PakFormatError("Index cache version mismatch")
+
+        reader = cls(pak_file, aes_key=aes_key, oodle=oodle, load_index=False)
+        reader.mount_point = mount_point
+        reader.version = pak_version
+        reader.index_encrypted = encrypted
+        reader.compression_methods = list(methods)
+        for path, offset, csize, usize, slot, enc, block_size, blocks in entries:
+            reader.entries[path] = PakEntry(path, offset, csize, usize, None if slot < 0 else slot,
+                                            enc, block_size, [tuple(b) for b in blocks])
+        return reader
+
+    def _read_footer(self, f: BinaryIO) -> Tuple[int, int]:
+        f.seek(0, io.SEEK_END)
+        file_size = f.tell()
+        if file_size < FOOTER_SIZE:
+            raise PakFormatError(f"{self.pak_file.name} is too small to be a pak")
+
+        f.seek(file_size - FOOTER_SIZE)
+        footer = f.read(FOOTER_SIZE)
+        self.index_encrypted = bool(footer[16])
+        magic, self.version, index_offset, index_size = struct.unpack_from('<IIQQ', footer, 17)
+
+        if magic != PAK_MAGIC:
+            raise PakFormatError(f"{self.pak_file.name}: bad pak magic 0x{magic:08x}")
+        if self.version < 10:
+            raise PakFormatError(f"{self.pak_file.name}: pak version {self.version} is not supported")
+
+        names_offset = 17 + 4 + 4 + 8 + 8 + 20
+        for slot in range(COMPRESSION_SLOTS):
+            raw = footer[names_offset + slot * 32:names_offset + (slot + 1) * 32]
+            self.compression_methods.append(raw.split(b'\x00', 1)[0].decode('ascii', errors='replace'))
+
+        return index_offset, index_size
+
+    def _read_block(self, f: BinaryIO, offset: int, size: int) -> bytes:
+        f.seek(offset)
+        if not self.index_encrypted:
+            return f.read(size)
+        if self._key is None:
+            raise PakFormatError(f"{self.pak_file.name}: index is encrypted, AES key required")
+        return aes_decrypt(f.read(_align(size)), self._key)[:size]
+
+    def _read_index(self):
+        with open(self.pak_file, 'rb') as f:
+            index_offset, index_size = self._read_footer(f)
+            index = self._read_block(f, index_offset, index_size)
+
+            self.mount_point, pos = _read_fstring(index, 0)
+            record_count, path_hash_seed = struct.unpack_from('<IQ', index, pos)
+            pos += 12
+
+            has_phi, = struct.unpack_from('<I', index, pos)
+            pos += 4
+            if has_phi:
+                pos += 8 + 8 + 20
+
+            has_fdi, = struct.unpack_from('<I', index, pos)
+            pos += 4
+            if not has_fdi:
+                raise PakFormatError(f"{self.pak_file.name}: pak has no full directory index")
+            fdi_offset, fdi_size = struct.unpack_from('<QQ', index, pos)
+            pos += 16 + 20
+
+            encoded_size, = struct.unpack_from('<I', index, pos)
+            pos += 4
+            encoded = index[pos:pos + encoded_size]
+
+            fdi = self._read_block(f, fdi_offset, fdi_size)
+
+        dir_count, = struct.unpack_from('<I', fdi, 0)
+        pos = 4
+        for _ in range(dir_count):
+            dir_name, pos = _read_fstring(fdi, pos)
+            dir_name = dir_name.lstrip('/')
+            file_count, = struct.unpack_from('<I', fdi, pos)
+            pos += 4
+            for _ in range(file_count):
+                file_name, pos = _read_fstring(fdi, pos)
+                encoded_offset, = struct.unpack_from('<i', fdi, pos)
+                pos += 4
+                if encoded_offset < 0:
+                    logger.warning(f"{self.pak_file.name}: skipping non-encoded entry {file_name}")
+                    continue
+                path = dir_name + file_name
+                self.entries[path] = PakEntry.decode(path, encoded, encoded_offset)
+
+        if len(self.entries) != record_count:
+            logger.debug(f"{self.pak_file.name}: index declares {record_count} records, read {len(self.entries)}")
+
+    def _decoder_for(self, entry: PakEntry) -> Optional[Callable[[bytes, int], bytes]]:
+        if entry.compression_slot is None:
+            return None
+        method = self.compression_methods[entry.compression_slot].lower()
+        if method not in self._decoders:
+            raise PakFormatError(f"{entry.path}: compression method {method} is not supported")
+        return self._decoders[method]
+
+    def can_read(self, entry: PakEntry) -> bool:
+        if entry.encrypted and (self._key is None or not aes_available()):
+            return False
+        if entry.compression_slot is not None:
+            return self.compression_methods[entry.compression_slot].lower() in self._decoders
+        return True
+
+    def is_supported(self) -> bool:
+        """True if every entry can be decoded with the available key/codecs"""
+        return all(self.can_read(entry) for entry in self.entries.values())
+
+    def total_size(self) -> int:
+        """Sum of uncompressed entry sizes"""
+        return sum(entry.uncompressed_size for entry in self.entries.values())
+
+    def decode_entry(self, entry: PakEntry, raw: bytes) -> bytes:
+        """
+        Turns the stored bytes of an entry (starting at its record offset,
+        spanning at least up to the last block) into the file content.
+        """
+        if entry.encrypted and self._key is None:
+            raise PakFormatError(f"{entry.path}: entry is encrypted, AES key required")
+
+        decoder = self._decoder_for(entry)
+        if decoder is None:
+            start = entry.data_offset - entry.offset
+            if entry.encrypted:
+                data = aes_decrypt(bytes(raw[start:start + _align(entry.uncompressed_size)]), self._key)
+                return data[:entry.uncompressed_size]
+            return bytes(raw[start:start + entry.uncompressed_size])
+
+        chunks = []
+        remaining = entry.uncompressed_size
+        for start, end in entry.blocks:
+            if entry.encrypted:
+                block = aes_decrypt(bytes(raw[start:start + _align(end - start)]), self._key)[:end - start]
+            else:
+                block = bytes(raw[start:end])
+            raw_size = min(entry.compression_block_size or remaining, remaining)
+            chunks.append(decoder(block, raw_size))
+            remaining -= raw_size
+        return b''.join(chunks)
+
+    def stored_size(self, entry: PakEntry) -> int:
+        """Number of bytes from the entry record offset to the end of its data"""
+        if entry.compression_slot is None:
+            size = entry.uncompressed_size
+            return (entry.data_offset - entry.offset) + (_align(size) if entry.encrypted else size)
+        if not entry.blocks:
+            return entry.data_offset - entry.offset
+        start, end = entry.blocks[-1]
+        return start + (_align(end - start) if entry.encrypted else end - start)
+
+    def read(self, path: str, f: Optional[BinaryIO] = None) -> bytes:
+        """Returns the uncompressed content of one entry"""
+        entry = self.entries[path]
+
+        own_handle = f is None
+        if own_handle:
+            f = open(self.pak_file, 'rb')
+        try:
+            f.seek(entry.offset)
+            return self.decode_entry(entry, f.read(self.stored_size(entry)))
+        finally:
+            if own_handle:
+                f.close()
+
+    def extract_all(self, output_dir: Path) -> int:
+        """Extracts every entry below output_dir, returns number of files written"""
+        count = 0
+        with open(self.pak_file, 'rb') as f:
+            for path in self.entries:
+                target = output_dir / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(self.read(path, f))
+                count += 1
+        return count
+
+
+class PakWriter:
+    """
+    Writes an unencrypted V11 pak to a file or any binary stream.
+    Output depends only on the added paths/data and the options: no timestamps,
+    index tables are sorted, zlib runs at a fixed level.
+    """
+
+    def __init__(self, output, mount_point: str = DEFAULT_MOUNT_POINT, path_hash_seed: int = 0,
+                 compression: Optional[str] = None):
+        if compression not in (None, 'zlib'):
+            raise PakFormatError(f"Unsupported compression method: {compression}")
+
+        self.mount_point = mount_point
+        self.path_hash_seed = path_hash_seed
+        self.compression = compression
+        self.entries: Dict[str, PakEntry] = {}
+
+        if hasattr(output, 'write'):
+            self.output_file = None
+            self._file = output
+        else:
+            self.output_file = Path(output)
+            self._file = open(self.output_file, 'wb')
+
+    def add_file(self, path: str, data: bytes):
+        path = path.replace('\\', '/').lstrip('/')
+        if path in self.entries:
+            raise PakFormatError(f"Duplicate pak entry: {path}")
+
+        offset = self._file.tell()
+
+        if self.compression is None or not data:
+            entry = PakEntry(path, offset, len(data), len(data))
+            payload = data
+        else:
+            chunks = [zlib.compress(data[i:i + COMPRESSION_BLOCK_SIZE], ZLIB_LEVEL)
+                      for i in range(0, len(data), COMPRESSION_BLOCK_SIZE)]
+            position = _entry_record_size(True, len(chunks))
+            blocks = []
+            for chunk in chunks:
+                blocks.append((position, position + len(chunk)))
+                position += len(chunk)
+            payload = b''.join(chunks)
+            entry = PakEntry(path, offset, len(payload), len(data), compression_slot=0,
+                             compression_block_size=min(len(data), COMPRESSION_BLOCK_SIZE),
+                             blocks=blocks)
+
+        self._file.write(entry.record(hashlib.sha1(payload).digest()))
+        self._file.write(payload)
+        self.entries[path] = entry
+
+
+    def finish(self):
+        index_offset = self._file.tell()
+        paths = sorted(self.entries)
+
+        encoded = io.BytesIO()
+        offsets = {}
+        for path in paths:
+            offsets[path] = encoded.tell()
+            encoded.write(self.entries[path].encode())
+        encoded_bytes = encoded.getvalue()
+
+        phi = io.BytesIO()
+        phi.write(struct.pack('<I', len(paths)))
+        for path in paths:
+            phi.write(struct.pack('<QI', fnv64_path(path, self.path_hash_seed), offsets[path]))
+        phi.write(struct.pack('<I', 0))
+        phi_bytes = phi.getvalue()
+
+        directories: Dict[str, Dict[str, int]] = {}
+        for path in paths:
+            directory, _, file_name = path.rpartition('/')
+            directory = directory + '/' if directory else '/'
+            directories.setdefault(directory, {})[file_name] = offsets[path]
+            parent = directory
+            while parent != '/':
+                parent = parent[:-1].rpartition('/')[0]
+                parent = parent + '/' if parent else '/'
+                directories.setdefault(parent, {})
+
+        fdi = io.BytesIO()
+        fdi.write(struct.pack('<I', len(directories)))
+        for directory in sorted(directories):
+            _write_fstring(fdi, directory)
+            files = directories[directory]
+            fdi.write(struct.pack('<I', len(files)))
+            for file_name in sorted(files):
+                _write_fstring(fdi, file_name)
+                fdi.write(struct.pack('<I', files[file_name]))
+        fdi_bytes = fdi.getvalue()
+
+        mount = io.BytesIO()
+        _write_fstring(mount, self.mount_point)
+        header_size = (len(mount.getvalue()) + 4 + 8
+                       + 4 + 8 + 8 + 20
+                       + 4 + 8 + 8 + 20
+                       + 4 + len(encoded_bytes) + 4)
+        phi_offset = index_offset + header_size
+        fdi_offset = phi_offset + len(phi_bytes)
+
+        index = io.BytesIO()
+        index.write(mount.getvalue())
+        index.write(struct.pack('<IQ', len(paths), self.path_hash_seed))
+        index.write(struct.pack('<IQQ', 1, phi_offset, len(phi_bytes)))
+        index.write(hashlib.sha1(phi_bytes).digest())
+        index.write(struct.pack('<IQQ', 1, fdi_offset, len(fdi_bytes)))
+        index.write(hashlib.sha1(fdi_bytes).digest())
+        index.write(struct.pack('<I', len(encoded_bytes)))
+        index.write(encoded_bytes)
+        index.write(struct.pack('<I', 0))
+        index_bytes = index.getvalue()
+
+        self._file.write(index_bytes)
+        self._file.write(phi_bytes)
+        self._file.write(fdi_bytes)
+        self._file.write(self._footer(index_offset, index_bytes))
+        if self.output_file is not None:
+            self._file.close()
+
+    def _footer(self, index_offset: int, index_bytes: bytes) -> bytes:
+        out = [b'\x00' * 16, b'\x00',
+               struct.pack('<IIQQ', PAK_MAGIC, PAK_VERSION, index_offset, len(index_bytes)),
+               hashlib.sha1(index_bytes).digest()]
+        names = ['Zlib'] if self.compression == 'zlib' else []
+        for slot in range(COMPRESSION_SLOTS):
+            name = names[slot].encode('ascii') if slot < len(names) else b''
+            out.append(name.ljust(32, b'\x00'))
+        return b''.join(out)
+
+    def abort(self):
+        if self.output_file is not None:
+            self._file.close()
+            self.output_file.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.abort()
+        return False
+
+
+def write_pak(output_file: Path, files: Dict[str, bytes], compression: Optional[str] = None,
+              mount_point: str = DEFAULT_MOUNT_POINT) -> int:
+    """
+    Builds a pak straight from an in-memory {pak path: data} map.
+    The pak is assembled in memory and written with a single call; entries are
+    sorted by path so the same input always produces the same bytes.
+    Returns the size of the written pak.
+    """
+    buffer = io.BytesIO()
+    writer = PakWriter(buffer, mount_point=mount_point, compression=compression)
+    for path in sorted(files):
+        writer.add_file(path, files[path])
+    writer.finish()
+
+    data = buffer.getvalue()
+    output_file = Path(output_file)
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    tmp_file.write_bytes(data)
+    tmp_file.replace(output_file)
+    return len(data)
+
+
+def read_directory_files(input_dir: Path) -> Dict[str, bytes]:
+    """Loads a staged mod directory into a {pak path: data} map"""
+    input_dir = Path(input_dir)
+    return {
+        file_path.relative_to(input_dir).as_posix(): file_path.read_bytes()
+        for file_path in input_dir.rglob('*') if file_path.is_file()
+    }
@@ -1,20 +1,70 @@
+import asyncio
 import logging
-import subprocess
 import json
 import re
+import shutil
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import statistics
 
+from .pak_backends import PakBackend, get_default_backends, run_blocking, select_pak_backend
+from .pak_format import PakFormatError, PakReader, write_pak, read_directory_files, load_oodle
+from .pak_runner import PakToolRunner
+from .game_vfs import GameVFS, extraction_root
+from .mod_conflicts import ModsScan, scan_mods
+from .mod_merge import MergeResult, merge_paks
+from .preview import BuildPreview
+from ..cfg.sid_index import SidIndex, build_sid_index, get_sid_index
+from ..cfg.key_index import KeyIndex, build_key_index, get_key_index
+from ..cfg.baseline import BaselineDB, build_baseline, get_baseline
+from ..cfg.diff import build_manifest
+from ..cfg.resolver import extraction_reader
+from .extraction import (
+    ExtractionState, ExtractionProgress, DirectoryProgressMonitor,
+    pak_identity, find_resumable_extraction, previous_totals, extract_pak_resumable,
+    extract_pak_to_store, get_latest_extraction
+)
+from .extraction_store import ExtractionStore, container_path, in_scope
+
 logger = logging.getLogger(__name__)
 
 class PakManager:
     
+    # Моды такого размера пакуются в процессе, без запуска repak
+    SMALL_MOD_MAX_FILES = 32
+    SMALL_MOD_MAX_BYTES = 16 * 1024 * 1024
+    
+    # Куда repak распаковывает перед переносом в контейнер
+    CONTAINER_STAGING_DIR = ".extraction_staging"
+    
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.repak_path = Path("tools/repak/repak.exe")
         self.aes_key = "0x33A604DF49A07FFD4A4C919962161F5C35A134D37EFA98DB37A34F6450D7D386"
+        config = self.config_manager.get_app_config()
+        self.runner = PakToolRunner(
+            max_concurrent=config.get('pak_max_concurrent_jobs', 2),
+            default_timeout=None
+        )
+        self.backends = get_default_backends(
+            self._get_pak_compression(),
+            runner=self.runner,
+            unpack_timeout=config.get('pak_unpack_timeout', 3600),
+            pack_timeout=config.get('pak_pack_timeout', 600)
+        )
+        self._vfs = None
+        self._vfs_key = None
+    
+    def get_backend(self, operation: str, pak_file: Optional[Path] = None) -> Optional[PakBackend]:
+        """Selects a pak backend ('pak_backend' in app config forces a specific one)"""
+        preferred = self.config_manager.get_app_config().get('pak_backend')
+        backend = select_pak_backend(operation, pak_file, self.backends, preferred)
+        if backend:
+            logger.info(f"Using pak backend '{backend.name}' for {operation}")
+        else:
+            logger.error(f"No pak backend available for {operation}")
+        return backend
     
     def extract_base_pak(self) -> bool:
         """Extract the base game PAK file and detect game version"""
@@ -31,8 +81,17 @@ class PakManager:
             logger.error(f"PAK file not found: {pak_file}")
             return False
         
-        timestamp = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
-        extract_dir = Path("data/extract") / f"pakchunk0-Windows_{timestamp}"
+        extract_root = Path("data/extract")
+        identity = pak_identity(pak_file)
+        
+        # Продолжаем прерванную распаковку того же pak, если она есть
+        extract_dir = find_resumable_extraction(extract_root, identity)
+        if extract_dir:
+            timestamp = extract_dir.name.replace("pakchunk0-Windows_", "")
+            print(f"\nResuming interrupted extraction: {extract_dir.name}")
+        else:
+            timestamp = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+            extract_dir = extract_root / f"pakchunk0-Windows_{timestamp}"
         extract_dir.mkdir(parents=True, exist_ok=True)
         
         logger.info(f"Extracting {pak_file} to {extract_dir}")
@@ -41,23 +100,80 @@ class PakManager:
         print(f"Output: {extract_dir}")
         print()
         
+        # 'container': один файл SQLite вместо сотен тысяч отдельных файлов
+        config = self.config_manager.get_app_config()
+        use_container = config.get('extraction_format', 'folder') == 'container'
+        scope = config.get('extraction_container_scope', 'gamedata') if use_container else 'all'
+        
         try:
-            cmd = [
-                str(self.repak_path),
-                "--aes-key", self.aes_key,
-                "unpack",
-                str(pak_file),
-                "--output", str(extract_dir)
-            ]
+            state = ExtractionState(extract_dir)
+            reader = self.open_pak_index(pak_file)
+            
+            if reader is not None:
+                entries = [e for e in reader.entries.values() if in_scope(e.path, scope)]
+                total_files, total_bytes = len(entries), sum(e.uncompressed_size for e in entries)
+            else:
+                total_files, total_bytes = previous_totals(extract_root, identity)
             
-            result = subprocess.run(cmd, text=True)
+            if total_files:
+                print(f"Files to extract: {total_files:,}" +
+                      (f" ({total_bytes / (1024 ** 3):.2f} GB)" if total_bytes else ""))
+            
+            state.begin(identity, total_files, total_bytes)
+            progress = ExtractionProgress(total_files, total_bytes)
+            
+            preferred = self.config_manager.get_app_config().get('pak_backend')
+            if reader is not None and preferred in (None, 'python') and reader.is_supported():
+                # Распаковка в процессе: точный прогресс и возобновление по журналу
+                backend_name = 'python'
+                if use_container:
+                    with ExtractionStore(container_path(extract_dir), readonly=False) as store:
+                        files, nbytes = extract_pak_to_store(reader, store, progress, scope)
+                else:
+                    files, nbytes = extract_pak_resumable(reader, extract_dir, state, progress)
+                progress.finish()
+                success = True
+            else:
+                backend = self.get_backend('unpack', pak_file)
+                if backend is None:
+                    print("✗ No tool available to unpack the game PAK on this system!")
+                    return False
+                
+                backend_name = backend.name
+                unpack_dir = extract_dir / self.CONTAINER_STAGING_DIR if use_container else extract_dir
+                monitor = DirectoryProgressMonitor(unpack_dir, progress)
+                monitor.start()
+                try:
+                    success = backend.unpack(pak_file, unpack_dir, self.aes_key)
+                finally:
+                    files, nbytes = monitor.stop()
+                    progress.finish()
+                
+                if success and use_container:
+                    print("Moving extracted files into the container...")
+                    with ExtractionStore(container_path(extract_dir), readonly=False) as store:
+                        files, nbytes = store.import_directory(unpack_dir, scope)
+                        store.finalize()
+                    shutil.rmtree(unpack_dir)
             
             print()
             
-            if result.returncode == 0:
+            if success:
+                state.complete({'files': files, 'bytes': nbytes, 'backend': backend_name})
                 logger.info("Extraction completed successfully")
                 print("✓ Extraction completed successfully!")
                 
+                print("Indexing prototype SIDs...")
+                try:
+                    sid_index = build_sid_index(extract_dir)
+                    print(f"✓ Indexed {len(sid_index):,} SIDs")
+                    key_index = build_key_index(extract_dir)
+                    print(f"✓ Indexed {len(key_index):,} keys")
+                    build_manifest(extract_dir)
+                except Exception as e:
+                    # индекс построится при первой сборке
+                    logger.warning(f"SID/key index build failed: {e}")
+                
                 # Определяем версию игры максимально точно
                 version_info = self.detect_game_version_precise(extract_dir)
                 
@@ -67,6 +183,15 @@ class PakManager:
                 print(f"   Methods used: {', '.join(version_info['methods_used'])}")
                 print(f"   Modern format: {'✅ Yes' if version_info['is_modern'] else '❌ No'}")
                 
+                print("Building vanilla baseline...")
+                try:
+                    baseline = build_baseline(extract_dir, version_info['version'])
+                    print(f"✓ Baseline {baseline.db_file.name}: {baseline.stats()[0]:,} prototypes")
+                    baseline.close()
+                except Exception as e:
+                    # базовая база построится при первой сборке
+                    logger.warning(f"Baseline build failed: {e}")
+                
                 # Сохраняем информацию о версии (но не путь распаковки)
                 update_data = {
                     'last_extraction': timestamp,
@@ -92,15 +217,56 @@ class PakManager:
                 
                 return True
             else:
-                logger.error(f"Extraction failed with return code: {result.returncode}")
+                logger.error(f"Extraction failed using backend {backend_name}")
                 print(f"✗ Extraction failed!")
                 return False
                 
+        except KeyboardInterrupt:
+            logger.warning(f"Extraction interrupted, it will resume from {extract_dir.name}")
+            print("\n⚠ Extraction interrupted. Run it again to continue where it stopped.")
+            return False
         except Exception as e:
             logger.error(f"Extraction error: {e}")
             print(f"✗ Extraction error: {e}")
             return False
     
+    def open_pak_index(self, pak_file: Path) -> Optional[PakReader]:
+        """Reads the index of a pak in-process (None if it cannot be read here)"""
+        try:
+            return PakReader(pak_file, aes_key=self.aes_key, oodle=load_oodle())
+        except (PakFormatError, OSError, ValueError) as e:
+            logger.info(f"Pak index of {pak_file.name} not readable in-process: {e}")
+            return None
+    
+    def get_game_pak_path(self) -> Optional[Path]:
+        """pakchunk0-Windows.pak of the configured game (None if missing)"""
+        game_path = self.config_manager.get_app_config().get('game_base_path', '')
+        if not game_path:
+            return None
+        pak_file = Path(game_path) / "Stalker2" / "Content" / "Paks" / "pakchunk0-Windows.pak"
+        return pak_file if pak_file.exists() else None
+    
+    def open_game_vfs(self) -> Optional[GameVFS]:
+        """
+        Game files straight from the pak, with the latest extraction as fallback
+        for entries that cannot be decoded in-process. Reused while neither changes.
+        """
+        pak_file = self.get_game_pak_path()
+        extraction = self.get_latest_extraction()
+        key = (pak_identity(pak_file) if pak_file else None, str(extraction) if extraction else None)
+        
+        if self._vfs is not None and self._vfs_key == key:
+            return self._vfs
+        
+        if self._vfs is not None:
+            self._vfs.close()
+        
+        cache_mb = self.config_manager.get_app_config().get('vfs_cache_mb', 64)
+        self._vfs = GameVFS.open(pak_file, aes_key=self.aes_key, extraction_dir=extraction,
+                                 cache_bytes=cache_mb * 1024 * 1024)
+        self._vfs_key = key
+        return self._vfs
+    
     def detect_game_version_precise(self, extract_dir: Path) -> Dict[str, Any]:
         """
         Точное определение версии игры множеством методов
@@ -114,7 +280,7 @@ class PakManager:
             'is_modern': False
         }
         
-        game_data = extract_dir / "Stalker2" / "Content" / "GameLite" / "GameData"
+        game_data = extraction_root(extract_dir) / "Stalker2" / "Content" / "GameLite" / "GameData"
         if not game_data.exists():
             result['details']['error'] = "GameData folder not found"
             return result
@@ -165,48 +331,47 @@ class PakManager:
         # МЕТОД 2: Поиск в CoreVariables.cfg новых параметров
         if core_vars.exists():
             try:
-                with open(core_vars, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read(16384)
-                    
-                    version_indicators = {
-                        '1.8.1': [
-                            'StaminaRegenStateCoefs',
-                            'GroundClamber',
-                            'ClamberCostMultiplier',
-                            'StaminaJumpCost',
-                            'StaminaVaultCost'
-                        ],
-                        '1.7.x': [
-                            'WeaponDurability',
-                            'ArtifactBalance',
-                            'EmissionFrequency'
-                        ],
-                        '1.6.x': [
-                            'AimAssist',
-                            'ControllerBalance',
-                            'BloodsuckerInvisibility'
-                        ],
-                        '1.5.2': [
-                            'MaxTotalWeight',
-                            'InventoryPenalty',
-                            'SprintStaminaCost'
-                        ]
-                    }
-                    
-                    found_indicators = {}
-                    for version, indicators in version_indicators.items():
-                        found = [ind for ind in indicators if ind in content]
-                        if found:
-                            found_indicators[version] = found
-                            result['details'][f'indicators_{version}'] = found
-                    
-                    if found_indicators and result['confidence'] < 80:
-                        best_version = max(found_indicators.items(), key=lambda x: len(x[1]))
-                        if len(best_version[1]) >= 2:
-                            result['version'] = best_version[0]
-                            result['confidence'] = 80
-                            result['methods_used'].append("parameter_analysis")
-                            result['is_modern'] = '1.8.1' in best_version[0]
+                content = core_vars.read_text(encoding='utf-8', errors='ignore')[:16384]
+                
+                version_indicators = {
+                    '1.8.1': [
+                        'StaminaRegenStateCoefs',
+                        'GroundClamber',
+                        'ClamberCostMultiplier',
+                        'StaminaJumpCost',
+                        'StaminaVaultCost'
+                    ],
+                    '1.7.x': [
+                        'WeaponDurability',
+                        'ArtifactBalance',
+                        'EmissionFrequency'
+                    ],
+                    '1.6.x': [
+                        'AimAssist',
+                        'ControllerBalance',
+                        'BloodsuckerInvisibility'
+                    ],
+                    '1.5.2': [
+                        'MaxTotalWeight',
+                        'InventoryPenalty',
+                        'SprintStaminaCost'
+                    ]
+                }
+                
+                found_indicators = {}
+                for version, indicators in version_indicators.items():
+                    found = [ind for ind in indicators if ind in content]
+                    if found:
+                        found_indicators[version] = found
+                        result['details'][f'indicators_{version}'] = found
+                
+                if found_indicators and result['confidence'] < 80:
+                    best_version = max(found_indicators.items(), key=lambda x: len(x[1]))
+                    if len(best_version[1]) >= 2:
+                        result['version'] = best_version[0]
+                        result['confidence'] = 80
+                        result['methods_used'].append("parameter_analysis")
+                        result['is_modern'] = '1.8.1' in best_version[0]
             except Exception as e:
                 result['details']['core_vars_error'] = str(e)
         
@@ -254,17 +419,16 @@ class PakManager:
             manifest_files = list(game_data.rglob("*.manifest")) + list(game_data.rglob("*.version"))
             for mf in manifest_files[:5]:
                 try:
-                    with open(mf, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read(8192)
-                        version_match = re.search(r'(\d+\.\d+\.\d+(?:\.\d+)?)', content)
-                        if version_match:
-                            found_version = version_match.group(1)
-                            if result['confidence'] < 85:
-                                result['version'] = found_version
-                                result['confidence'] = 85
-                                result['methods_used'].append(f"manifest_{mf.name}")
-                                result['is_modern'] = found_version.startswith('1.8')
-                            break
+                    content = mf.read_text(encoding='utf-8', errors='ignore')[:8192]
+                    version_match = re.search(r'(\d+\.\d+\.\d+(?:\.\d+)?)', content)
+                    if version_match:
+                        found_version = version_match.group(1)
+                        if result['confidence'] < 85:
+                            result['version'] = found_version
+                            result['confidence'] = 85
+                            result['methods_used'].append(f"manifest_{mf.name}")
+                            result['is_modern'] = found_version.startswith('1.8')
+                        break
                 except:
                     pass
         except Exception as e:
@@ -373,30 +537,58 @@ class PakManager:
             'detected_at': config.get('game_version_detected_at', 'unknown')
         }
     
+    def _get_pak_compression(self) -> Optional[str]:
+        compression = self.config_manager.get_app_config().get('pak_compression')
+        return compression if compression in ('zlib',) else None
+    
+    def pack_files(self, files: Dict[str, bytes], output_file: Path) -> bool:
+        """Pack an in-memory {pak path: data} map with the in-process V11 writer"""
+        try:
+            size = write_pak(output_file, files, self._get_pak_compression())
+            logger.info(f"Packed {len(files)} file(s) in-process to {output_file} ({size} bytes)")
+            return True
+        except (PakFormatError, OSError) as e:
+            logger.error(f"In-process packing failed: {e}")
+            return False
+    
+    def _is_small_mod(self, input_dir: Path) -> bool:
+        count = 0
+        total = 0
+        for file_path in input_dir.rglob('*'):
+            if file_path.is_file():
+                count += 1
+                total += file_path.stat().st_size
+                if count > self.SMALL_MOD_MAX_FILES or total > self.SMALL_MOD_MAX_BYTES:
+                    return False
+        return count > 0
+    
     def pack_mod(self, input_dir: Path, output_file: Path) -> bool:
         """Pack a mod directory into a .pak file"""
         logger.info(f"Packing {input_dir} to {output_file}")
         print(f"Packing mod: {output_file.name}")
         print()
         
+        preferred = self.config_manager.get_app_config().get('pak_backend')
+        if preferred in (None, 'python') and self._is_small_mod(input_dir):
+            if self.pack_files(read_directory_files(input_dir), output_file):
+                return True
+            print("⚠ In-process packing failed, falling back to external tool")
+        
         try:
-            cmd = [
-                str(self.repak_path),
-                "pack",
-                "--version", "V11",
-                str(input_dir),
-                str(output_file)
-            ]
+            backend = self.get_backend('pack')
+            if backend is None:
+                print("✗ No tool available to pack the mod on this system!")
+                return False
             
-            result = subprocess.run(cmd, text=True)
+            success = backend.pack(input_dir, output_file)
             
             print()
             
-            if result.returncode == 0:
-                logger.info("Packing completed successfully")
+            if success:
+                logger.info(f"Packing completed successfully ({backend.name})")
                 return True
             else:
-                logger.error(f"Packing failed with return code: {result.returncode}")
+                logger.error(f"Packing failed using backend {backend.name}")
                 print(f"✗ Packing failed!")
                 return False
                 
@@ -405,22 +597,116 @@ class PakManager:
             print(f"✗ Packing error: {e}")
             return False
     
-    def get_latest_extraction(self) -> Optional[Path]:
-        """Get the path to the latest extraction folder (always searches in data/extract)"""
-        extract_dir = Path("data/extract")
-        if not extract_dir.exists():
+    async def pack_mod_async(self, input_dir: Path, output_file: Path) -> bool:
+        """Async variant of pack_mod for batch/service modes (no console output)"""
+        preferred = self.config_manager.get_app_config().get('pak_backend')
+        if preferred in (None, 'python') and self._is_small_mod(input_dir):
+            files = await run_blocking(read_directory_files, input_dir)
+            if await run_blocking(self.pack_files, files, output_file):
+                return True
+        
+        backend = await run_blocking(self.get_backend, 'pack')
+        if backend is None:
+            return False
+        
+        try:
+            return await backend.pack_async(input_dir, output_file)
+        except OSError as e:
+            logger.error(f"Packing error: {e}")
+            return False
+    
+    async def pack_mods_async(self, jobs: List[Tuple[Path, Path]]) -> List[bool]:
+        """Packs several (input_dir, output_file) jobs concurrently, bounded by the runner limit"""
+        tasks = [self.runner.track(self.pack_mod_async(input_dir, output_file))
+                 for input_dir, output_file in jobs]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return [result is True for result in results]
+    
+    def cancel_pak_jobs(self):
+        """Cancels all running async pak jobs (their processes are terminated)"""
+        self.runner.cancel_all()
+    
+    def get_sid_index(self, extract_dir: Optional[Path] = None, build: bool = True) -> Optional[SidIndex]:
+        """SID index of an extraction (latest by default), built on first use unless `build` is False"""
+        extract_dir = extract_dir or self.get_latest_extraction()
+        if extract_dir is None:
             return None
+        try:
+            return get_sid_index(extract_dir, build)
+        except Exception as e:
+            logger.warning(f"SID index unavailable for {extract_dir.name}: {e}")
+            return None
+    
+    def get_key_index(self, extract_dir: Optional[Path] = None) -> Optional[KeyIndex]:
+        """Key index of an extraction (latest by default), built on first use"""
+        extract_dir = extract_dir or self.get_latest_extraction()
+        if extract_dir is None:
+            return None
+        try:
+            return get_key_index(extract_dir)
+        except Exception as e:
+            logger.warning(f"Key index unavailable for {extract_dir.name}: {e}")
+            return None
+    
+    def get_baseline(self, extract_dir: Optional[Path] = None, version: Optional[str] = None,
+                     build: bool = True) -> Optional[BaselineDB]:
+        """
+        Vanilla baseline of the detected game version, built from the extraction
+        (latest by default) on first use; with build=False only an existing one is opened
+        """
+        extract_dir = extract_dir or self.get_latest_extraction()
+        version = version or self.get_game_version()
+        if extract_dir is None or version == 'unknown':
+            return None
+        try:
+            return get_baseline(extract_dir, version, self.get_sid_index(extract_dir, build), build)
+        except Exception as e:
+            logger.warning(f"Baseline unavailable for {version}: {e}")
+            return None
+    
+    def get_mods_dir(self) -> Optional[Path]:
+        """~mods folder of the configured game (None if the game path is not set); never created here"""
+        from .game_manager import GameManager
         
-        extractions = []
-        for item in extract_dir.iterdir():
-            if item.is_dir() and 'pakchunk' in item.name.lower():
-                try:
-                    extractions.append((item.stat().st_mtime, item))
-                except:
-                    extractions.append((0, item))
+        game_manager = GameManager(self.config_manager)
+        if not game_manager.game_path or not game_manager.game_path.exists():
+            return None
+        return game_manager.get_mods_directory(create=False)
+    
+    def scan_installed_mods(self, mods_dir: Optional[Path] = None) -> Optional[ModsScan]:
+        """Which installed mod paks ship the same files (pak indices only, cached)"""
+        mods_dir = mods_dir or self.get_mods_dir()
+        if mods_dir is None or not mods_dir.is_dir():
+            return None
+        return scan_mods(mods_dir, aes_key=self.aes_key)
+    
+    def merge_mods(self, paks: List[Path], output_file: Path) -> Optional[MergeResult]:
+        """
+        Merges several mod paks into one pak (see merge_paks). Vanilla values come
+        from the game pak, or the latest extraction when the game is not set up.
+        Returns None if a pak cannot be read or the result cannot be packed.
+        """
+        vfs = self.open_game_vfs()
+        extraction = self.get_latest_extraction()
+        if vfs is not None:
+            read = vfs.read_bytes
+        elif extraction is not None:
+            read = extraction_reader(extraction)
+        else:
+            logger.warning("No game files found: merging without vanilla values")
+            read = None
+        vanilla = BuildPreview(read, []) if read is not None else None
         
-        if extractions:
-            extractions.sort(key=lambda x: x[0], reverse=True)
-            return extractions[0][1]
+        try:
+            result = merge_paks(paks, lambda rel_file: vanilla.vanilla(rel_file, by_name=False) if vanilla else None,
+                                aes_key=self.aes_key)
+        except (PakFormatError, OSError) as e:
+            logger.error(f"Mod merge failed: {e}")
+            return None
         
-        return None
\ No newline at end of file
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        return result if self.pack_files(result.files, output_file) else None
+    
+    def get_latest_extraction(self) -> Optional[Path]:
+        """Get the path to the latest complete extraction folder (always searches in data/extract)"""
+        return get_latest_extraction(Path("data/extract"))
\ No newline at end of file
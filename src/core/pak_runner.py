@@ -0,0 +1,180 @@
+"""Asyncio runner for external pak tool processes (repak)"""
+
+import asyncio
+import logging
+import time
+import weakref
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# (job name, stream name 'stdout'/'stderr', line)
+LineCallback = Callable[[str, str, str], None]
+
+class PakJobResult:
+    """Outcome of one tool invocation"""
+
+    def __init__(self, name: str, returncode: Optional[int], duration: float,
+                 timed_out: bool = False, cancelled: bool = False):
+        self.name = name
+        self.returncode = returncode
+        self.duration = duration
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+    def __repr__(self):
+        return (f"PakJobResult({self.name!r}, returncode={self.returncode}, "
+                f"duration={self.duration:.2f}s, timed_out={self.timed_out}, cancelled={self.cancelled})")
+
+
+class PakToolRunner:
+    """
+    Runs pak tool commands as asyncio subprocesses.
+
+    * at most `max_concurrent` processes run at once (bounded semaphore per event loop)
+    * every job has a timeout; a timed out or cancelled job is terminated, then killed
+    * stdout/stderr are read while the process runs and forwarded line by line to the log
+      (and optionally echoed to the console and to a callback)
+
+    Async callers (batch/service modes) use `run`/`run_many`; the interactive CLI uses `run_sync`.
+    """
+
+    TERMINATE_GRACE = 5.0
+    READ_CHUNK = 4096
+
+    def __init__(self, max_concurrent: int = 2, default_timeout: Optional[float] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.default_timeout = default_timeout
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._tasks = set()
+
+    def _get_semaphore(self) -> asyncio.BoundedSemaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.BoundedSemaphore(self.max_concurrent)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _pump(self, stream: asyncio.StreamReader, job: str, stream_name: str,
+                    echo: bool, on_line: Optional[LineCallback]):
+        """Reads a stream in chunks; repak progress output uses '\\r', so both '\\r' and '\\n' end a line"""
+        level = logging.INFO if stream_name == 'stdout' else logging.WARNING
+        pending = b''
+
+        def emit(raw: bytes):
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line:
+                return
+            logger.log(level, f"[{job}] {line}")
+            if echo:
+                print(line)
+            if on_line:
+                on_line(job, stream_name, line)
+
+        while True:
+            chunk = await stream.read(self.READ_CHUNK)
+            if not chunk:
+                break
+            pending += chunk.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            *lines, pending = pending.split(b'\n')
+            for raw in lines:
+                emit(raw)
+
+        emit(pending)
+
+    async def _stop(self, process: asyncio.subprocess.Process):
+        if process.returncode is not None:
+            return
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), self.TERMINATE_GRACE)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def run(self, cmd: Sequence[str], name: Optional[str] = None, timeout: Optional[float] = None,
+                  echo: bool = False, on_line: Optional[LineCallback] = None) -> PakJobResult:
+        """Runs one command under the concurrency limit and returns its result"""
+        name = name or str(cmd[0])
+        timeout = timeout if timeout is not None else self.default_timeout
+
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            logger.info(f"[{name}] starting: {' '.join(str(c) for c in cmd)}")
+
+            process = await asyncio.create_subprocess_exec(
+                *[str(c) for c in cmd],
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            pumps = asyncio.gather(
+                self._pump(process.stdout, name, 'stdout', echo, on_line),
+                self._pump(process.stderr, name, 'stderr', echo, on_line)
+            )
+
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+                await pumps
+            except asyncio.TimeoutError:
+                logger.error(f"[{name}] timed out after {timeout}s, terminating")
+                await self._stop(process)
+                pumps.cancel()
+                return PakJobResult(name, process.returncode, time.perf_counter() - start, timed_out=True)
+            except asyncio.CancelledError:
+                logger.warning(f"[{name}] cancelled, terminating")
+                await asyncio.shield(self._stop(process))
+                pumps.cancel()
+                raise
+
+            duration = time.perf_counter() - start
+            logger.info(f"[{name}] finished with code {process.returncode} in {duration:.2f}s")
+            return PakJobResult(name, process.returncode, duration)
+
+    async def run_many(self, commands: List[Sequence[str]], names: Optional[List[str]] = None,
+                       timeout: Optional[float] = None) -> List[PakJobResult]:
+        """Runs several commands concurrently (still bounded by max_concurrent)"""
+        names = names or [None] * len(commands)
+        tasks = [self.track(self.run(cmd, name=name, timeout=timeout)) for cmd, name in zip(commands, names)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        final = []
+        for cmd, name, result in zip(commands, names, results):
+            if isinstance(result, asyncio.CancelledError):
+                final.append(PakJobResult(name or str(cmd[0]), None, 0.0, cancelled=True))
+            elif isinstance(result, BaseException):
+                logger.error(f"[{name or cmd[0]}] failed to start: {result}")
+                final.append(PakJobResult(name or str(cmd[0]), None, 0.0))
+            else:
+                final.append(result)
+        return final
+
+    def track(self, coro) -> asyncio.Task:
+        """Schedules a coroutine as a task that cancel_all() can stop"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def cancel_all(self):
+        """Cancels every tracked job (their processes are terminated)"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def run_sync(self, cmd: Sequence[str], name: Optional[str] = None, timeout: Optional[float] = None,
+                 echo: bool = True, on_line: Optional[LineCallback] = None) -> PakJobResult:
+        """Blocking wrapper for the interactive CLI; Ctrl+C terminates the child process"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("run_sync() called from a running event loop, use 'await run()' instead")
+
+        return asyncio.run(self.run(cmd, name=name, timeout=timeout, echo=echo, on_line=on_line))
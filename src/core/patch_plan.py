@@ -0,0 +1,148 @@
+"""Patch plan: cfg edits of every selected module, grouped so each target file is read and written once"""
+
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from ..cfg.binary import open_cfg
+from ..cfg.delta import OverrideError, gamedata_relative, overlay_override, write_override
+from ..cfg.document import CfgDocument
+from ..cfg.expressions import RuleError, compile_rule
+
+logger = logging.getLogger(__name__)
+
+
+class PatchPlanError(Exception):
+    pass
+
+
+class PatchEdit(NamedTuple):
+    """
+    One value to set. `file` is a file name ('CoreVariables.cfg') or a path below
+    GameData; `path` is a CfgDocument pattern ('**/RealToGameTimeCoef'). With
+    `after`, only the first match following the first value matching `after`
+    is changed (for files where the same key repeats in every prototype).
+    With `rule`, `value` is a value rule ('Damage *= 1.5 if Class == ...', see
+    src.cfg.expressions) applied to every value it matches.
+    """
+    file: str
+    path: str
+    value: str
+    module: str
+    after: Optional[str] = None
+    rule: bool = False
+
+
+class PatchPlan:
+
+    def __init__(self):
+        self._edits: Dict[str, List[PatchEdit]] = {}
+
+    def __len__(self):
+        return sum(len(edits) for edits in self._edits.values())
+
+    def add(self, edit: PatchEdit):
+        self._edits.setdefault(edit.file, []).append(edit)
+
+    def extend(self, edits: List[PatchEdit]):
+        for edit in edits:
+            self.add(edit)
+
+    def files(self) -> List[str]:
+        return list(self._edits)
+
+    def compile(self) -> Tuple[Dict[str, List[PatchEdit]], List[str]]:
+        """
+        Per target file, the edits left after later ones replace earlier ones on
+        the same key, plus a warning for every key two modules set differently.
+        """
+        compiled: Dict[str, List[PatchEdit]] = {}
+        conflicts: List[str] = []
+        for file, edits in self._edits.items():
+            merged: Dict[tuple, PatchEdit] = {}
+            for edit in edits:
+                # Правила не заменяют друг друга: '*=' двух модулей складываются
+                key = (edit.path, edit.after, edit.value if edit.rule else None)
+                previous = merged.pop(key, None)
+                if previous is not None and previous.value != edit.value and previous.module != edit.module:
+                    conflicts.append(f"{file}: {edit.path} = {previous.value} ({previous.module}) "
+                                     f"replaced by {edit.value} ({edit.module})")
+                merged[key] = edit
+            compiled[file] = list(merged.values())
+        return compiled, conflicts
+
+    def execute(self, game_data_path: Path, find_file: Callable[[str], Optional[Path]], mod_name: str) -> List[Path]:
+        """
+        `find_file` takes a file name or a path below GameData, as in PatchEdit.file.
+        Opens every target file once, applies its edits and saves a delta override
+        (or the whole file, see write_override). A file the mod already ships whole
+        is edited in place, so modules writing files themselves can run first.
+        """
+        documents = self.apply(game_data_path, find_file, mod_name)
+        try:
+            written = [write_override(doc, rel_file, game_data_path, mod_name) for rel_file, doc in documents]
+            return [output_file for output_file in written if output_file is not None]
+        except OverrideError as e:
+            raise PatchPlanError(str(e))
+        finally:
+            # Открытые через mmap файлы игры иначе остаются заблокированными (Windows)
+            for _, doc in documents:
+                doc.close()
+
+    def apply(self, game_data_path: Path, find_file: Callable[[str], Optional[Path]],
+              mod_name: Optional[str] = None) -> List[Tuple[str, CfgDocument]]:
+        """
+        Edited documents as (GameData-relative file, document), nothing is written;
+        the caller closes them. With `mod_name` a delta override the mod already
+        ships is applied first, so edits build on it.
+        """
+        compiled, conflicts = self.compile()
+        for conflict in conflicts:
+            logger.warning(f"Patch conflict: {conflict}")
+            print(f"⚠ {conflict}")
+
+        documents = []
+        try:
+            for file, edits in compiled.items():
+                # С путём ищется именно этот файл: одноимённые файлы есть в разных папках GameData
+                source_file = find_file(file) or find_file(f"{file}.bin")
+                if source_file is None:
+                    raise PatchPlanError(f"{file} not found in game files")
+
+                shipped = Path(game_data_path) / gamedata_relative(source_file)
+                if shipped.name.endswith('.bin'):
+                    shipped = shipped.with_name(shipped.name[:-len('.bin')])
+                if shipped.exists():
+                    source_file = shipped
+
+                doc = open_cfg(source_file)
+                documents.append((gamedata_relative(source_file), doc))
+                if mod_name and source_file != shipped:
+                    try:
+                        overlay_override(doc, gamedata_relative(source_file), game_data_path, mod_name)
+                    except OverrideError as e:
+                        raise PatchPlanError(str(e))
+                for edit in edits:
+                    if edit.rule:
+                        try:
+                            changed = compile_rule(edit.value).apply(doc)
+                        except RuleError as e:
+                            raise PatchPlanError(f"{file}: {e}")
+                    elif edit.after is not None:
+                        anchor = doc.find(edit.after)
+                        target = doc.first_after(edit.path, anchor.start) if anchor is not None else None
+                        changed = 0
+                        if target is not None:
+                            doc.set_value(target, edit.value)
+                            changed = 1
+                    else:
+                        changed = doc.set(edit.path, edit.value)
+                    if not changed:
+                        logger.warning(f"{file}: nothing matches {edit.path} ({edit.module})")
+
+                logger.info(f"Patched {file}: {len(edits)} edit(s)")
+        except BaseException:
+            for _, doc in documents:
+                doc.close()
+            raise
+        return documents
@@ -0,0 +1,126 @@
+"""Dry-run preview: what a build changes, as key diffs of its cfg files against the vanilla ones"""
+
+import logging
+import os
+import posixpath
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..cfg.diff import KeyChange, diff_maps, parse, value_map
+from ..cfg.document import CfgDocument
+from ..cfg.sid_index import GAMEDATA_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class BuildPreview:
+    """
+    Compares built cfg files with the game's: a full copy against the vanilla
+    file of the same path (or name), a refurl/refkey override against the struct
+    it inherits from, so `Knife/Damage: 51.f -> 102.f` is reported for a delta
+    file as well. Vanilla files are parsed once per preview.
+    """
+
+    def __init__(self, read: Callable[[str], bytes], files: Iterable[str]):
+        self.read = read    # путь в распаковке -> байты
+        # Имя файла -> самый неглубокий путь с таким именем
+        self._by_name: Dict[str, str] = {}
+        for file in sorted(files, key=lambda f: (f.count('/'), f)):
+            self._by_name.setdefault(file.rpartition('/')[2].lower(), file)
+        self._vanilla: Dict[Tuple[str, bool], Optional[Dict[str, str]]] = {}
+
+    def vanilla(self, rel_file: str, by_name: bool = True) -> Optional[Dict[str, str]]:
+        """path -> value of a vanilla GameData file (.cfg or .cfg.bin), None if the game has none"""
+        cache_key = (rel_file, by_name)
+        if cache_key not in self._vanilla:
+            values = None
+            for candidate in (rel_file, rel_file + '.bin'):
+                try:
+                    values = value_map(parse(candidate, self.read(f"{GAMEDATA_PATH}/{candidate}")))
+                    break
+                except OSError:
+                    continue
+            if values is None and by_name:
+                name = rel_file.rpartition('/')[2].lower()
+                found = self._by_name.get(name) or self._by_name.get(f"{name}.bin")
+                if found is not None:
+                    values = value_map(parse(found, self.read(found)))
+            self._vanilla[cache_key] = values
+        return self._vanilla[cache_key]
+
+    def diff(self, rel_file: str, doc: CfgDocument) -> List[KeyChange]:
+        new = value_map(doc, current=True)
+        old = self.vanilla(rel_file, by_name=not self._is_override(doc))
+        if old is not None:
+            return diff_maps(old, new)
+        return self._diff_override(rel_file, doc, new)
+
+    @staticmethod
+    def _is_override(doc: CfgDocument) -> bool:
+        return any(struct.parent is None and struct.refs for struct in doc.structs)
+
+    def _diff_override(self, rel_file: str, doc: CfgDocument, new: Dict[str, str]) -> List[KeyChange]:
+        # Верхние структуры с refurl/refkey сравниваются с тем, от чего наследуют
+        bases: Dict[str, Tuple[Optional[Dict[str, str]], str]] = {}
+        for struct in doc.structs:
+            if struct.parent is not None:
+                continue
+            refs = struct.refs
+            target = rel_file
+            if refs.get('refurl'):
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(rel_file), refs['refurl']))
+            base_name = refs.get('refkey') or struct.name
+            bases[struct.name] = (self.vanilla(target) if refs else None, base_name)
+
+        changes = []
+        for path, value in new.items():
+            top, _, rest = path.partition('/')
+            base, base_name = bases.get(top, (None, top))
+            base_path = f"{base_name}/{rest}" if rest else base_name
+            old = base.get(base_path) if base is not None else None
+            if old != value:
+                changes.append(KeyChange(base_path if base is not None else path, old, value))
+        return changes
+
+    def run(self, staged_dir: Path) -> Dict[str, List[KeyChange]]:
+        """
+        file -> changes for every cfg a build would ship, as staged in `staged_dir`
+        (GameData folder): full copies and `<File>/<Mod>.cfg` delta overrides alike.
+        """
+        docs: Dict[str, CfgDocument] = {}
+        if staged_dir.exists():
+            for dirpath, dirnames, filenames in os.walk(staged_dir):
+                for filename in filenames:
+                    if filename.endswith('.cfg'):
+                        path = Path(dirpath) / filename
+                        docs[path.relative_to(staged_dir).as_posix()] = CfgDocument.from_bytes(path.read_bytes(), path)
+
+        result = {}
+        for rel_file in sorted(docs):
+            try:
+                changes = self.diff(rel_file, docs[rel_file])
+            except ValueError as e:
+                logger.warning(f"Cannot preview {rel_file}: {e}")
+                continue
+            if changes:
+                result[rel_file] = changes
+        return result
+
+
+def format_preview(changes: Dict[str, List[KeyChange]]) -> List[str]:
+    lines = []
+    for rel_file, file_changes in changes.items():
+        lines.append(rel_file)
+        for change in file_changes:
+            old = '(new)' if change.old is None else change.old
+            new = '(removed)' if change.new is None else change.new
+            lines.append(f"  {change.path}: {old} -> {new}")
+    return lines
+
+
+def preview_json(mod_name: str, changes: Dict[str, List[KeyChange]]) -> Dict[str, object]:
+    return {
+        'mod': mod_name,
+        'files': {rel_file: [{'path': c.path, 'kind': c.kind, 'old': c.old, 'new': c.new} for c in file_changes]
+                  for rel_file, file_changes in changes.items()},
+    }
@@ -0,0 +1,294 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+class ProfileManager:
+    """
+    Modpack profiles for the game's ~mods folder.
+
+    Every pak is stored once in a content store (data/profiles/store/<sha256>.pak),
+    a profile is just a manifest {pak file name -> hash}. Activating a profile
+    reconciles ~mods with hard links (or symlinks) into the store and only touches
+    the entries that differ from the currently active profile.
+    """
+
+    LINK_MODES = ('auto', 'hardlink', 'symlink', 'copy')
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, config_manager, game_manager):
+        self.config_manager = config_manager
+        self.game_manager = game_manager
+        self.profiles_dir = Path("data/profiles")
+        self.store_dir = self.profiles_dir / "store"
+        self.state_file = self.profiles_dir / "active_state.json"
+
+    def _ensure_dirs(self):
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _manifest_path(self, name: str) -> Path:
+        return self.profiles_dir / f"{name}.json"
+
+    def _blob_path(self, pak_hash: str) -> Path:
+        return self.store_dir / f"{pak_hash}.pak"
+
+    def _get_link_mode(self) -> str:
+        mode = self.config_manager.get_app_config().get('profile_link_mode', 'auto')
+        return mode if mode in self.LINK_MODES else 'auto'
+
+    @classmethod
+    def hash_file(cls, file_path: Path) -> str:
+        """Returns sha256 of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(cls.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Content store
+    # ------------------------------------------------------------------
+
+    def add_to_store(self, pak_file: Path) -> str:
+        """Adds a pak to the content store (once per content) and returns its hash"""
+        self._ensure_dirs()
+        pak_hash = self.hash_file(pak_file)
+        blob = self._blob_path(pak_hash)
+
+        if not blob.exists():
+            tmp_blob = blob.with_suffix('.tmp')
+            shutil.copy2(pak_file, tmp_blob)
+            os.replace(tmp_blob, blob)
+            logger.info(f"Stored {pak_file.name} as {blob.name}")
+
+        return pak_hash
+
+    def collect_garbage(self) -> int:
+        """Removes store blobs not referenced by any profile. Returns number of removed blobs"""
+        if not self.store_dir.exists():
+            return 0
+
+        referenced = set()
+        for name in self.list_profiles():
+            manifest = self.load_profile(name)
+            if manifest:
+                referenced.update(manifest.get('paks', {}).values())
+
+        state = self._load_state()
+        referenced.update(state.get('entries', {}).values())
+
+        removed = 0
+        for blob in self.store_dir.glob("*.pak"):
+            if blob.stem not in referenced:
+                try:
+                    blob.unlink()
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove store blob {blob.name}: {e}")
+
+        return removed
+
+    # ------------------------------------------------------------------
+    # Profiles
+    # ------------------------------------------------------------------
+
+    def list_profiles(self) -> List[str]:
+        if not self.profiles_dir.exists():
+            return []
+        return sorted(
+            p.stem for p in self.profiles_dir.glob("*.json")
+            if p != self.state_file
+        )
+
+    def load_profile(self, name: str) -> Optional[Dict[str, Any]]:
+        manifest_file = self._manifest_path(name)
+        if not manifest_file.exists():
+            return None
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load profile {name}: {e}")
+            return None
+
+    def create_profile(self, name: str, pak_files: List[Path]) -> bool:
+        """Creates (or replaces) a profile from a list of pak files"""
+        if not name or Path(name).name != name or name == self.state_file.stem:
+            logger.error(f"Invalid profile name: {name!r}")
+            return False
+
+        paks = {}
+        try:
+            for pak_file in pak_files:
+                if not pak_file.is_file():
+                    logger.error(f"Pak file not found: {pak_file}")
+                    return False
+                paks[pak_file.name] = self.add_to_store(pak_file)
+        except OSError as e:
+            logger.error(f"Failed to store paks for profile {name}: {e}")
+            return False
+
+        manifest = {
+            'name': name,
+            'created_at': datetime.now().isoformat(),
+            'paks': paks
+        }
+
+        with open(self._manifest_path(name), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        logger.info(f"Profile {name} saved with {len(paks)} pak(s)")
+        return True
+
+    def snapshot_mods_directory(self, name: str) -> bool:
+        """Creates a profile from the paks currently installed in ~mods"""
+        mods_dir = self.game_manager.get_mods_directory()
+        return self.create_profile(name, sorted(mods_dir.glob("*.pak")))
+
+    def delete_profile(self, name: str) -> bool:
+        manifest_file = self._manifest_path(name)
+        if not manifest_file.exists():
+            return False
+        manifest_file.unlink()
+        return True
+
+    def get_active_profile(self) -> Optional[str]:
+        return self._load_state().get('profile')
+
+    # ------------------------------------------------------------------
+    # Activation
+    # ------------------------------------------------------------------
+
+    def _load_state(self) -> Dict[str, Any]:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable profile state: {e}")
+            return {}
+
+    def _save_state(self, profile: Optional[str], entries: Dict[str, str]):
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'profile': profile,
+                'entries': entries,
+                'activated_at': datetime.now().isoformat()
+            }, f, indent=2)
+
+    def _is_linked_to(self, target: Path, blob: Path) -> bool:
+        """True if target in ~mods already points to the store blob (or is an untouched copy of it)"""
+        try:
+            if os.path.samefile(target, blob):
+                return True
+            target_stat = target.lstat()
+            blob_stat = blob.stat()
+        except OSError:
+            return False
+        # copy2 сохраняет mtime, поэтому копия из режима 'copy' узнаётся без хеширования
+        return (not target.is_symlink()
+                and target_stat.st_size == blob_stat.st_size
+                and int(target_stat.st_mtime) == int(blob_stat.st_mtime))
+
+    def _link(self, blob: Path, target: Path) -> str:
+        """Creates target pointing to blob, returns the method that worked"""
+        mode = self._get_link_mode()
+
+        if mode in ('auto', 'hardlink'):
+            try:
+                os.link(blob, target)
+                return 'hardlink'
+            except OSError as e:
+                if mode == 'hardlink':
+                    raise
+                logger.debug(f"Hard link failed for {target.name}: {e}")
+
+        if mode in ('auto', 'symlink'):
+            try:
+                os.symlink(blob.resolve(), target)
+                return 'symlink'
+            except OSError as e:
+                if mode == 'symlink':
+                    raise
+                logger.debug(f"Symlink failed for {target.name}: {e}")
+
+        shutil.copy2(blob, target)
+        return 'copy'
+
+    def activate_profile(self, name: Optional[str]) -> Optional[Dict[str, int]]:
+        """
+        Reconciles ~mods with the given profile (None deactivates).
+        Only entries that differ are linked or removed; paks in ~mods that were
+        not placed by a profile are never touched.
+        """
+        if name is None:
+            desired = {}
+        else:
+            manifest = self.load_profile(name)
+            if manifest is None:
+                logger.error(f"Profile not found: {name}")
+                return None
+            desired = manifest.get('paks', {})
+
+        mods_dir = self.game_manager.get_mods_directory()
+        managed = self._load_state().get('entries', {})
+        stats = {'linked': 0, 'removed': 0, 'unchanged': 0, 'skipped': 0, 'copied': 0}
+        active = {}
+        foreign = set()
+
+        # Удаляем записи, которые ставил профиль, но которых нет в новом
+        for file_name, pak_hash in managed.items():
+            if desired.get(file_name) == pak_hash:
+                continue
+            target = mods_dir / file_name
+            if not os.path.lexists(target):
+                continue
+            if target.is_symlink() or self._is_linked_to(target, self._blob_path(pak_hash)) \
+                    or self.hash_file(target) == pak_hash:
+                target.unlink()
+                stats['removed'] += 1
+            else:
+                logger.warning(f"{file_name} in ~mods was modified outside profiles, leaving it")
+                foreign.add(file_name)
+
+        for file_name, pak_hash in desired.items():
+            blob = self._blob_path(pak_hash)
+            target = mods_dir / file_name
+
+            if not blob.exists():
+                logger.error(f"Store blob missing for {file_name} ({pak_hash})")
+                stats['skipped'] += 1
+                continue
+
+            if os.path.lexists(target):
+                if self._is_linked_to(target, blob):
+                    active[file_name] = pak_hash
+                    stats['unchanged'] += 1
+                    continue
+                if file_name not in managed or file_name in foreign:
+                    logger.warning(f"{file_name} already exists in ~mods and is not managed by profiles, skipping")
+                    stats['skipped'] += 1
+                    continue
+                target.unlink()
+
+            method = self._link(blob, target)
+            active[file_name] = pak_hash
+            stats['linked'] += 1
+            if method == 'copy':
+                stats['copied'] += 1
+
+        self._save_state(name, active)
+        logger.info(f"Activated profile {name}: {stats}")
+        return stats
+
+    def deactivate(self) -> Optional[Dict[str, int]]:
+        """Removes all profile-managed paks from ~mods"""
+        return self.activate_profile(None)
@@ -1,23 +1,67 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
+import fnmatch
 import json
+import os
+import posixpath
 from src.i18n import i18n, _   # ← исправленный импорт
+from src.core.game_vfs import GameVFS
+from src.core.extraction_store import has_container
+from src.cfg.resolver import InheritanceResolver, CfgResolveError, extraction_reader
+from src.cfg.delta import gamedata_relative, override_location, write_override
+from src.cfg.binary import CfgBinError
+from src.cfg.document import path_matches
+from src.cfg.baseline import BaselineDB
+from src.cfg.lint import lint_file
+from src.core.patch_plan import PatchEdit, PatchPlan, PatchPlanError
+from src.core.bulk_rewrite import BulkRewriter, RewrittenFile
 
 class BaseModule(ABC):
     
+    # (файл GameData, путь ключа в синтаксисе select) - что правит модуль, для отчётов о патчах игры
+    TARGETS: List[Tuple[str, str]] = []
+    
     def __init__(self):
         self.name = self.__class__.__name__
         self.display_name = _(self.name.replace('Module', '').replace('_', ' '))
         self.source_dir = Path("to-mod-vanilla-files")
         self.output_dir = Path("modded-files")
         self.config_manager = None
+        self.vfs = None
+        self.sid_index = None
+        self.baseline = None
+        self.game_version = None
+        self.mod_name = None
+        self._resolver = None
         self._structure_cache = None
     
     def set_config_manager(self, config_manager):
         self.config_manager = config_manager
     
+    def clone(self) -> 'BaseModule':
+        """New instance with the same settings and none of this one's VFS, indexes or caches"""
+        module = type(self)()
+        module.set_config_manager(self.config_manager)
+        return module
+    
+    def set_game_version(self, version: str):
+        """Binds the module to one game version (multi-version builds) instead of the configured one"""
+        self.game_version = version
+        self.baseline = None
+        self._structure_cache = None
+    
+    def set_mod_name(self, mod_name: str):
+        """Name of the mod being built: every override this module writes is named after it"""
+        self.mod_name = mod_name
+    
+    def override_name(self) -> str:
+        """File name (without .cfg) of this module's overrides; the module name outside a build"""
+        return self.mod_name or self.name.replace('Module', '')
+    
     def get_game_version(self) -> str:
+        if self.game_version:
+            return self.game_version
         if self.config_manager:
             config = self.config_manager.get_app_config()
             return config.get('game_version', _('unknown'))
@@ -27,7 +71,159 @@ class BaseModule(ABC):
         version = self.get_game_version()
         return '1.8.1' in version or _('modern') in version.lower() or 'binary' in version.lower()
     
+    def set_vfs(self, vfs):
+        """Game files are then read through the pak VFS (source_dir stays as fallback)"""
+        self.vfs = vfs
+        self._resolver = None
+        self._structure_cache = None
+    
+    def set_sid_index(self, sid_index):
+        self.sid_index = sid_index
+        self._resolver = None
+    
+    def set_baseline(self, baseline):
+        self.baseline = baseline
+    
+    def get_baseline(self) -> Optional[BaselineDB]:
+        """Vanilla baseline of the configured game version (only opened here, the pak manager builds it)"""
+        if self.baseline is None:
+            version = self.get_game_version()
+            if version != _('unknown'):
+                self.baseline = BaselineDB.open(version)
+        return self.baseline
+    
+    def vanilla_value(self, sid: str, path: str, file_hint: Optional[str] = None,
+                      default: Optional[str] = None) -> Optional[str]:
+        """Effective vanilla value of a prototype field from the baseline, `default` without one"""
+        baseline = self.get_baseline()
+        value = baseline.value(sid, path, file_hint) if baseline is not None else None
+        return value if value is not None else default
+    
+    def vanilla_number(self, sid: str, path: str, file_hint: Optional[str] = None,
+                       default: Optional[float] = None) -> Optional[float]:
+        baseline = self.get_baseline()
+        value = baseline.number(sid, path, file_hint) if baseline is not None else None
+        return value if value is not None else default
+    
+    def find_prototype(self, sid: str, file_hint: Optional[str] = None):
+        """Where a SID is defined (SidEntry with file, struct path, span, refs), None without an index"""
+        if self.sid_index is None:
+            return None
+        return self.sid_index.find(sid, file_hint)
+    
+    def refurl_to(self, sid: str, from_dir: str, file_hint: Optional[str] = None) -> Optional[str]:
+        """Relative refurl from a GameData subfolder (e.g. 'ObjPrototypes') to the file defining `sid`"""
+        entry = self.find_prototype(sid, file_hint)
+        if entry is None:
+            return None
+        from_path = f"Stalker2/Content/GameLite/GameData/{from_dir}".rstrip('/')
+        return os.path.relpath(entry.file, from_path).replace(os.sep, '/')
+    
+    def get_resolver(self) -> Optional[InheritanceResolver]:
+        """refkey/refurl resolver over the game files (pak VFS or extraction), None without an index"""
+        if self._resolver is None and self.sid_index is not None:
+            self._ensure_vfs()
+            read_bytes = self.vfs.read_bytes if self.vfs is not None else extraction_reader(self.source_dir)
+            self._resolver = InheritanceResolver(read_bytes, self.sid_index)
+        return self._resolver
+    
+    def effective_prototype(self, sid: str, file_hint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Effective key/value tree of a SID with everything it inherits, None if it cannot be resolved"""
+        resolver = self.get_resolver()
+        if resolver is None:
+            return None
+        try:
+            return resolver.resolve_sid(sid, file_hint)
+        except (CfgResolveError, OSError) as e:
+            self.log_warning(_("Could not resolve {}: {}").format(sid, e))
+            return None
+    
+    def target_keys(self) -> List[Tuple[str, str]]:
+        """(file pattern, key path pattern) pairs this module edits; files match by name or GameData path"""
+        return list(self.TARGETS)
+    
+    def targets(self, rel_file: str, path: str) -> bool:
+        """Whether this module edits `path` in a GameData file ('.cfg.bin' counts as '.cfg')"""
+        rel_file = rel_file[:-len('.bin')] if rel_file.endswith('.bin') else rel_file
+        name = rel_file.rpartition('/')[2]
+        path = path.partition('#')[0]
+        return any((fnmatch.fnmatch(name, file_pattern) or fnmatch.fnmatch(rel_file, file_pattern))
+                   and path_matches(key_pattern, path)
+                   for file_pattern, key_pattern in self.target_keys())
+    
+    def save_cfg(self, doc, source_file, game_data_path: Path) -> Optional[Path]:
+        """
+        Saves edits of a vanilla file as a minimal override when possible, as the
+        whole file otherwise; None when the document has no edits (nothing written)
+        """
+        return write_override(doc, gamedata_relative(source_file), game_data_path, self.override_name())
+    
+    def override_for(self, target: str) -> Tuple[str, str]:
+        """GameData path of a hand-written override of `target` (see override_location) and its refurl back to it"""
+        rel_file = override_location(target, self.override_name())
+        return rel_file, posixpath.relpath(target, posixpath.dirname(rel_file))
+    
+    def write_cfg(self, game_data_path: Path, rel_file: str, content: str) -> Optional[Path]:
+        """Writes a hand-written cfg below the staged GameData once it passes lint_file; None (errors printed) if not"""
+        errors = [issue for issue in lint_file(rel_file, content) if issue.severity == 'error']
+        if errors:
+            for issue in errors:
+                print(f"✗ {issue}")
+            return None
+        output_file = game_data_path / rel_file
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return output_file
+    
+    def plan_edits(self, config: Dict[str, Any]) -> Optional[List[PatchEdit]]:
+        """Edits for the builder's shared patch plan; None if the module writes its files itself"""
+        return None
+    
+    def apply_plan(self, edits: List[PatchEdit], output_path: Path) -> bool:
+        """Applies this module's edits on their own (in a build they are merged with other modules')"""
+        plan = PatchPlan()
+        plan.extend(edits)
+        try:
+            written = plan.execute(output_path / "Stalker2/Content/GameLite/GameData", self.find_file_in_extraction,
+                                   self.override_name())
+        except (PatchPlanError, CfgBinError, OSError) as e:
+            print(_("Error applying configuration: {}").format(e))
+            return False
+        for output_file in written:
+            print(f"✓ {output_file.name}")
+        return True
+    
+    def bulk_rewrite(self, rules: List[str], output_path: Path, include: str = '*') -> List[RewrittenFile]:
+        """Applies value rules to every matching GameData file (see BulkRewriter); returns what was written"""
+        self._ensure_vfs()
+        extract_dir = self.source_dir if self.source_dir and Path(self.source_dir).exists() else None
+        if extract_dir is None and self.vfs is None:
+            return []
+        rewriter = BulkRewriter(extract_dir, self.vfs, self.sid_index)
+        return rewriter.rewrite(rules, output_path / "Stalker2/Content/GameLite/GameData",
+                                self.override_name(), include)
+    
+    def _ensure_vfs(self):
+        # Распаковка в одном файле-контейнере читается только через VFS
+        if self.vfs is None and self.source_dir and has_container(self.source_dir):
+            self.set_vfs(GameVFS(None, self.source_dir))
+    
     def find_file_in_extraction(self, filename: str) -> Optional[Path]:
+        """File by name, or exactly the one at `filename` when it is a path below GameData"""
+        if '/' in filename:
+            game_data = self.find_gamedata_path()
+            if game_data is None:
+                return None
+            file_path = game_data / filename
+            return file_path if file_path.is_file() else None
+        
+        self._ensure_vfs()
+        if self.vfs is not None:
+            found = self.vfs.find(filename)
+            if found is not None:
+                return found
+        
         if not self.source_dir or not self.source_dir.exists():
             return None
         
@@ -38,6 +234,12 @@ class BaseModule(ABC):
         return None
     
     def find_gamedata_path(self) -> Optional[Path]:
+        self._ensure_vfs()
+        if self.vfs is not None:
+            found = self.vfs.find_dir("GameData")
+            if found is not None:
+                return found
+        
         if not self.source_dir or not self.source_dir.exists():
             return None
         
@@ -137,7 +339,7 @@ class BaseModule(ABC):
         pass
     
     def validate_source_files(self) -> bool:
-        return self.source_dir.exists()
+        return self.vfs is not None or self.source_dir.exists()
     
     def log_info(self, message: str):
         print(f"✓ {_(message)}")
@@ -1,13 +1,23 @@
 import json
 import math
-import re
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
+from src.cfg.binary import CfgBinError, open_cfg
 from .base_module import BaseModule
 
 class CarryWeightModule(BaseModule):
     
+    TARGETS = [
+        ('CoreVariables.cfg', '**/InventoryPenaltyLessWeight'),
+        ('CoreVariables.cfg', '**/MediumEffectStartUI'),
+        ('CoreVariables.cfg', '**/CriticalEffectStartUI'),
+        ('ObjEffectMaxParamsPrototypes.cfg', '**/MaxValue'),
+        ('ObjWeightParamsPrototypes.cfg', '**/MaxInventoryMass'),
+        ('ObjWeightParamsPrototypes.cfg', '**/InventoryPenaltyLessWeight'),
+        ('ObjWeightParamsPrototypes.cfg', '**/Threshold'),
+    ]
+    
     def __init__(self):
         super().__init__()
         self.display_name = "Carry Weight Modifier"
@@ -26,6 +36,8 @@ class CarryWeightModule(BaseModule):
                 data = json.load(f)
                 
             for name, config in data.get("configurations", {}).items():
+                if name == "vanilla":
+                    config = self._vanilla_config(config)
                 weight = config["ObjWeightParamsPrototypes.cfg"]["max_inventory_mass"]
                 configs.append({
                     'name': f"{weight} kg" + (" (Vanilla)" if name == "vanilla" else ""),
@@ -38,13 +50,14 @@ class CarryWeightModule(BaseModule):
     def get_custom_config(self) -> Optional[Dict[str, Any]]:
         print("\nCustom Carry Weight Configuration")
         print("=" * 40)
-        print("Enter weight between 81-10000 kg")
+        min_weight = (self._vanilla_weight() or 80) + 1
+        print(f"Enter weight between {min_weight}-10000 kg")
         
         try:
             weight = int(input("Max carry weight: ").strip())
             
-            if not 81 <= weight <= 10000:
-                print("Weight must be between 81 and 10000")
+            if not min_weight <= weight <= 10000:
+                print(f"Weight must be between {min_weight} and 10000")
                 return None
             
             return self._calculate_config(weight)
@@ -53,6 +66,34 @@ class CarryWeightModule(BaseModule):
             print("Invalid input")
             return None
     
+    def _vanilla_weight(self) -> Optional[int]:
+        """Vanilla MaxInventoryMass of the installed game version, None without a baseline"""
+        weight = self.vanilla_number('DefaultWeightParams', 'MaxInventoryMass', 'ObjWeightParamsPrototypes')
+        return int(weight) if weight is not None else None
+    
+    def _vanilla_config(self, preset: Dict[str, Any]) -> Dict[str, Any]:
+        """Vanilla preset with the weight values of the installed game version taken from the baseline"""
+        weight_params = dict(preset["ObjWeightParamsPrototypes.cfg"])
+        thresholds = dict(weight_params["thresholds"])
+        
+        def vanilla(path):
+            return self.vanilla_number('DefaultWeightParams', path, 'ObjWeightParamsPrototypes')
+        
+        max_weight = vanilla('MaxInventoryMass')
+        if max_weight is None:
+            return preset
+        weight_params["max_inventory_mass"] = int(max_weight)
+        penalty = vanilla('InventoryPenaltyLessWeight')
+        if penalty is not None:
+            weight_params["inventory_penalty_less_weight"] = penalty
+        # Порядок порогов как в файле: без эффекта, затем замедление 3, 2, 1
+        for i, name in enumerate(("no_effect", "velocity_change_3", "velocity_change_2", "velocity_change_1")):
+            threshold = vanilla(f'WeightEffectParams/[{i}]/Threshold')
+            if threshold is not None:
+                thresholds[name] = int(threshold)
+        weight_params["thresholds"] = thresholds
+        return {**preset, "ObjWeightParamsPrototypes.cfg": weight_params}
+    
     def _calculate_config(self, max_weight: int) -> Dict[str, Any]:
         penalty = math.floor(max_weight * 0.88 / 5) * 5
         critical = round(max_weight * 0.96 / 5) * 5
@@ -96,8 +137,6 @@ class CarryWeightModule(BaseModule):
             return False
     
     def _apply_core_variables(self, config: Dict[str, Any], output_path: Path):
-        output_file = output_path / "CoreVariables.cfg"
-        
         # Ищем оригинальный файл в распакованных данных
         source_file = self.find_file_in_extraction("CoreVariables.cfg")
         
@@ -106,32 +145,17 @@ class CarryWeightModule(BaseModule):
             print("   Please extract game files first.")
             return
         
-        # Читаем оригинальный файл
-        with open(source_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # Обновляем только параметры веса
-        content = re.sub(
-            r'(InventoryPenaltyLessWeight\s*=\s*)\d+\.?\d*',
-            f'\\g<1>{config["inventory_penalty_less_weight"]}',
-            content
-        )
-        content = re.sub(
-            r'(MediumEffectStartUI\s*=\s*)\d+',
-            f'\\g<1>{config["medium_effect_start_ui"]}',
-            content
-        )
-        content = re.sub(
-            r'(CriticalEffectStartUI\s*=\s*)\d+',
-            f'\\g<1>{config["critical_effect_start_ui"]}',
-            content
-        )
-        
-        # Сохраняем измененный файл
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # Обновляем только параметры веса, остальной файл копируется байт в байт
+        with open_cfg(source_file) as doc:
+            doc.set('**/InventoryPenaltyLessWeight', config["inventory_penalty_less_weight"])
+            doc.set('**/MediumEffectStartUI', config["medium_effect_start_ui"])
+            doc.set('**/CriticalEffectStartUI', config["critical_effect_start_ui"])
+            written = self.save_cfg(doc, source_file, output_path)
+        if written is None:
+            print(f"⚠ CoreVariables.cfg: no matching values, no changes written")
+            return
         
-        print(f"✓ Merged CoreVariables.cfg - updated weight parameters, preserved all other settings")
+        print(f"✓ Merged CoreVariables.cfg - updated weight parameters ({written.name})")
     
     def _apply_effect_params(self, config: Dict[str, Any], output_path: Path):
         output_file = output_path / "ObjEffectMaxParamsPrototypes.cfg"
@@ -145,32 +169,34 @@ class CarryWeightModule(BaseModule):
             print("❌ ERROR: ObjEffectMaxParamsPrototypes.cfg[.bin] not found in extracted files!")
             return
         
-        # Если это бинарный файл, создаем новый текстовый
-        if source_file.suffix == '.bin':
-            print("⚠ Original file is binary, creating new text config")
+        # .cfg.bin пока не разбирается - для него создаем новый текстовый файл
+        try:
+            doc = open_cfg(source_file)
+        except CfgBinError as e:
+            print(f"⚠ Original file is binary ({e}), creating new text config")
             self._create_effect_params_from_scratch(config, output_file)
             return
         
-        # Читаем текстовый файл
-        with open(source_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # Обновляем параметры
-        content = re.sub(
-            r'(EffectSID\s*=\s*EEffectType::PenaltyLessWeight[\s\S]*?MaxValue\s*=\s*)\d+',
-            f'\\g<1>{config["penalty_less_weight_max"]}',
-            content
-        )
-        content = re.sub(
-            r'(EffectSID\s*=\s*EEffectType::AdditionalInventoryWeight[\s\S]*?MaxValue\s*=\s*)\d+',
-            f'\\g<1>{config["additional_inventory_weight_max"]}',
-            content
-        )
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        with doc:
+            # MaxValue, следующий за нужным EffectSID
+            effect_values = {
+                'EEffectType::PenaltyLessWeight': config["penalty_less_weight_max"],
+                'EEffectType::AdditionalInventoryWeight': config["additional_inventory_weight_max"]
+            }
+            for effect in doc.select('**/EffectSID'):
+                new_value = effect_values.get(effect.text)
+                if new_value is None:
+                    continue
+                max_value = doc.first_after('**/MaxValue', effect.start)
+                if max_value is not None:
+                    doc.set_value(max_value, new_value)
+            
+            written = self.save_cfg(doc, source_file, output_path)
+        if written is None:
+            print(f"⚠ ObjEffectMaxParamsPrototypes.cfg: no matching values, no changes written")
+            return
         
-        print(f"✓ Merged ObjEffectMaxParamsPrototypes.cfg")
+        print(f"✓ Merged ObjEffectMaxParamsPrototypes.cfg ({written.name})")
     
     def _create_effect_params_from_scratch(self, config: Dict[str, Any], output_file: Path):
         """Создает новый файл EffectParams если оригинал бинарный"""
@@ -224,8 +250,8 @@ DefaultEffectMaxParamsSID : struct.begin {{refkey=[0]}}
    struct.end
 struct.end"""
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        if self.write_cfg(output_file.parent, output_file.name, content) is None:
+            raise ValueError(f"{output_file.name} template did not pass lint")
         
         print(f"✓ Created ObjEffectMaxParamsPrototypes.cfg from template (original was binary)")
     
@@ -241,53 +267,45 @@ struct.end"""
             print("❌ ERROR: ObjWeightParamsPrototypes.cfg[.bin] not found in extracted files!")
             return
         
-        # Если это бинарный файл, создаем новый текстовый
-        if source_file.suffix == '.bin':
-            print("⚠ Original file is binary, creating new text config")
+        # .cfg.bin пока не разбирается - для него создаем новый текстовый файл
+        try:
+            doc = open_cfg(source_file)
+        except CfgBinError as e:
+            print(f"⚠ Original file is binary ({e}), creating new text config")
             self._create_weight_params_from_scratch(config, output_file)
             return
         
-        # Читаем текстовый файл
-        with open(source_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        max_weight = config["max_inventory_mass"]
-        penalty = config["inventory_penalty_less_weight"]
-        thresholds = config["thresholds"]
-        
-        # Обновляем параметры
-        content = re.sub(
-            r'(DefaultWeightParams.*?MaxInventoryMass\s*=\s*)\d+',
-            f'\\g<1>{max_weight}',
-            content,
-            flags=re.DOTALL
-        )
-        content = re.sub(
-            r'(DefaultWeightParams.*?InventoryPenaltyLessWeight\s*=\s*)\d+\.?\d*',
-            f'\\g<1>{penalty}',
-            content,
-            flags=re.DOTALL
-        )
-        
-        # Обновляем пороговые значения (более сложный regex)
-        threshold_pattern = r'Threshold\s*=\s*\d+\.?\d*f?'
-        thresholds_list = [
-            f"Threshold = {thresholds['no_effect']}.f",
-            f"Threshold = {thresholds['velocity_change_3']}.f",
-            f"Threshold = {thresholds['velocity_change_2']}.f",
-            f"Threshold = {thresholds['velocity_change_1']}.f"
-        ]
-        
-        # Находим все Threshold и заменяем
-        threshold_matches = list(re.finditer(threshold_pattern, content))
-        if len(threshold_matches) >= 4:
-            for i, match in enumerate(threshold_matches[:4]):
-                content = content[:match.start()] + thresholds_list[i] + content[match.end():]
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        with doc:
+            max_weight = config["max_inventory_mass"]
+            penalty = config["inventory_penalty_less_weight"]
+            thresholds = config["thresholds"]
+            
+            # Обновляем параметры после первого упоминания DefaultWeightParams
+            anchor = doc.find_bytes("DefaultWeightParams")
+            if anchor != -1:
+                for key, new_value in (("MaxInventoryMass", max_weight), ("InventoryPenaltyLessWeight", penalty)):
+                    value = doc.first_after(f'**/{key}', anchor)
+                    if value is not None:
+                        doc.set_value(value, new_value)
+            
+            # Обновляем пороговые значения
+            thresholds_list = [
+                f"{thresholds['no_effect']}.f",
+                f"{thresholds['velocity_change_3']}.f",
+                f"{thresholds['velocity_change_2']}.f",
+                f"{thresholds['velocity_change_1']}.f"
+            ]
+            threshold_values = doc.select('**/Threshold')
+            if len(threshold_values) >= 4:
+                for value, new_value in zip(threshold_values, thresholds_list):
+                    doc.set_value(value, new_value)
+            
+            written = self.save_cfg(doc, source_file, output_path)
+        if written is None:
+            print(f"⚠ ObjWeightParamsPrototypes.cfg: no matching values, no changes written")
+            return
         
-        print(f"✓ Merged ObjWeightParamsPrototypes.cfg")
+        print(f"✓ Merged ObjWeightParamsPrototypes.cfg ({written.name})")
     
     def _create_weight_params_from_scratch(self, config: Dict[str, Any], output_file: Path):
         """Создает новый файл WeightParams если оригинал бинарный"""
@@ -332,19 +350,14 @@ DefaultWeightParams : struct.begin {{refkey=[0]}}
    struct.end
 struct.end"""
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
+        if self.write_cfg(output_file.parent, output_file.name, content) is None:
+            raise ValueError(f"{output_file.name} template did not pass lint")
         
         print(f"✓ Created ObjWeightParamsPrototypes.cfg from template (original was binary)")
     
     def find_file_in_extraction(self, filename: str) -> Optional[Path]:
-        """Find a file in the extracted game files"""
-        if not hasattr(self, 'source_dir') or not self.source_dir or not self.source_dir.exists():
-            return None
-        
-        for file_path in self.source_dir.rglob(filename):
-            if file_path.is_file():
-                print(f"Found {filename} at: {file_path}")
-                return file_path
-        
-        return None
\ No newline at end of file
+        """Find a file in the game files (pak VFS or extracted folder)"""
+        file_path = super().find_file_in_extraction(filename)
+        if file_path is not None:
+            print(f"Found {filename} at: {file_path}")
+        return file_path
\ No newline at end of file
@@ -1,12 +1,14 @@
 import json
-import re
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
+from src.core.patch_plan import PatchEdit
 from .base_module import BaseModule
 
 class DayLengthModule(BaseModule):
     
+    TARGETS = [('CoreVariables.cfg', '**/RealToGameTimeCoef')]
+    
     def __init__(self):
         super().__init__()
         self.display_name = "Day Length Modifier"
@@ -48,36 +50,8 @@ class DayLengthModule(BaseModule):
             print("Invalid input")
             return None
     
+    def plan_edits(self, config: Dict[str, Any]) -> Optional[List[PatchEdit]]:
+        return [PatchEdit("CoreVariables.cfg", '**/RealToGameTimeCoef', str(config['coefficient']), self.display_name)]
+    
     def apply_configuration(self, config: Dict[str, Any], output_path: Path) -> bool:
-        try:
-            game_data_path = output_path / "Stalker2/Content/GameLite/GameData"
-            game_data_path.mkdir(parents=True, exist_ok=True)
-            
-            output_file = game_data_path / "CoreVariables.cfg"
-            
-            if output_file.exists():
-                source_file = output_file
-            else:
-                source_file = self.find_file_in_extraction("CoreVariables.cfg")
-                if not source_file:
-                    print("CoreVariables.cfg not found in extraction")
-                    return False
-            
-            with open(source_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            coefficient = config['coefficient']
-            content = re.sub(
-                r'(RealToGameTimeCoef\s*=\s*)\d+\.?\d*',
-                rf'\g<1>{coefficient}',
-                content
-            )
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            return True
-            
-        except Exception as e:
-            print(f"Error applying configuration: {e}")
-            return False
\ No newline at end of file
+        return self.apply_plan(self.plan_edits(config), output_path)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import copy
+import json
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from src.cfg.expressions import rule_target
+from src.core.patch_plan import PatchEdit
+from .base_module import BaseModule, _
+
+class DeclarativeModule(BaseModule):
+    """
+    Module described by a JSON/TOML file in config/modules:
+
+        name         unique module name
+        display_name menu title
+        parameters   {param: {"prompt": .., "type": "float"|"int"|"str", "min": .., "max": ..}}
+        presets      [{"name": .., "config": {param: value}}]
+        edits        [{"file": "CoreVariables.cfg", "path": "**/RealToGameTimeCoef",
+                       "value": "{coefficient}", "after": optional anchor pattern},
+                      {"file": "WeaponPrototypes.cfg", "rule": "Damage *= {factor} if Class == ..."}]
+
+    Values and rules are str.format templates over the chosen parameters.
+    """
+    
+    TYPES = {'float': float, 'int': int, 'str': str}
+    
+    def __init__(self, spec: Dict[str, Any], spec_file: Optional[Path] = None):
+        super().__init__()
+        self.spec = spec
+        self.spec_file = spec_file
+        self.name = spec['name']
+        self.display_name = spec.get('display_name', self.name)
+        self.parameters = spec.get('parameters', {})
+        self.edits = spec.get('edits', [])
+        if not self.edits:
+            raise ValueError(f"{self.name}: no edits")
+        for edit in self.edits:
+            missing = {'file'} | ({'path', 'value'} if 'rule' not in edit else set())
+            missing -= set(edit)
+            if missing:
+                raise ValueError(f"{self.name}: edit without {', '.join(sorted(missing))}")
+    
+    def clone(self) -> 'DeclarativeModule':
+        module = DeclarativeModule(copy.deepcopy(self.spec), self.spec_file)
+        module.set_config_manager(self.config_manager)
+        return module
+    
+    @classmethod
+    def load(cls, spec_file: Path) -> 'DeclarativeModule':
+        if spec_file.suffix == '.toml':
+            if tomllib is None:
+                raise ValueError("TOML modules need Python 3.11+")
+            with open(spec_file, 'rb') as f:
+                spec = tomllib.load(f)
+        else:
+            with open(spec_file, 'r', encoding='utf-8') as f:
+                spec = json.load(f)
+        return cls(spec, spec_file)
+    
+    def get_predefined_configs(self) -> List[Dict[str, Any]]:
+        return [{'name': preset['name'], 'config': preset['config']} for preset in self.spec.get('presets', [])]
+    
+    def get_custom_config(self) -> Optional[Dict[str, Any]]:
+        print("\n" + _("Custom {} Configuration").format(self.display_name))
+        print("=" * 40)
+        
+        config = {}
+        for param, info in self.parameters.items():
+            convert = self.TYPES.get(info.get('type', 'float'), float)
+            try:
+                value = convert(input(f"{info.get('prompt', param)}: ").strip())
+            except ValueError:
+                print(_("Invalid input"))
+                return None
+            
+            low, high = info.get('min'), info.get('max')
+            if (low is not None and value < low) or (high is not None and value > high):
+                print(_("Value must be between {} and {}").format(low, high))
+                return None
+            config[param] = value
+        
+        return config
+    
+    def target_keys(self) -> List[Tuple[str, str]]:
+        return [(edit['file'], rule_target(edit['rule']) if 'rule' in edit else edit['path']) for edit in self.edits]
+    
+    def plan_edits(self, config: Dict[str, Any]) -> Optional[List[PatchEdit]]:
+        edits = []
+        for edit in self.edits:
+            if 'rule' in edit:
+                rule = edit['rule'].format_map(config)
+                edits.append(PatchEdit(edit['file'], rule, rule, self.display_name, rule=True))
+            else:
+                edits.append(PatchEdit(edit['file'], edit['path'], str(edit['value']).format_map(config),
+                                       self.display_name, edit.get('after')))
+        return edits
+    
+    def apply_configuration(self, config: Dict[str, Any], output_path: Path) -> bool:
+        return self.apply_plan(self.plan_edits(config), output_path)
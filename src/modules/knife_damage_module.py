@@ -2,11 +2,15 @@ import re
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
+from src.cfg.binary import CfgBinError, open_cfg
+from src.cfg.expressions import format_number
 from .base_module import BaseModule, _
 
 class KnifeDamageModule(BaseModule):
     """Модуль для увеличения урона ножа с возможностью игнорировать броню"""
     
+    TARGETS = [('MeleeWeaponPrototypes.cfg', 'Knife/**')]
+    
     def __init__(self):
         super().__init__()
         self.display_name = _("Knife Damage Modifier")
@@ -36,15 +40,44 @@ class KnifeDamageModule(BaseModule):
             print(_("Invalid input"))
             return None
     
+    # Урон ножа в ванильном MeleeWeaponPrototypes.cfg (если файл не удаётся прочитать)
+    DEFAULT_BASE_DAMAGE = 51.0
+    
+    def _read_base_damage(self) -> float:
+        """Vanilla Knife damage from the baseline or MeleeWeaponPrototypes.cfg, or the known default"""
+        damage = self.vanilla_number('Knife', 'Damage', 'MeleeWeaponPrototypes')
+        if damage is not None:
+            return damage
+        
+        # Через индекс учитывается и значение, унаследованное по refkey
+        knife = self.effective_prototype('Knife', 'MeleeWeaponPrototypes')
+        if knife is not None and isinstance(knife.get('Damage'), str):
+            damage = knife['Damage']
+        else:
+            source_file = self.find_file_in_extraction("MeleeWeaponPrototypes.cfg")
+            if not source_file:
+                return self.DEFAULT_BASE_DAMAGE
+            
+            try:
+                with open_cfg(source_file) as doc:
+                    damage = doc.get('Knife/Damage')
+            except (CfgBinError, OSError) as e:
+                print(_("Could not read {}: {}").format(source_file.name, e))
+                return self.DEFAULT_BASE_DAMAGE
+        
+        match = re.match(r'\s*(\d+(?:\.\d*)?)', damage or '')
+        return float(match.group(1)) if match else self.DEFAULT_BASE_DAMAGE
+    
     def apply_configuration(self, config: Dict[str, Any], output_path: Path) -> bool:
         try:
             game_data_path = output_path / "Stalker2/Content/GameLite/GameData"
             game_data_path.mkdir(parents=True, exist_ok=True)
             
             multiplier = config['multiplier']
-            base_damage = 51.0  # из оригинального бинарного файла
+            base_damage = self._read_base_damage()
             new_damage = base_damage * multiplier
             new_damage = round(new_damage, 2)
+            damage_literal = format_number(new_damage, '1.f')
             
             print(_("Base damage: {}, multiplier: {}, new damage: {}").format(base_damage, multiplier, new_damage))
             print(_("Knife will ignore armor (ShouldIgnoreArmor = true)"))
@@ -66,7 +99,7 @@ Knife : struct.begin {{refkey=Empty}}
    HitDetectionAngle = 45.f
    HitDetectionRadius = 5.f
    
-   Damage = {new_damage}.f
+   Damage = {damage_literal}
    ArmorDamage = 0.f
    ArmorPiercing = 1.f
    Bleeding = 50.f
@@ -121,8 +154,8 @@ WeaponButt : struct.begin {{refkey=Knife}}
    struct.end
 struct.end
 """
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if self.write_cfg(game_data_path, output_file.name, content) is None:
+                return False
             
             print(_("✓ Created {} with new damage: {} and armor ignore enabled").format(output_file.name, new_damage))
             return True
@@ -11,6 +11,7 @@ class ModuleLoader:
     def __init__(self):
         self.modules: Dict[str, object] = {}
         self.modules_dir = Path("src/modules")
+        self.declarative_dir = Path("config/modules")
     
     def discover_modules(self):
         """Discover and load all available modules"""
@@ -21,11 +22,30 @@ class ModuleLoader:
         for file_path in self.modules_dir.glob("*.py"):
             if file_path.name.startswith("__"):
                 continue
-            if file_path.name == "base_module.py":
+            if file_path.name in ("base_module.py", "declarative.py"):
                 continue
             
             module_name = file_path.stem
             self._load_module(module_name)
+        
+        self.discover_declarative_modules()
+    
+    def discover_declarative_modules(self):
+        """Load JSON/TOML modules (see DeclarativeModule) from config/modules"""
+        if not self.declarative_dir.exists():
+            return
+        
+        from .declarative import DeclarativeModule
+        
+        for file_path in sorted(self.declarative_dir.iterdir()):
+            if file_path.suffix not in (".json", ".toml"):
+                continue
+            try:
+                module = DeclarativeModule.load(file_path)
+                self.modules[module.name] = module
+                logger.info(f"Loaded declarative module: {module.name}")
+            except Exception as e:
+                logger.error(f"Failed to load declarative module {file_path.name}: {e}")
     
     def _load_module(self, module_name: str):
         """Load a specific module"""
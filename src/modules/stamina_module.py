@@ -6,6 +6,8 @@ from .base_module import BaseModule
 
 class StaminaModule(BaseModule):
     
+    TARGETS = [('ObjPrototypes*', '**/StaminaPerAction/*')]
+    
     def __init__(self):
         super().__init__()
         self.display_name = "Stamina Usage Modifier"
@@ -66,7 +68,10 @@ class StaminaModule(BaseModule):
             
             output_file = proto_path / "BetterStamina.cfg"
             
-            content = f"""BetterStamina : struct.begin {{refurl=../ObjPrototypes.cfg;refkey=Player}}
+            # Файл с прототипом Player берём из индекса SID, если он есть
+            refurl = self.refurl_to("Player", "ObjPrototypes", "ObjPrototypes") or "../ObjPrototypes.cfg"
+            
+            content = f"""BetterStamina : struct.begin {{refurl={refurl};refkey=Player}}
    StaminaPerAction : struct.begin
       Sprint = {config['Sprint']}
       Jump = {config['Jump']}
@@ -2,10 +2,14 @@ import re
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
+from src.cfg.delta import gamedata_relative
 from .base_module import BaseModule, _   # <-- добавили импорт _
 
 class TraderDurabilityModule(BaseModule):
     
+    TARGETS = [('*TradePrototypes*', '**/WeaponSellMinDurability'),
+               ('*TradePrototypes*', '**/ArmorSellMinDurability')]
+    
     def __init__(self):
         super().__init__()
         self.display_name = "Traders Buy Broken Stuff"
@@ -40,6 +44,15 @@ class TraderDurabilityModule(BaseModule):
             game_data_path = output_path / "Stalker2/Content/GameLite/GameData"
             game_data_path.mkdir(parents=True, exist_ok=True)
             
+            # Сначала правим сами прототипы торговцев
+            min_durability = config['min_durability']
+            rewritten = self.bulk_rewrite([f"WeaponSellMinDurability = {min_durability}",
+                                           f"ArmorSellMinDurability = {min_durability}"],
+                                          output_path, include='*TradePrototypes*')
+            if rewritten:
+                print(f"✓ {_('Min durability {:.0%} set in {} trader files').format(min_durability, len(rewritten))}")
+                return True
+            
             # Ищем оригинальный файл (текстовый или бинарный)
             source_file = self.find_file_in_extraction("TradePrototypes.cfg")
             if not source_file:
@@ -49,20 +62,23 @@ class TraderDurabilityModule(BaseModule):
                 print(_("TradePrototypes.cfg not found in extraction"))
                 return False
             
-            output_file = game_data_path / "TradeDurabilityOverride.cfg"
+            # Оверрайд кладём рядом с найденным файлом: refurl считается от папки оверрайда
+            target = gamedata_relative(source_file)
+            target = target[:-len('.bin')] if target.endswith('.bin') else target
+            rel_file, refurl = self.override_for(target)
             min_durability = config['min_durability']
             formatted_value = f"{min_durability:.2f}".rstrip('0').rstrip('.') + 'f'
             
-            content = f"""; Trader durability override
-; Generated by S.T.A.L.K.E.R. 2 Mod Builder
+            content = f"""// Trader durability override
+// Generated by S.T.A.L.K.E.R. 2 Mod Builder
 
-[TraderDurabilityOverride] : struct.begin {{refurl=../TradePrototypes.cfg}}
+[TraderDurabilityOverride] : struct.begin {{refurl={refurl}}}
     WeaponSellMinDurability = {formatted_value}
     ArmorSellMinDurability = {formatted_value}
 struct.end
 """
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if self.write_cfg(game_data_path, rel_file, content) is None:
+                return False
             
             print(f"✓ {_('Created override file with min durability = {:.0%}').format(min_durability)}")
             return True
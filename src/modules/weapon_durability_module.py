@@ -2,10 +2,13 @@ import re
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
+from src.cfg.expressions import format_number
 from .base_module import BaseModule, _
 
 class WeaponDurabilityModule(BaseModule):
     
+    TARGETS = [('WeaponData/*', '**/DurabilityDamagePerShot')]
+    
     def __init__(self):
         super().__init__()
         self.display_name = "Weapon Durability Modifier"
@@ -41,22 +44,34 @@ class WeaponDurabilityModule(BaseModule):
             
             reduction_factor = config['reduction_factor']
             
-            # Создаём оверрайд для базового прототипа игрока
-            output_file = game_data_path / "WeaponDurabilityOverride.cfg"
+            # Правим износ в каждом прототипе оружия, где он задан
+            rewritten = self.bulk_rewrite([f"DurabilityDamagePerShot /= {reduction_factor}"], output_path,
+                                          include='WeaponData/*')
+            if rewritten:
+                changed = sum(result.changed for result in rewritten)
+                print(_("✓ Durability factor {:.2f} applied to {} values in {} files").format(
+                    reduction_factor, changed, len(rewritten)))
+                return True
             
+            # Создаём оверрайд для базового прототипа игрока
             # В оригинальном файле (бинарном) параметр называется DurabilityDamagePerShot.
             # Мы создаём структуру, которая переопределит его для всех видов оружия через общий прототип.
-            # Используем refurl на PlayerWeaponSettingsPrototypes (даже если он бинарный, ссылка работает).
-            content = f"""; Weapon durability override
-; Generated by S.T.A.L.K.E.R. 2 Mod Builder
+            # Файл кладём рядом с PlayerWeaponSettingsPrototypes, чтобы refurl вёл внутрь GameData
+            # (даже если оригинал бинарный, ссылка работает).
+            rel_file, refurl = self.override_for(
+                "WeaponData/CharacterWeaponSettingsPrototypes/PlayerWeaponSettingsPrototypes.cfg")
+            # Игра не вычисляет выражения в значениях - пишем готовое число
+            damage_per_shot = format_number(1.0 / reduction_factor, '1.f')
+            content = f"""// Weapon durability override
+// Generated by S.T.A.L.K.E.R. 2 Mod Builder
 
-; Переопределяем параметр износа для всех видов оружия
-[WeaponDurabilityOverride] : struct.begin {{refurl=../WeaponData/CharacterWeaponSettingsPrototypes/PlayerWeaponSettingsPrototypes.cfg}}
-    DurabilityDamagePerShot = 1.0 / {reduction_factor}
+// Переопределяем параметр износа для всех видов оружия
+[WeaponDurabilityOverride] : struct.begin {{refurl={refurl}}}
+    DurabilityDamagePerShot = {damage_per_shot}
 struct.end
 """
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if self.write_cfg(game_data_path, rel_file, content) is None:
+                return False
             
             print(_("✓ Created override file with durability factor = {:.2f}").format(reduction_factor))
             return True
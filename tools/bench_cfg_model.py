@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Memory of the resident GameData model (src/cfg/model.py) per MB of cfg source,
+compared with parsed CfgDocument objects for the same files.
+
+    python tools/bench_cfg_model.py [extraction folder] [--documents N]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.cfg.document import CfgDocument
+from src.cfg.model import GameDataModel
+from src.cfg.resolver import extraction_reader
+from src.core.extraction import get_latest_extraction
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("extraction", nargs="?", type=Path)
+    parser.add_argument("--documents", type=int, default=200,
+                        help="files loaded as CfgDocument objects for comparison")
+    args = parser.parse_args()
+
+    extract_dir = args.extraction or get_latest_extraction(Path("data/extract"))
+    if extract_dir is None:
+        print("No extraction found")
+        return 1
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = GameDataModel(extract_dir).load()
+    elapsed = time.perf_counter() - start
+    model.close()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    source_mb = model.source_bytes / (1024 * 1024)
+    values = sum(len(tree) for tree in model.trees.values())
+    print(f"Model:     {len(model.trees)} files, {source_mb:.1f} MB source, {values:,} values, {elapsed:.1f}s")
+    print(f"           {current / (1024 * 1024):.1f} MB resident (peak {peak / (1024 * 1024):.1f} MB), "
+          f"{current / max(model.source_bytes, 1):.2f} MB per MB of source")
+
+    files = list(model.trees)[:args.documents]
+    # Модель уже закрыта; файлы читаются так же, как их читает сборка (папка или контейнер)
+    read = extraction_reader(extract_dir)
+    tracemalloc.start()
+    docs = []
+    doc_bytes = 0
+    for file in files:
+        data = read(file)
+        doc = CfgDocument.from_bytes(data, file)
+        doc.values
+        doc_bytes += len(data)
+        docs.append(doc)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Documents: {len(docs)} files, {current / max(doc_bytes, 1):.2f} MB per MB of source "
+          f"(objects and source bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())